@@ -0,0 +1,158 @@
+"""
+    Statistics of the recognized tokens computed on NumPy arrays, so each
+    one is a vectorized operation instead of a loop over the tokens.
+
+    NumPy isn't needed by the lexer, only by this module (it's an optional
+    requirement, see requirements.txt)
+"""
+from collections import Counter, namedtuple
+
+import numpy
+
+from lexical import Lexical
+from serialization import TokenStream
+from token_buffer import TokenBuffer
+
+
+# ids, lines, columns and lexogram indexes of the tokens, string returns the
+# lexogram of a lexogram index
+TokenArrays = namedtuple(
+    "TokenArrays", ('ids', 'lines', 'columns', 'lexograms', 'string'))
+
+KEYWORD_IDS = numpy.array(
+    sorted({token.id for token in Lexical.KEYWORDS.values()}))
+
+
+def token_arrays(tokens):
+    """
+        Return the TokenArrays of tokens: a TokenBuffer or a TokenStream,
+        whose arrays are used without being copied (a TokenBuffer can't grow
+        while they're in use), or a list of tokens like Lexical.tokens
+    """
+    dtypes = (numpy.uint16, numpy.uint32, numpy.int32, numpy.uint32)
+    if isinstance(tokens, (TokenBuffer, TokenStream)):
+        columns = [
+            numpy.frombuffer(column, dtype=dtype) for column, dtype in zip(
+                (tokens.ids, tokens.lines, tokens.columns, tokens.lexograms),
+                dtypes)]
+        if isinstance(tokens, TokenBuffer):
+            string = tokens.strings.__getitem__
+        else:
+            string = tokens.string
+        return TokenArrays(*columns, string=string)
+
+    # the lexograms are indexed on a string table, as on a TokenBuffer
+    strings = [None]
+    string_indexes = {None: 0}
+    columns = ([], [], [], [])
+    for token in tokens:
+        string_index = string_indexes.get(token['lexogram'])
+        if string_index is None:
+            string_index = string_indexes[token['lexogram']] = len(strings)
+            strings.append(token['lexogram'])
+        columns[0].append(token['token'])
+        columns[1].append(token['line'])
+        columns[2].append(token['column'])
+        columns[3].append(string_index)
+
+    return TokenArrays(
+        *(numpy.array(column, dtype=dtype)
+          for column, dtype in zip(columns, dtypes)),
+        string=strings.__getitem__)
+
+
+def id_counts(arrays):
+    """
+        Return the number of tokens of each id, indexed by the id
+    """
+    return numpy.bincount(arrays.ids, minlength=len(Lexical.TABLE_TOKENS))
+
+
+def class_histogram(arrays, table_tokens=Lexical.TABLE_TOKENS):
+    """
+        Return the number of tokens of each class on the table, by name. The
+        classes sharing an id (as EQUAL and DIFF) are told apart by the
+        lexogram
+    """
+    counts = id_counts(arrays)
+    names_by_id = {}
+    for name, token in table_tokens.items():
+        names_by_id.setdefault(token.id, []).append((name, token))
+
+    histogram = {}
+    for token_id, names in names_by_id.items():
+        if token_id >= len(counts) or not counts[token_id]:
+            continue
+        if len(names) == 1:
+            histogram[names[0][0]] = int(counts[token_id])
+            continue
+
+        lexograms = lexogram_counts(arrays, token_id)
+        for name, token in names:
+            if lexograms[token.lexogram]:
+                histogram[name] = lexograms[token.lexogram]
+    return histogram
+
+
+def nesting_depth(arrays):
+    """
+        Return the identation depth after each token, the running sum of
+        the INDENT (+1) and DEDENT (-1) tokens
+    """
+    steps = (
+        (arrays.ids == Lexical.TABLE_TOKENS['INDENT'].id).astype(numpy.int32) -
+        (arrays.ids == Lexical.TABLE_TOKENS['DEDENT'].id))
+    return numpy.cumsum(steps, dtype=numpy.int32)
+
+
+def max_depth(arrays):
+    """
+        Return the deepest identation level
+    """
+    depth = nesting_depth(arrays)
+    return int(depth.max()) if len(depth) else 0
+
+
+def tokens_per_line(arrays):
+    """
+        Return the number of tokens of each line, indexed by the line. The
+        automatic tokens (the ';' before each NEWLINE, the INDENT and DEDENT)
+        are counted too
+    """
+    return numpy.bincount(arrays.lines)
+
+
+def keywords_per_line(arrays):
+    """
+        Return the number of reserved words of each line, indexed by the line
+    """
+    return numpy.bincount(
+        arrays.lines[numpy.isin(arrays.ids, KEYWORD_IDS)],
+        minlength=int(arrays.lines.max()) + 1 if len(arrays.lines) else 0)
+
+
+def keyword_density(arrays):
+    """
+        Return the fraction of the tokens that are reserved words
+    """
+    if not len(arrays.ids):
+        return 0.0
+    return float(numpy.isin(arrays.ids, KEYWORD_IDS).mean())
+
+
+def lexogram_counts(arrays, token_id):
+    """
+        Return a Counter with the number of tokens of token_id with each
+        lexogram
+    """
+    counts = numpy.bincount(arrays.lexograms[arrays.ids == token_id])
+    return Counter({
+        arrays.string(int(index)): int(counts[index])
+        for index in numpy.flatnonzero(counts)})
+
+
+def identifier_frequencies(arrays):
+    """
+        Return a Counter with the number of occurrences of each identifier
+    """
+    return lexogram_counts(arrays, Lexical.TABLE_TOKENS['ID'].id)
@@ -0,0 +1,163 @@
+import io
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from lexical import Lexical
+from token_buffer import TokenBuffer
+
+
+LexResult = namedtuple("LexResult", ('path', 'tokens', 'error'))
+LexError = namedtuple("LexError", ('type', 'message', 'line', 'column'))
+Chunk = namedtuple("Chunk", ('start', 'end', 'line'))
+
+OUTSIDE_STRING_PATTERN = re.compile(rb'[\'"#]')
+INSIDE_STRING_PATTERN = re.compile(rb'[\'"]')
+
+
+def lex_path(path, engine='regex'):
+    """
+        Lex the file on path, returning a LexResult with the tokens on a
+        TokenBuffer or the error found
+    """
+    try:
+        with open(path) as input_file:
+            instance = Lexical(input_file, engine=engine, storage='buffer')
+            instance.decode()
+    except SyntaxError as error:
+        # IndentationError is a SyntaxError too
+        return LexResult(path, None, LexError(
+            type(error).__name__, str(error), instance.line_index,
+            instance.column_index))
+    except (OSError, UnicodeDecodeError) as error:
+        return LexResult(
+            path, None, LexError(type(error).__name__, str(error), None, None))
+    return LexResult(path, instance.tokens, None)
+
+
+def lex_many(paths, workers=None, engine='regex', chunksize=8):
+    """
+        Lex each file of paths on a pool of worker processes, returning the
+        LexResult of each one in the same order of paths. The errors of a
+        file don't stop the others.
+
+        With workers=1 the files are lexed on the current process
+    """
+    paths = list(paths)
+    engines = [engine] * len(paths)
+    if workers == 1:
+        return list(map(lex_path, paths, engines))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lex_path, paths, engines, chunksize=chunksize))
+
+
+def string_flag_after(line, string_flag):
+    """
+        Follow the quotes of line (a bytes line) like the lexer does,
+        returning the quote of the string still open at the end of the line,
+        or None
+    """
+    position = 0
+    while True:
+        if string_flag is None:
+            match = OUTSIDE_STRING_PATTERN.search(line, position)
+            if not match or match.group() == b'#':
+                return None
+        else:
+            match = INSIDE_STRING_PATTERN.search(line, position)
+            if not match:
+                return string_flag
+
+        position = match.start()
+        quote = match.group() * 3
+        if not line.startswith(quote, position):
+            quote = match.group()
+        position += len(quote)
+        string_flag = None if quote == string_flag else quote
+
+
+def find_chunks(path, chunk_size):
+    """
+        Split the file on path on chunks of about chunk_size bytes. Each
+        chunk (but the first) starts on a line without identation that isn't
+        inside a string, so it can be lexed alone
+    """
+    chunks = []
+    start = offset = 0
+    first_line = line_index = 0
+    string_flag = None
+    with open(path, 'rb') as input_file:
+        for line in input_file:
+            if (
+                    offset - start >= chunk_size and string_flag is None and
+                    line[:1] not in b' \t\r\n\x0b\x0c#'):
+                chunks.append(Chunk(start, offset, first_line))
+                start = offset
+                first_line = line_index
+
+            if b'\r' in line:
+                # the lines on text mode also end on a lone '\r'
+                text_lines = line.splitlines(True)
+            else:
+                text_lines = (line,)
+            for text_line in text_lines:
+                string_flag = string_flag_after(text_line, string_flag)
+                line_index += 1
+            offset += len(line)
+
+    chunks.append(Chunk(start, offset, first_line))
+    return chunks
+
+
+def lex_chunk(path, chunk, engine='regex'):
+    """
+        Lex a chunk of the file on path, returning a TokenBuffer
+    """
+    with open(path, 'rb') as input_file:
+        input_file.seek(chunk.start)
+        data = input_file.read(chunk.end - chunk.start)
+
+    instance = Lexical(
+        io.TextIOWrapper(io.BytesIO(data)), engine=engine, storage='buffer')
+    instance.line_index = chunk.line
+    instance.decode()
+    return instance.tokens
+
+
+def lex_file_parallel(path, workers=None, engine='regex', chunk_size=None):
+    """
+        Lex a single file splitting it on chunks lexed on worker processes.
+        The tokens are the same of Lexical(open(path)).decode(), returned on
+        a TokenBuffer
+    """
+    if chunk_size is None:
+        chunk_size = os.path.getsize(path) // ((workers or os.cpu_count()) * 4)
+    chunks = find_chunks(path, max(chunk_size, 1))
+    paths = [path] * len(chunks)
+    engines = [engine] * len(chunks)
+
+    if workers == 1:
+        chunk_tokens = map(lex_chunk, paths, chunks, engines)
+        return stitch(chunk_tokens)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return stitch(executor.map(lex_chunk, paths, chunks, engines))
+
+
+def stitch(chunk_tokens):
+    """
+        Join the tokens of each chunk. The DEDENT tokens at the end of a chunk
+        are the ones the lexer adds on the first line of the next chunk, only
+        the ENDMARKER must be removed
+    """
+    tokens = TokenBuffer()
+    previous = None
+    for current in chunk_tokens:
+        if previous is not None:
+            tokens.extend(previous, len(previous) - 1)
+        previous = current
+    tokens.extend(previous)
+    return tokens
@@ -0,0 +1,129 @@
+"""
+    Deterministic generator of source files to benchmark the lexer. The same
+    kind, size and seed always produce the same file
+"""
+import random
+import string
+
+
+SIZES = {
+    '1K': 1024,
+    '100K': 100 * 1024,
+    '1M': 1024 * 1024,
+    '10M': 10 * 1024 * 1024,
+    '100M': 100 * 1024 * 1024,
+}
+
+
+def identifier(rng, minimum=1, maximum=12):
+    first = rng.choice(string.ascii_letters + '_')
+    rest = ''.join(rng.choice(string.ascii_letters + string.digits + '_')
+                   for _ in range(rng.randint(minimum, maximum) - 1))
+    return 'v' + first + rest
+
+
+def number(rng):
+    return rng.choice([
+        lambda: str(rng.randint(1, 10 ** 6)),
+        lambda: '0x{:X}'.format(rng.randint(0, 2 ** 32)),
+        lambda: '0o{:o}'.format(rng.randint(0, 2 ** 16)),
+        lambda: '0b{:b}'.format(rng.randint(0, 2 ** 16)),
+        lambda: '{}.{}'.format(rng.randint(0, 999), rng.randint(0, 999)),
+        lambda: '{}e-{}'.format(rng.randint(1, 9), rng.randint(1, 30)),
+        lambda: '.{}'.format(rng.randint(1, 9999)),
+    ])()
+
+
+def expression(rng, operands=3, name=identifier):
+    terms = [rng.choice([name(rng), number(rng)]) for _ in range(operands)]
+    operators = ['+', '-', '*', '/', '//', '%', '**', '&', '|', '^']
+    parts = [terms[0]]
+    for term in terms[1:]:
+        parts.extend([rng.choice(operators), term])
+    return ' '.join(parts)
+
+
+def deep_identation_block(rng):
+    depth = rng.randint(5, 20)
+    lines = []
+    for level in range(depth):
+        lines.append('{}if {} <= {}:\n'.format(
+            '    ' * level, identifier(rng), number(rng)))
+    lines.append('{}{} = {}\n'.format(
+        '    ' * depth, identifier(rng), expression(rng)))
+    return ''.join(lines)
+
+
+def long_identifiers_block(rng):
+    def name(rng):
+        return identifier(rng, 30, 80)
+    return 'def {}({}, {}):\n    return {}\n'.format(
+        name(rng), name(rng), name(rng), expression(rng, 4, name))
+
+
+def numeric_block(rng):
+    return '{} = [{}]\n'.format(
+        identifier(rng), ', '.join(number(rng) for _ in range(12)))
+
+
+def triple_string_block(rng):
+    words = [identifier(rng) for _ in range(20)]
+    lines = [
+        ' '.join(rng.choice(words) for _ in range(rng.randint(5, 15)))
+        for _ in range(rng.randint(50, 200))]
+    return '{} = """{}\n"""\n'.format(identifier(rng), '\n'.join(lines))
+
+
+def comments_block(rng):
+    lines = []
+    for _ in range(rng.randint(3, 10)):
+        lines.append('# {}\n'.format(' '.join(
+            identifier(rng) for _ in range(rng.randint(3, 12)))))
+    lines.append('{} = {}  # {}\n'.format(
+        identifier(rng), expression(rng), identifier(rng)))
+    return ''.join(lines)
+
+
+def mixed_block(rng):
+    return ''.join([
+        'class {}:\n'.format(identifier(rng)),
+        '    def {}(self, {}):\n'.format(identifier(rng), identifier(rng)),
+        "        '''{}'''\n".format(identifier(rng)),
+        '        for {} in {}:\n'.format(identifier(rng), identifier(rng)),
+        '            {} += {}  # {}\n'.format(
+            identifier(rng), expression(rng), identifier(rng)),
+        "        return '{}'\n".format(identifier(rng)),
+    ])
+
+
+KINDS = {
+    'deep_identation': deep_identation_block,
+    'long_identifiers': long_identifiers_block,
+    'numeric': numeric_block,
+    'triple_strings': triple_string_block,
+    'comments': comments_block,
+    'mixed': mixed_block,
+}
+
+
+def generate_blocks(kind, size, seed=0):
+    """
+        Yield blocks of source of the kind, with a total of about size chars
+    """
+    rng = random.Random('{}-{}'.format(kind, seed))
+    make_block = KINDS[kind]
+    generated = 0
+    while generated < size:
+        block = make_block(rng)
+        generated += len(block)
+        yield block
+
+
+def generate(kind, size, seed=0):
+    return ''.join(generate_blocks(kind, size, seed))
+
+
+def write(path, kind, size, seed=0):
+    with open(path, 'w') as output_file:
+        for block in generate_blocks(kind, size, seed):
+            output_file.write(block)
@@ -0,0 +1,283 @@
+"""
+    Benchmarks of the lexer over the generated corpora.
+
+        python -m benchmarks.run run --sizes 1K,100K,1M --output results.json
+        python -m benchmarks.run compare baseline.json results.json
+        python -m benchmarks.run cold
+        python -m benchmarks.run alloc --size 100K
+
+    Each case runs on a new process, so its peak RSS is not affected by the
+    other cases. compare exits with status 1 when a case of the second file
+    is slower (or uses more memory) than the first past the threshold. cold
+    measures the startup: the fastest of the runs of a new process lexing
+    a 1-line file, less the fastest startup of an empty interpreter. alloc
+    traces the memory blocks allocated by the lexer, with and without
+    interning the lexograms
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import corpus
+
+
+def corpus_path(directory, kind, size, seed):
+    path = os.path.join(directory, '{}-{}-{}.py'.format(kind, size, seed))
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        corpus.write(path + '.tmp', kind, corpus.SIZES[size], seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def measure(path, engine, repeat):
+    """
+        Lex the file on path, returning the number of tokens, the best time
+        of repeat runs, the time of each phase and the peak RSS
+    """
+    from lexical import Lexical
+
+    best = None
+    for _ in range(repeat):
+        with open(path) as input_file:
+            instance = Lexical(input_file, engine=engine, storage='buffer')
+            start = time.perf_counter()
+            instance.decode()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    with open(path) as input_file:
+        instance = Lexical(
+            input_file, engine=engine, storage='buffer', instrument=True)
+        instance.decode()
+
+    return {
+        'tokens': len(instance.tokens),
+        'seconds': best,
+        'tokens_per_second': len(instance.tokens) / best if best else 0,
+        'phases': dict(instance.stats.time),
+        'regex_calls': instance.stats.regex_calls,
+        'fallbacks': instance.stats.fallbacks,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+COLD_START = '\n'.join([
+    'import io',
+    'from lexical import Lexical',
+    'Lexical(io.StringIO("x = 1\\n"), engine={!r}).decode()',
+])
+
+
+def min_process_time(code, repeat):
+    """
+        Return the minimum, in seconds, of repeat runs of code on a new
+        interpreter, the runs slowed down by the other processes are left
+        out
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', code])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cold(arguments):
+    # warms up the bytecode cache, measured here is the startup of an
+    # installed lexer
+    subprocess.check_call([sys.executable, '-c', 'import lexical'])
+    empty = min_process_time('pass', arguments.repeat)
+    for engine in arguments.engines.split(','):
+        seconds = min_process_time(
+            COLD_START.format(engine), arguments.repeat)
+        print('{:>6} {:>8.2f} ms (interpreter {:.2f} ms)'.format(
+            engine, (seconds - empty) * 1000, empty * 1000))
+
+
+def allocations(source, engine, storage, intern_size):
+    """
+        Lex source tracing its allocations, returning the number of tokens,
+        the blocks and bytes still allocated per token after the lexing,
+        and the peak of bytes allocated per token
+    """
+    from lexical import Lexical
+
+    instance = Lexical(io.StringIO(source), engine=engine, storage=storage)
+    instance.intern_size = intern_size
+    tracemalloc.start()
+    try:
+        instance.decode()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(
+            statistic.count
+            for statistic in tracemalloc.take_snapshot().statistics(
+                'filename'))
+    finally:
+        tracemalloc.stop()
+
+    tokens = len(instance.tokens)
+    return {
+        'tokens': tokens,
+        'blocks_per_token': blocks / tokens,
+        'bytes_per_token': current / tokens,
+        'peak_bytes_per_token': peak / tokens,
+    }
+
+
+def alloc(arguments):
+    from lexical import Lexical
+
+    if arguments.path:
+        with open(arguments.path) as input_file:
+            source = input_file.read()
+    else:
+        source = corpus.generate(
+            arguments.kind, corpus.SIZES[arguments.size], arguments.seed)
+    for engine in arguments.engines.split(','):
+        for storage in Lexical.STORAGES:
+            for intern_size in (0, Lexical.INTERN_SIZE):
+                case = allocations(source, engine, storage, intern_size)
+                print('{:>6} {:>6} {:>8} {:>8} tokens {:>6.2f} blocks/token '
+                      '{:>7.1f} B/token peak {:>7.1f} B/token'.format(
+                          engine, storage,
+                          'intern' if intern_size else 'no-intern',
+                          case['tokens'], case['blocks_per_token'],
+                          case['bytes_per_token'],
+                          case['peak_bytes_per_token']))
+
+
+def run(arguments):
+    cases = []
+    for kind in arguments.kinds.split(','):
+        for size in arguments.sizes.split(','):
+            path = corpus_path(
+                arguments.corpus_dir, kind, size, arguments.seed)
+            for engine in arguments.engines.split(','):
+                output = subprocess.check_output([
+                    sys.executable, '-m', 'benchmarks.run', 'measure', path,
+                    engine, str(arguments.repeat)])
+                case = {'kind': kind, 'size': size, 'engine': engine}
+                case.update(json.loads(output.decode('utf-8')))
+                cases.append(case)
+                print('{kind:>16} {size:>5} {engine:>6} {tokens:>10} tokens '
+                      '{tokens_per_second:>12.0f} tokens/s '
+                      '{peak_rss_kb:>8} KB'.format(**case), file=sys.stderr)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': cases,
+    }
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+
+def compare(baseline, current, threshold):
+    """
+        Return a message for each case of current that regressed past the
+        threshold (a fraction) from the same case of baseline
+    """
+    def key(case):
+        return case['kind'], case['size'], case['engine']
+
+    baseline_cases = {key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in current['cases']:
+        base = baseline_cases.get(key(case))
+        if base is None:
+            continue
+        name = '/'.join(key(case))
+        speed = case['tokens_per_second'] / base['tokens_per_second']
+        if speed < 1 - threshold:
+            regressions.append('{}: {:.1%} slower'.format(name, 1 - speed))
+        memory = case['peak_rss_kb'] / base['peak_rss_kb']
+        if memory > 1 + threshold:
+            regressions.append(
+                '{}: {:.1%} more memory'.format(name, memory - 1))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--kinds', default=','.join(corpus.KINDS))
+    run_parser.add_argument(
+        '--sizes', default='1K,100K,1M',
+        help='comma separated, from {}'.format(', '.join(corpus.SIZES)))
+    run_parser.add_argument('--engines', default='char,regex')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='JSON file of the results')
+    run_parser.add_argument(
+        '--corpus-dir',
+        default=os.path.join(tempfile.gettempdir(), 'folahe-corpus'))
+
+    measure_parser = commands.add_parser(
+        'measure', help='measure a single file (used by run)')
+    measure_parser.add_argument('path')
+    measure_parser.add_argument('engine')
+    measure_parser.add_argument('repeat', type=int)
+
+    cold_parser = commands.add_parser(
+        'cold', help='measure the startup of lexing a 1-line file')
+    cold_parser.add_argument('--engines', default='char,regex')
+    cold_parser.add_argument('--repeat', type=int, default=100)
+
+    alloc_parser = commands.add_parser(
+        'alloc', help='trace the allocations per token')
+    alloc_parser.add_argument('--kind', default='mixed')
+    alloc_parser.add_argument('--size', default='100K')
+    alloc_parser.add_argument('--engines', default='char,regex')
+    alloc_parser.add_argument('--seed', type=int, default=0)
+    alloc_parser.add_argument(
+        '--path', help='file traced instead of a generated one (the corpus '
+                       'names are random, a real file repeats them)')
+
+    compare_parser = commands.add_parser(
+        'compare', help='compare two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='regression allowed, as a fraction (default 0.1)')
+
+    arguments = parser.parse_args(argv)
+    if arguments.command == 'run':
+        run(arguments)
+    elif arguments.command == 'cold':
+        cold(arguments)
+    elif arguments.command == 'alloc':
+        alloc(arguments)
+    elif arguments.command == 'measure':
+        json.dump(measure(
+            arguments.path, arguments.engine, arguments.repeat), sys.stdout)
+    else:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(arguments.current) as current_file:
+            current = json.load(current_file)
+        regressions = compare(baseline, current, arguments.threshold)
+        for regression in regressions:
+            print(regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
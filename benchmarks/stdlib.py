@@ -0,0 +1,288 @@
+"""
+    Differential harness against the tokenize module of the stdlib: the
+    same sources are lexed by Lexical.decode() and tokenize.generate_tokens,
+    their tokens are compared and their speed and memory printed side by
+    side.
+
+        python -m benchmarks.stdlib --sizes 100K,1M --stdlib
+        python -m benchmarks.stdlib --output baseline.json
+
+    The sources are the generated corpora and, with --stdlib, the files of
+    the stdlib that Lexical can lex. Both token streams are mapped to the
+    stdlib token types (see STDLIB_TYPES): the lines, comments and the ';'
+    ending a statement aren't compared, and the quotes and content of a
+    string are joined on a single STRING. The exit status is 1 when the
+    tokens of a source differ
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import sysconfig
+import time
+import token
+import tokenize
+import tracemalloc
+
+from benchmarks import corpus
+from lexical import Lexical
+
+
+def stdlib_types(table_tokens=Lexical.TABLE_TOKENS):
+    """
+        Return the stdlib token type of each id of table_tokens
+    """
+    special = {
+        'ID': token.NAME, 'STRING': token.STRING, 'QUOTE': token.STRING,
+        'DQUOTE': token.STRING, 'TRIPLEQUOTE': token.STRING,
+        'TRIPLEDQUOTE': token.STRING, 'NEWLINE': token.NEWLINE,
+        'CR': token.NEWLINE, 'COMMENT': token.COMMENT,
+        'INDENT': token.INDENT, 'DEDENT': token.DEDENT,
+        'ENDMARKER': token.ENDMARKER, 'ERROR': token.ERRORTOKEN,
+    }
+    types = {}
+    for name, table_token in table_tokens.items():
+        if name in special:
+            types[table_token.id] = special[name]
+        elif name.startswith('CONST'):
+            types[table_token.id] = token.NUMBER
+        elif table_token.lexogram in Lexical.KEYWORDS:
+            types[table_token.id] = token.NAME
+        else:
+            types[table_token.id] = token.OP
+    return types
+
+
+STDLIB_TYPES = stdlib_types()
+STRING_ID = Lexical.TABLE_TOKENS['STRING'].id
+QUOTE_IDS = {
+    Lexical.TABLE_TOKENS[name].id
+    for name in ('QUOTE', 'DQUOTE', 'TRIPLEQUOTE', 'TRIPLEDQUOTE')}
+# types without text to compare
+WITHOUT_TEXT = (token.INDENT, token.DEDENT, token.ENDMARKER)
+
+
+def append(tokens, token_type, text, line):
+    """
+        Append a compared token, a statement end removes the ';' before it
+    """
+    if token_type == token.NEWLINE:
+        while tokens and tokens[-1][:2] == (token.OP, ';'):
+            tokens.pop()
+        return
+    if token_type in WITHOUT_TEXT:
+        text = ''
+    tokens.append((token_type, text, line))
+
+
+def lexical_tokens(tokens):
+    """
+        Return the (stdlib type, text, line) compared of the tokens of
+        Lexical, the lines counted from 1
+    """
+    compared = []
+    # the text and line of the string being joined
+    string = None
+    for table_token in tokens:
+        token_id = table_token['token']
+        if string is not None:
+            if token_id == STRING_ID:
+                string[0] += table_token['lexogram']
+                continue
+            text = string[0]
+            if token_id in QUOTE_IDS:
+                text += table_token['lexogram']
+            append(compared, token.STRING, text, string[1])
+            string = None
+            if token_id in QUOTE_IDS:
+                continue
+
+        if token_id in QUOTE_IDS:
+            string = [table_token['lexogram'], table_token['line'] + 1]
+        else:
+            append(
+                compared, STDLIB_TYPES[token_id], table_token['lexogram'],
+                table_token['line'] + 1)
+    return compared
+
+
+def stdlib_tokens(tokens):
+    """
+        Return the (stdlib type, text, line) compared of the tokens of
+        tokenize
+    """
+    compared = []
+    for stdlib_token in tokens:
+        if stdlib_token.type in (token.NL, token.COMMENT):
+            continue
+        append(
+            compared, stdlib_token.type, stdlib_token.string,
+            stdlib_token.start[0])
+    return compared
+
+
+def first_difference(source, engine='regex'):
+    """
+        Return None when both lexers agree on source, or the first tokens
+        that differ: ((type name, text, line) of Lexical, of tokenize),
+        None past the end of the tokens
+    """
+    instance = Lexical(io.StringIO(source), engine=engine)
+    instance.decode()
+    ours = lexical_tokens(instance.tokens)
+    theirs = stdlib_tokens(
+        tokenize.generate_tokens(io.StringIO(source).readline))
+
+    for position in range(max(len(ours), len(theirs))):
+        mine = ours[position] if position < len(ours) else None
+        other = theirs[position] if position < len(theirs) else None
+        if mine is None or other is None or mine[:2] != other[:2]:
+            return tuple(
+                None if item is None else
+                (token.tok_name[item[0]],) + item[1:]
+                for item in (mine, other))
+    return None
+
+
+def lex(source, engine):
+    instance = Lexical(io.StringIO(source), engine=engine)
+    instance.decode()
+    return len(instance.tokens)
+
+
+def stdlib_lex(source):
+    # the tokens are kept, as decode() does
+    return len(list(tokenize.generate_tokens(io.StringIO(source).readline)))
+
+
+def measure(function, repeat, *args):
+    """
+        Return the number of tokens of function(*args), the best time of
+        repeat runs and the peak of bytes traced by tracemalloc
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'tokens': tokens,
+        'seconds': best,
+        'tokens_per_second': tokens / best if best else 0,
+        'peak_kb': peak // 1024,
+    }
+
+
+def stdlib_sources(engine='regex'):
+    """
+        Yield the (name, source) of the files on the top of the stdlib that
+        Lexical can lex
+    """
+    directory = sysconfig.get_paths()['stdlib']
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        try:
+            with open(path, encoding='utf-8') as input_file:
+                source = input_file.read()
+            Lexical(io.StringIO(source), engine=engine).decode()
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        yield 'stdlib/' + os.path.basename(path), source
+
+
+def corpus_sources(kinds, sizes, seed):
+    for kind in kinds:
+        for size in sizes:
+            yield '{}/{}'.format(kind, size), corpus.generate(
+                kind, corpus.SIZES[size], seed)
+
+
+def compare(sources, engines, repeat):
+    """
+        Return a case for each source and engine: the measures of both
+        lexers and the first difference of their tokens
+    """
+    cases = []
+    for name, source in sources:
+        stdlib = measure(stdlib_lex, repeat, source)
+        for engine in engines:
+            difference = first_difference(source, engine)
+            case = {
+                'source': name,
+                'engine': engine,
+                'lexical': measure(lex, repeat, source, engine),
+                'tokenize': stdlib,
+                'difference': difference,
+            }
+            cases.append(case)
+            print('{:>28} {:>6} {:>10.0f} tokens/s {:>8} KB | tokenize '
+                  '{:>10.0f} tokens/s {:>8} KB | {:>5.2f}x {}'.format(
+                      name, engine, case['lexical']['tokens_per_second'],
+                      case['lexical']['peak_kb'],
+                      stdlib['tokens_per_second'], stdlib['peak_kb'],
+                      case['lexical']['seconds'] / stdlib['seconds'],
+                      'ok' if difference is None else 'differs'),
+                  file=sys.stderr)
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stdlib')
+    parser.add_argument('--kinds', default=','.join(corpus.KINDS))
+    parser.add_argument(
+        '--sizes', default='100K',
+        help='comma separated, from {}'.format(', '.join(corpus.SIZES)))
+    parser.add_argument('--engines', default='regex')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--stdlib', action='store_true',
+        help='compare the files of the stdlib Lexical can lex too')
+    parser.add_argument('--output', help='JSON file of the results')
+    arguments = parser.parse_args(argv)
+
+    sources = list(corpus_sources(
+        arguments.kinds.split(','), arguments.sizes.split(','),
+        arguments.seed))
+    if arguments.stdlib:
+        sources.extend(stdlib_sources())
+    cases = compare(sources, arguments.engines.split(','), arguments.repeat)
+
+    def shorten(item):
+        if item is None:
+            return 'nothing'
+        token_type, text, line = item
+        if len(text) > 40:
+            text = text[:37] + '...'
+        return '{} {!r} on line {}'.format(token_type, text, line)
+
+    differences = [case for case in cases if case['difference']]
+    for case in differences:
+        ours, theirs = case['difference']
+        print('{} ({}): Lexical {}, tokenize {}'.format(
+            case['source'], case['engine'], shorten(ours), shorten(theirs)))
+    print('{} of {} cases differ'.format(len(differences), len(cases)))
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': cases,
+    }
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
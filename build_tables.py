@@ -0,0 +1,32 @@
+"""
+    Generate scanner_tables.py from Lexical.TABLE_TOKENS.
+
+        python build_tables.py [output]
+
+    lexical.py generates it again on import when the table changes, this
+    script is the build step run after editing the table
+"""
+import argparse
+import sys
+
+from lexical import (
+    SCANNER_TABLES_PATH, Lexical, build_scanner_tables, write_scanner_tables)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python build_tables.py',
+        description='Generate the scanner tables module.')
+    parser.add_argument(
+        'output', nargs='?', default=SCANNER_TABLES_PATH,
+        help='path of the module (default: {})'.format(SCANNER_TABLES_PATH))
+    arguments = parser.parse_args(argv)
+
+    write_scanner_tables(
+        build_scanner_tables(Lexical.TABLE_TOKENS), arguments.output)
+    print('wrote {}'.format(arguments.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
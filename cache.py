@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+from lexical import Lexical
+from token_buffer import TokenBuffer
+
+
+class DirectoryStore(object):
+    """
+        Store each entry on a file of a directory, the modification time of
+        the file is the last time the entry was used
+    """
+
+    SUFFIX = '.tokens'
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + DirectoryStore.SUFFIX)
+
+    def touch(self, entry_path):
+        # the time of the use is taken from time.time(), as on SQLiteStore,
+        # not from the file system (whose timestamps may be coarse)
+        now = time.time()
+        os.utime(entry_path, (now, now))
+
+    def get(self, key):
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'rb') as entry:
+                data = entry.read()
+            self.touch(entry_path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key, data):
+        entry_path = self.entry_path(key)
+        temporary_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+        with open(temporary_path, 'wb') as entry:
+            entry.write(data)
+        os.replace(temporary_path, entry_path)
+        self.touch(entry_path)
+
+    def entries(self):
+        """
+            Return (last use, size, key) of each entry
+        """
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(DirectoryStore.SUFFIX):
+                stat = entry.stat()
+                entries.append((
+                    stat.st_mtime, stat.st_size,
+                    entry.name[:-len(DirectoryStore.SUFFIX)]))
+        return entries
+
+    def remove(self, key):
+        try:
+            os.remove(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteStore(object):
+    """
+        Store the entries on a table of an SQLite database
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS tokens ('
+            'key TEXT PRIMARY KEY, data BLOB, size INTEGER, used REAL)')
+
+    def get(self, key):
+        with self.connection:
+            row = self.connection.execute(
+                'SELECT data FROM tokens WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                'UPDATE tokens SET used = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, key, data):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)',
+                (key, data, len(data), time.time()))
+
+    def entries(self):
+        return list(self.connection.execute(
+            'SELECT used, size, key FROM tokens'))
+
+    def remove(self, key):
+        with self.connection:
+            self.connection.execute('DELETE FROM tokens WHERE key = ?', (key,))
+
+
+class TokenCache(object):
+    """
+        Cache of the tokens recognized from each input, the entries are
+        identified by the hash of the input and the fingerprint of the lexer
+        table. The least recently used entries are removed when the total
+        size of the entries pass max_size bytes.
+
+        path is a directory, or an SQLite file when it ends with '.sqlite'
+    """
+
+    def __init__(self, path, max_size=256 * 1024 * 1024, engine='regex'):
+        if path.endswith('.sqlite'):
+            self.store = SQLiteStore(path)
+        else:
+            self.store = DirectoryStore(path)
+        self.max_size = max_size
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+        self.size = sum(size for used, size, key in self.store.entries())
+
+    def key(self, data, kind):
+        digest = hashlib.sha256(Lexical.FINGERPRINT.encode('ascii'))
+        # the text of a file-like object already had its newlines translated
+        digest.update(kind)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def decode(self, input_file):
+        """
+            Return the tokens of a text file-like object on a TokenBuffer
+        """
+        text = input_file.read()
+        key = self.key(text.encode('utf-8', 'surrogatepass'), b'text')
+        return self.lookup(key, lambda: io.StringIO(text))
+
+    def lex_path(self, path):
+        """
+            Return the tokens of the utf-8 file on path on a TokenBuffer
+        """
+        with open(path, 'rb') as input_file:
+            data = input_file.read()
+        return self.lookup(
+            self.key(data, b'path'),
+            lambda: io.TextIOWrapper(io.BytesIO(data), encoding='utf-8'))
+
+    def lookup(self, key, open_input):
+        """
+            Return the cached tokens of key, or lex the file-like object
+            returned by open_input and cache its tokens
+        """
+        cached = self.store.get(key)
+        if cached is not None:
+            self.hits += 1
+            return TokenBuffer.frombytes(cached)
+
+        self.misses += 1
+        instance = Lexical(open_input(), engine=self.engine, storage='buffer')
+        instance.decode()
+
+        encoded = instance.tokens.tobytes()
+        self.store.put(key, encoded)
+        self.size += len(encoded)
+        if self.size > self.max_size:
+            self.evict()
+        return instance.tokens
+
+    def evict(self):
+        """
+            Remove the least recently used entries until the cache fits on
+            max_size
+        """
+        entries = sorted(self.store.entries())
+        self.size = sum(size for used, size, key in entries)
+        for used, size, key in entries:
+            if self.size <= self.max_size:
+                break
+            self.store.remove(key)
+            self.size -= size
@@ -0,0 +1,263 @@
+"""
+    Command-line batch lexer: lex the files under the given directories on
+    worker processes, streaming the results to stdout or to a file.
+
+        python -m folahe src/ tests/ --exclude 'build/*' --output tokens.ndjson
+        python -m folahe src/ --format binary --output tokens.bin
+        python -m folahe src/ --summary
+
+    The NDJSON output has a line per file, {"path", "tokens"} (the tokens
+    like Lexical.tokens) or {"path", "error"}. The binary output has a
+    record per file, read back by serialization.iter_records. --summary
+    writes the number of tokens of each class of each file, and the totals
+    on the last line.
+
+    The files are lexed in the order they're found, at most a few per
+    worker at a time, and each result is written as soon as it's done, so
+    the memory used doesn't grow with the number of files. The exit status
+    is 1 when a file had an error
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+
+from batch import lex_path
+from lexical import Lexical
+from serialization import dump_tokens, write_record
+
+
+FORMATS = ('ndjson', 'binary')
+# files submitted per worker ahead of the one being written
+WINDOW = 4
+
+FileResult = namedtuple("FileResult", ('path', 'output', 'error'))
+
+
+def class_names(table_tokens=Lexical.TABLE_TOKENS):
+    """
+        Return the name of each token class by id, and by (id, lexogram)
+        for the classes sharing an id (as EQUAL and DIFF)
+    """
+    classes = Counter(token.id for token in table_tokens.values())
+    names = {}
+    for name, token in table_tokens.items():
+        if classes[token.id] == 1:
+            names[token.id] = name
+        else:
+            names.setdefault((token.id, token.lexogram), name)
+    return names
+
+
+CLASS_NAMES = class_names()
+
+
+def class_counts(tokens):
+    """
+        Return a Counter with the number of tokens of each class, by name,
+        of a TokenBuffer
+    """
+    counts = Counter()
+    shared = Counter()
+    for token_id, count in tokens.count_ids().items():
+        if token_id in CLASS_NAMES:
+            counts[CLASS_NAMES[token_id]] = count
+        else:
+            shared[token_id] = count
+    if shared:
+        for token_id, string_index in zip(tokens.ids, tokens.lexograms):
+            if token_id in shared:
+                counts[CLASS_NAMES[
+                    token_id, tokens.strings[string_index]]] += 1
+    return counts
+
+
+def walk(roots, include=('*.py',), exclude=()):
+    """
+        Yield the files under roots matching an include pattern and none of
+        the exclude patterns, in a stable order. A pattern with a '/' is
+        matched against the path relative to its root, other patterns
+        against the name. The directories matching an exclude pattern
+        aren't walked, and a root that is a file is yielded as it is
+    """
+    def matches(relative, patterns):
+        name = relative.rsplit('/', 1)[-1]
+        return any(
+            fnmatch(relative if '/' in pattern else name, pattern)
+            for pattern in patterns)
+
+    for root in roots:
+        if not os.path.isdir(root):
+            yield root
+            continue
+
+        for directory, directories, files in os.walk(root):
+            relative = os.path.relpath(directory, root).replace(os.sep, '/')
+            prefix = '' if relative == '.' else relative + '/'
+            directories[:] = sorted(
+                name for name in directories
+                if not matches(prefix + name, exclude))
+            for name in sorted(files):
+                if (
+                        matches(prefix + name, include) and
+                        not matches(prefix + name, exclude)):
+                    yield os.path.join(directory, name)
+
+
+def lex_file(path, output_format='ndjson', summary=False, engine='regex'):
+    """
+        Lex the file on path, returning a FileResult with its output already
+        encoded: NDJSON or binary data, or a Counter on summary mode
+    """
+    result = lex_path(path, engine)
+    if result.error is not None:
+        return FileResult(path, None, result.error)
+
+    if summary:
+        output = class_counts(result.tokens)
+    elif output_format == 'binary':
+        output_file = io.BytesIO()
+        dump_tokens(result.tokens, output_file)
+        output = output_file.getvalue()
+    else:
+        output = json.dumps({'path': path, 'tokens': list(result.tokens)})
+    return FileResult(path, output, None)
+
+
+def lex_files(paths, workers=None, window=WINDOW, **options):
+    """
+        Yield the FileResult of each file of paths, in the same order,
+        lexing them on a pool of worker processes. At most window files per
+        worker are waiting to be consumed, so paths can be a generator of
+        any length.
+
+        With workers=1 the files are lexed on the current process
+    """
+    if workers == 1:
+        for path in paths:
+            yield lex_file(path, **options)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for path in paths:
+                pending.append(executor.submit(lex_file, path, **options))
+                if len(pending) >= workers * window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # the consumer stopped early, the files not started are dropped
+            for future in pending:
+                future.cancel()
+
+
+def format_error(path, error):
+    if error.line is None:
+        return "{}: {}: {}".format(path, error.type, error.message)
+    return "{}:{}:{}: {}: {}".format(
+        path, error.line, error.column, error.type, error.message)
+
+
+def run(arguments, output_file, error_file):
+    """
+        Lex the files of arguments writing the results on output_file (a
+        binary file-like object) and the errors on error_file, returning
+        the exit status
+    """
+    paths = walk(
+        arguments.paths, arguments.include or ('*.py',), arguments.exclude)
+    results = lex_files(
+        paths, workers=arguments.workers,
+        output_format=arguments.format, summary=arguments.summary,
+        engine=arguments.engine)
+
+    def write_line(value):
+        output_file.write(json.dumps(value).encode('utf-8') + b'\n')
+
+    totals = Counter()
+    files = errors = 0
+    try:
+        for result in results:
+            files += 1
+            if result.error is not None:
+                errors += 1
+                error_file.write(format_error(result.path, result.error))
+                error_file.write('\n')
+                if arguments.format == 'ndjson':
+                    write_line({
+                        'path': result.path,
+                        'error': result.error._asdict()})
+                if arguments.fail_fast:
+                    break
+            elif arguments.summary:
+                totals.update(result.output)
+                write_line({'path': result.path, 'counts': result.output})
+            elif arguments.format == 'binary':
+                write_record(output_file, result.path, result.output)
+            else:
+                output_file.write(result.output.encode('utf-8') + b'\n')
+    finally:
+        results.close()
+
+    if arguments.summary:
+        write_line({'files': files, 'errors': errors, 'counts': totals})
+    if errors:
+        error_file.write('{} of {} files with errors\n'.format(errors, files))
+    return 1 if errors else 0
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='folahe', description='Lex the python files under paths')
+    parser.add_argument(
+        'paths', nargs='+', help='directories (or files) to lex')
+    parser.add_argument(
+        '-o', '--output', help='file written instead of stdout')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='ndjson')
+    parser.add_argument(
+        '-j', '--workers', type=int,
+        help='worker processes (default: the number of CPUs)')
+    parser.add_argument(
+        '--include', action='append',
+        help="glob of the files lexed, can be repeated (default: '*.py')")
+    parser.add_argument(
+        '--exclude', action='append', default=[],
+        help='glob of the files and directories skipped, can be repeated')
+    parser.add_argument(
+        '--summary', action='store_true',
+        help='write only the number of tokens of each class')
+    parser.add_argument(
+        '--fail-fast', action='store_true',
+        help='stop on the first file with an error, instead of lexing all '
+             'the files and reporting each error')
+    parser.add_argument(
+        '--engine', choices=Lexical.ENGINES, default='regex')
+
+    arguments = parser.parse_args(argv)
+    if arguments.summary and arguments.format == 'binary':
+        parser.error('--summary is written as ndjson')
+    if arguments.workers is not None and arguments.workers < 1:
+        parser.error('--workers must be at least 1')
+    return arguments
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    if arguments.output is None:
+        output_file = sys.stdout.buffer
+        status = run(arguments, output_file, sys.stderr)
+        output_file.flush()
+        return status
+    with open(arguments.output, 'wb') as output_file:
+        return run(arguments, output_file, sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+
+from lexical import Lexical
+
+
+class Shifts(object):
+    """
+        Amounts added to the items of a sequence from some indexes on: the
+        amount of an item is the one of the last start not after its index.
+        An edit adding lines (or chars) shifts every item after it, the
+        shift is recorded here instead of rewriting each item
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.amounts = []
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def amount(self, index):
+        position = bisect_right(self.starts, index) - 1
+        return self.amounts[position] if position >= 0 else 0
+
+    def splice(self, start, stop, length, delta):
+        """
+            Update the amounts after the items from start up to (but not
+            including) stop are replaced by length items without amount,
+            the items after them getting delta more
+        """
+        after = self.amount(stop) + delta
+        offset = length - (stop - start)
+        later = bisect_right(self.starts, stop)
+        kept = bisect_left(self.starts, start)
+        starts = self.starts[:kept]
+        amounts = self.amounts[:kept]
+
+        def add(index, amount):
+            if amount != (amounts[-1] if amounts else 0):
+                starts.append(index)
+                amounts.append(amount)
+
+        if length:
+            add(start, 0)
+        add(start + length, after)
+        for index, amount in zip(self.starts[later:], self.amounts[later:]):
+            add(index + offset, amount + delta)
+        self.starts = starts
+        self.amounts = amounts
+
+
+class ShiftedSequence(Sequence):
+    """
+        Numbers stored as they were added, the amount of the shifts is added
+        to each one when it's read
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.shifts = Shifts()
+
+    def __repr__(self):
+        return "<{} {} items>".format(type(self).__name__, len(self))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+
+        item = self.items[index]
+        if not self.shifts:
+            return item
+        if index < 0:
+            index += len(self.items)
+        amount = self.shifts.amount(index)
+        return self.shift(item, amount) if amount else item
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            item == other_item for item, other_item in zip(self, other))
+
+    def shift(self, item, amount):
+        return item + amount
+
+    def append(self, item):
+        amount = self.shifts.amount(len(self.items)) if self.shifts else 0
+        self.items.append(self.shift(item, -amount) if amount else item)
+
+    def splice(self, start, stop, items, delta):
+        """
+            Replace the items from start up to (but not including) stop by
+            items, adding delta to the ones after them
+        """
+        self.items[start:stop] = items
+        self.shifts.splice(start, stop, len(items), delta)
+
+
+class ShiftedTokens(ShiftedSequence):
+    """
+        Tokens (dicts like Lexical.tokens) whose lines are shifted when
+        they're read
+    """
+
+    def shift(self, token, amount):
+        return dict(token, line=token['line'] + amount)
+
+    def line(self, index):
+        line = self.items[index]['line']
+        return line + self.shifts.amount(index) if self.shifts else line
+
+    def first_token(self, line):
+        """
+            Return the index of the first token on line or after it
+        """
+        low, high = 0, len(self.items)
+        while low < high:
+            middle = (low + high) // 2
+            if self.line(middle) < line:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class IncrementalLexical(Lexical):
+    """
+        Lexical keeping the lines of the input and a checkpoint of the scan
+        state at the start of each line, so after an edit only the edited
+        lines (and the following ones, while their tokens change) are
+        recognized again.
+
+        The checkpoints are only kept for the lines outside of strings, the
+        state inside an string would have to copy the string content. The
+        lines of the tokens and the line offsets after an edit are shifted
+        when they're read (see ShiftedSequence), so an edit doesn't rewrite
+        the rest of the file
+    """
+
+    def __init__(self, input_file, engine='char'):
+        super().__init__(input_file, engine=engine)
+
+    def reset(self, input_file=None):
+        super().reset(input_file)
+        self.tokens = ShiftedTokens(self.tokens)
+        self.line_offsets = ShiftedSequence(self.line_offsets)
+        self.lines = []
+        self.checkpoints = []
+
+    @property
+    def input_lines(self):
+        """
+            The lines of the input, with the edits of relex once decoded
+        """
+        if self.checkpoints:
+            return self.lines
+        return super().input_lines
+
+    def kept_lines(self, state, lines):
+        """
+            Return the lines as they're read, source_lines keeps them on
+            self.lines
+        """
+        return lines
+
+    def release_tokens(self, state=None):
+        raise TypeError(
+            "the tokens of an IncrementalLexical are kept to be re-lexed")
+
+    def lex(self, source):
+        raise TypeError(
+            "an IncrementalLexical re-lexes its own input, use decode")
+
+    def checkpoint(self):
+        """
+            Return the state of the scan at the start of a line, or None if
+            the line starts inside an string. The first token of the line is
+            the first one with its line number
+        """
+        if self.string_flag:
+            return None
+        return (tuple(self.context_stack), self.last_token_id)
+
+    def restore(self, checkpoint, line_index):
+        self.context_stack = list(checkpoint[0])
+        self.last_token_id = checkpoint[1]
+        self.string_flag = None
+        self.string_context = []
+        self.line_index = line_index
+
+    def source_lines(self, state):
+        for line in super().source_lines(state):
+            self.lines.append(line)
+            self.checkpoints.append(self.checkpoint())
+            yield line
+
+        # state before the DEDENT and ENDMARKER tokens
+        self.checkpoints.append(self.checkpoint())
+
+    def relex(self, first_line, last_line, new_lines):
+        """
+            Replace the lines from first_line up to (but not including)
+            last_line by new_lines and update the tokens. Return the range of
+            indexes of the tokens recognized again
+        """
+        if not 0 <= first_line <= last_line <= len(self.lines):
+            raise IndexError("invalid line range {}:{}".format(
+                first_line, last_line))
+
+        delta = len(new_lines) - (last_line - first_line)
+        final_state = (
+            self.context_stack, self.last_token_id, self.string_flag,
+            self.string_context)
+        old_checkpoints = self.checkpoints
+        old_tokens = self.tokens
+        old_token_objects = self.token_objects
+        old_lines = self.lines[first_line:last_line]
+        self.lines[first_line:last_line] = new_lines
+
+        # the scan restarts from the nearest line outside of an string
+        start_line = first_line
+        while old_checkpoints[start_line] is None:
+            start_line -= 1
+        first_token = old_tokens.first_token(start_line)
+        self.restore(old_checkpoints[start_line], start_line)
+
+        self.tokens = []
+        self.token_objects = []
+        try:
+            checkpoints, converged = self.rescan(
+                start_line, first_line + len(new_lines), delta,
+                old_checkpoints)
+        except Exception:
+            # the previous state is kept when the new lines are invalid
+            self.lines[first_line:first_line + len(new_lines)] = old_lines
+            self.tokens = old_tokens
+            self.token_objects = old_token_objects
+            (self.context_stack, self.last_token_id, self.string_flag,
+             self.string_context) = final_state
+            self.line_index = len(self.lines)
+            raise
+
+        new_tokens = self.tokens
+        new_token_objects = self.token_objects
+        if converged is None:
+            old_index = len(old_tokens)
+            converged = len(old_checkpoints)
+        else:
+            old_index = old_tokens.first_token(converged)
+            (self.context_stack, self.last_token_id, self.string_flag,
+             self.string_context) = final_state
+
+        # the tokens after the converged line keep their lines, shifted by
+        # delta when they're read
+        old_tokens.splice(first_token, old_index, new_tokens, delta)
+        old_token_objects[first_token:old_index] = new_token_objects
+        old_checkpoints[start_line:converged] = checkpoints
+        self.tokens = old_tokens
+        self.token_objects = old_token_objects
+
+        # only the offsets of the edited lines are written, the following
+        # ones are shifted by the change of length
+        offsets = array('q', accumulate(
+            map(len, new_lines), initial=self.line_offsets[first_line]))
+        self.line_offsets.splice(
+            first_line + 1, last_line + 1, offsets[1:],
+            offsets[-1] - self.line_offsets[last_line])
+        self.state.token_offsets = None
+
+        # the scan state must be the one of the end of the input
+        self.line_index = len(self.lines)
+        return range(first_token, first_token + len(new_tokens))
+
+    def rescan(self, line_index, end_edit, delta, old_checkpoints):
+        """
+            Recognize the lines starting on line_index until the scan state
+            is the same of the previous scan after the edited lines. Return
+            the new checkpoints and the index (on old_checkpoints) of the line
+            where the scan converged, or None if it reached the end
+        """
+        checkpoints = []
+        decode_line = (
+            self.decode_line_regex if self.engine == 'regex'
+            else self.decode_line)
+
+        while True:
+            checkpoint = self.checkpoint()
+            if (
+                    line_index >= end_edit and checkpoint is not None and
+                    old_checkpoints[line_index - delta] == checkpoint):
+                # the state is the same of the previous scan, so are the
+                # remaining tokens
+                return checkpoints, line_index - delta
+
+            checkpoints.append(checkpoint)
+            if line_index == len(self.lines):
+                self.finish(self.state)
+                return checkpoints, None
+            decode_line(self.state, self.lines[line_index])
+            line_index += 1
@@ -0,0 +1,172 @@
+"""
+    Opt-in profiling of the lexer. attach() replaces, on a single instance,
+    the helper methods and the patterns of the hot path with wrappers that
+    count and time them, so an instance without instrumentation runs the
+    same code as before
+"""
+import time
+from collections import Counter, defaultdict
+
+
+# methods timed, the times are inclusive: the time of process_line includes
+# the time of the methods it calls
+HELPERS = (
+    'decode', 'decode_line', 'decode_line_regex', 'manage_context',
+    'update_context', 'decode_line_bytes', 'process_line',
+    'process_line_regex', 'process_line_bytes', 'table_token',
+    'discover_token',
+    'discover_const_or_identifier', 'const_decimal', 'const_float',
+    'const_hex_oct_bin', 'const_zero', 'identifier', 'string_body',
+    'string_body_bytes', 'finish',
+)
+
+
+class LexicalStats(object):
+    """
+        Counters of an instrumented run:
+
+        tokens and characters: number of tokens and of lexogram chars of
+        each token class (a STRING counts the chars of its content)
+        calls and time: calls and seconds spent on each helper
+        regex_calls: calls to the patterns of the regex and bytes engines
+        fallbacks: tokens not decided by the table, found by
+        discover_const_or_identifier
+        max_depth: deepest identation level
+        longest_dedent: most DEDENT tokens added by a single line
+    """
+
+    def __init__(self):
+        self.tokens = Counter()
+        self.characters = Counter()
+        self.calls = Counter()
+        self.time = defaultdict(float)
+        self.regex_calls = 0
+        self.max_depth = 0
+        self.longest_dedent = 0
+
+    def __repr__(self):
+        return "<LexicalStats {} tokens, {} regex calls>".format(
+            sum(self.tokens.values()), self.regex_calls)
+
+    @property
+    def fallbacks(self):
+        return self.calls['discover_const_or_identifier']
+
+    def as_dict(self):
+        """
+            Return the counters as plain dicts, ready to be serialized
+        """
+        return {
+            'tokens': dict(self.tokens),
+            'characters': dict(self.characters),
+            'calls': dict(self.calls),
+            'time': dict(self.time),
+            'regex_calls': self.regex_calls,
+            'fallbacks': self.fallbacks,
+            'max_depth': self.max_depth,
+            'longest_dedent': self.longest_dedent,
+        }
+
+
+class CountingPattern(object):
+    """
+        Compiled pattern counting the calls on lexical.stats.regex_calls
+    """
+
+    def __init__(self, pattern, lexical):
+        self.pattern = pattern
+        self.lexical = lexical
+
+    def match(self, *args):
+        self.lexical.stats.regex_calls += 1
+        return self.pattern.match(*args)
+
+    def search(self, *args):
+        self.lexical.stats.regex_calls += 1
+        return self.pattern.search(*args)
+
+    def fullmatch(self, *args):
+        self.lexical.stats.regex_calls += 1
+        return self.pattern.fullmatch(*args)
+
+
+def token_names(table_tokens):
+    """
+        Map (id, lexogram) and id to the name of the token on the table. Some
+        tokens share the id, so the lexogram is looked up first
+    """
+    names = {}
+    for name, token in table_tokens.items():
+        names.setdefault((token.id, token.lexogram), name)
+        names.setdefault(token.id, name)
+    return names
+
+
+def timed(method, lexical, name):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            # read at the end of each call, reset() (called by decode)
+            # replaces the stats
+            stats = lexical.stats
+            stats.calls[name] += 1
+            stats.time[name] += time.perf_counter() - start
+    return wrapper
+
+
+def attach(lexical, callback=None):
+    """
+        Instrument the Lexical instance, returning its LexicalStats. The
+        callback, when given, is called with the stats at the end of the
+        input. reset() starts new stats on lexical.stats, the counters of
+        the inputs lexed at once by lex() are added to the same stats
+    """
+    stats = LexicalStats()
+    lexical.stats = stats
+    names = token_names(lexical.TABLE_TOKENS)
+
+    for name in HELPERS:
+        setattr(lexical, name, timed(getattr(lexical, name), lexical, name))
+
+    add_token = lexical.add_token
+
+    def counting_add_token(state, token, column):
+        stats = lexical.stats
+        name = names.get((token.id, token.lexogram)) or names[token.id]
+        stats.tokens[name] += 1
+        if token.lexogram is not None:
+            stats.characters[name] += len(token.lexogram)
+        add_token(state, token, column)
+    lexical.add_token = counting_add_token
+
+    update_context = lexical.update_context
+
+    def measured_update_context(state, number_characters):
+        depth = len(state.context_stack)
+        try:
+            update_context(state, number_characters)
+        finally:
+            stats = lexical.stats
+            stats.max_depth = max(
+                stats.max_depth, len(state.context_stack) - 1)
+            stats.longest_dedent = max(
+                stats.longest_dedent, depth - len(state.context_stack))
+    lexical.update_context = measured_update_context
+
+    for attribute in ('SCANNER', 'BYTES_SCANNER'):
+        scanner = getattr(lexical, attribute)
+        setattr(lexical, attribute, scanner._replace(**{
+            field: CountingPattern(getattr(scanner, field), lexical)
+            for field in ('token', 'blank', 'indentation', 'quote')}))
+
+    if callback is not None:
+        finish = lexical.finish
+
+        def reporting_finish(state):
+            finish(state)
+            callback(lexical.stats)
+        lexical.finish = reporting_finish
+
+    return stats
@@ -1,8 +1,423 @@
-import re
+import io
+import os
+from array import array
 from collections import namedtuple
+from itertools import accumulate
 
 
 Token = namedtuple("Token", ('id', 'lexogram'))
+Diagnostic = namedtuple(
+    "Diagnostic", ('type', 'message', 'line', 'column'))
+Scanner = namedtuple(
+    "Scanner",
+    ('token', 'blank', 'indentation', 'quote', 'operators', 'quotes',
+     'keywords'))
+ScannerTables = namedtuple(
+    "ScannerTables",
+    ('fingerprint', 'tokens_by_first_char', 'operators_by_first_char',
+     'keywords', 'token_pattern'))
+
+# the classes of the single chars tested by the char engine. A lookup on
+# them doesn't compile a pattern on the first call of each test, as the
+# re.match of a pattern literal does, and re is imported only by the
+# scanners of the strings and of the regex engine
+DIGITS = frozenset('0123456789')
+LETTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+IDENTIFIER_START = LETTERS | {'_'}
+IDENTIFIER_CHARS = IDENTIFIER_START | DIGITS
+DECIMAL_CHARS = DIGITS | {'_'}
+HEX_DIGITS = DIGITS | frozenset('abcdefABCDEF')
+OCT_DIGITS = frozenset('01234567')
+BIN_DIGITS = frozenset('01')
+# the line endings of the universal newlines mode, compiled only for the
+# mapped files with '\r' endings
+NEWLINE_PATTERN = rb'\r\n?|\n'
+
+# must be increased when a change on the scanner changes the tokens
+# recognized from the same input
+LEXER_VERSION = 1
+
+# module generated by build_tables.py, see load_scanner_tables
+SCANNER_TABLES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'scanner_tables.py')
+
+
+# the names defined by scanner_tables.py, a module without any of them
+# (as one cut by another process writing it) is generated again
+SCANNER_TABLES_NAMES = (
+    'TABLE', 'FINGERPRINT', 'TOKENS_BY_FIRST_CHAR', 'OPERATORS_BY_FIRST_CHAR',
+    'KEYWORDS', 'TOKEN_PATTERN')
+
+
+def table_fingerprint(table_tokens):
+    """
+        Return an hash identifying the table of tokens and the lexer version
+    """
+    # imported here, the import of hashlib is a good part of the startup
+    # time and the fingerprint is read from scanner_tables.py
+    import hashlib
+
+    description = repr((LEXER_VERSION, sorted(table_tokens.items())))
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def describe_table(table_tokens):
+    """
+        Return the table of tokens and the lexer version as plain tuples, the
+        tables generated from it are stale when it changes
+    """
+    return (LEXER_VERSION, tuple(
+        (name, token.id, token.lexogram)
+        for name, token in table_tokens.items()))
+
+
+def is_word(lexogram):
+    """
+        Tell if the lexogram is a reserved word, not an operator
+    """
+    return lexogram[0] in IDENTIFIER_START
+
+
+def index_by_first_char(table_tokens):
+    """
+        Map each first char to the tokens with starts with it, in the same
+        order of the table
+    """
+    index = {}
+    for token in table_tokens.values():
+        if token.lexogram is not None:
+            index.setdefault(token.lexogram[0], []).append(token)
+    return {char: tuple(tokens) for char, tokens in index.items()}
+
+
+def index_operators_by_first_char(table_tokens):
+    """
+        Map each first char to the non reserved word tokens with starts with
+        it, sorted by precedence: when more than one token matches, the
+        first one of the tuple is the chosen one
+    """
+    index = {}
+    for token in table_tokens.values():
+        if token.lexogram is not None and not is_word(token.lexogram):
+            index.setdefault(token.lexogram[0], []).append(token)
+    return {
+        char: tuple(sorted(tokens, reverse=True))
+        for char, tokens in index.items()
+    }
+
+
+def index_keywords(table_tokens):
+    """
+        Map each reserved word to its token
+    """
+    return {
+        token.lexogram: token for token in table_tokens.values()
+        if token.lexogram is not None and is_word(token.lexogram)
+    }
+
+
+def index_quotes(table_tokens):
+    """
+        Map the lexogram of each quote to its token
+    """
+    return {
+        table_tokens[name].lexogram: table_tokens[name]
+        for name in ('QUOTE', 'DQUOTE', 'TRIPLEQUOTE', 'TRIPLEDQUOTE')}
+
+
+def find_quote(line, column):
+    """
+        Return the index of the first quote of line from column on, or -1
+    """
+    single = line.find("'", column)
+    double = line.find('"', column)
+    if single == -1 or double == -1:
+        return max(single, double)
+    return min(single, double)
+
+
+def scanner_operators(table_tokens):
+    """
+        Return the non reserved word tokens, sorted by precedence
+    """
+    return sorted((
+        token for token in table_tokens.values()
+        if token.lexogram is not None and not is_word(token.lexogram)),
+        reverse=True)
+
+
+def scanner_pattern(table_tokens):
+    """
+        Build the token pattern of the regex engine. It matches a whole token
+        per call, its alternatives are tried in the same order that the char
+        by char engine decides between them
+    """
+    import re
+
+    exponent = r'(?:[eE][+\-]?[0-9]*)'
+    # the blanks before the token are consumed by the same match
+    return r'[ \t]*(?:{})'.format('|'.join([
+        r'(?P<identifier>(?P<word>[a-zA-Z_]+)[0-9a-zA-Z_]*)',
+        r'(?P<float>(?:0|[1-9][0-9]*)(?:\.[0-9]*{exp}?|{exp})'
+        r'|\.(?=\d)[0-9]*{exp}?)'.format(exp=exponent),
+        r'(?P<hex>0[xX][0-9a-fA-F]*)',
+        r'(?P<oct>0[oO][0-7]*)',
+        r'(?P<bin>0[bB][01]*)',
+        r'(?P<decimal>[1-9][0-9_]*|0)',
+        r'(?P<operator>{})'.format('|'.join(
+            re.escape(token.lexogram)
+            for token in scanner_operators(table_tokens))),
+        r'(?P<error>.)',
+        r'(?P<end>\Z)',
+    ]))
+
+
+def compile_scanner(table_tokens, token_pattern=None, encoding=None):
+    """
+        Build the patterns used by the regex engine, token_pattern is built
+        from the table when not given. With an encoding the patterns and the
+        keys of the lookups are bytes, as used by the bytes engine
+    """
+    # imported here, the import of re is most of the startup time and the
+    # char engine only needs it for the strings
+    import re
+
+    if token_pattern is None:
+        token_pattern = scanner_pattern(table_tokens)
+
+    def literal(text):
+        return text if encoding is None else text.encode(encoding)
+
+    quotes = {
+        literal(lexogram): token
+        for lexogram, token in index_quotes(table_tokens).items()}
+
+    return Scanner(
+        token=re.compile(literal(token_pattern), re.DOTALL),
+        blank=re.compile(literal(r'[ \t\r\n]*')),
+        indentation=re.compile(literal(r'[ \t]*')),
+        quote=re.compile(literal(r'[\'"]')),
+        operators={
+            literal(token.lexogram): token
+            for token in scanner_operators(table_tokens)},
+        quotes=quotes,
+        keywords={
+            literal(lexogram): token
+            for lexogram, token in index_keywords(table_tokens).items()},
+    )
+
+
+class LazyScanner(object):
+    """
+        Class attribute compiling the scanner on the first access, most of
+        the char engine runs never use it
+    """
+
+    def __init__(self, table_tokens, token_pattern, encoding=None):
+        self.table_tokens = table_tokens
+        self.token_pattern = token_pattern
+        self.encoding = encoding
+        self.scanner = None
+
+    def __get__(self, instance, owner):
+        if self.scanner is None:
+            self.scanner = compile_scanner(
+                self.table_tokens, self.token_pattern, self.encoding)
+        return self.scanner
+
+
+def build_scanner_tables(table_tokens):
+    """
+        Build the tables derived from table_tokens, referencing the tokens by
+        name, as they're written on scanner_tables.py
+    """
+    names = {token: name for name, token in table_tokens.items()}
+
+    def by_first_char(index):
+        return {
+            char: tuple(names[token] for token in tokens)
+            for char, tokens in index.items()}
+
+    return {
+        'TABLE': describe_table(table_tokens),
+        'FINGERPRINT': table_fingerprint(table_tokens),
+        'TOKENS_BY_FIRST_CHAR': by_first_char(
+            index_by_first_char(table_tokens)),
+        'OPERATORS_BY_FIRST_CHAR': by_first_char(
+            index_operators_by_first_char(table_tokens)),
+        'KEYWORDS': {
+            lexogram: names[token]
+            for lexogram, token in index_keywords(table_tokens).items()},
+        'TOKEN_PATTERN': scanner_pattern(table_tokens),
+    }
+
+
+def split_literal(text, width):
+    """
+        Split text in string literals of at most width chars
+    """
+    literals = []
+    part = ''
+    for char in text:
+        if part and len(repr(part + char)) > width:
+            literals.append(repr(part))
+            part = ''
+        part += char
+    literals.append(repr(part))
+    return literals
+
+
+def scanner_tables_source(tables):
+    """
+        Return the source of the scanner_tables module holding tables
+    """
+    lines = [
+        '"""',
+        '    Tables of the scanner, generated by build_tables.py from',
+        '    Lexical.TABLE_TOKENS. Do not edit, lexical.py generates it again',
+        '    when the table changes',
+        '"""',
+        '',
+        'TABLE = ({!r}, ('.format(tables['TABLE'][0]),
+    ]
+    lines.extend('    {!r},'.format(row) for row in tables['TABLE'][1])
+    lines.extend([
+        '))',
+        '',
+        'FINGERPRINT = (',
+    ])
+    lines.extend(
+        '    ' + literal for literal in split_literal(
+            tables['FINGERPRINT'], 70))
+    lines.append(')')
+    for name in ('TOKENS_BY_FIRST_CHAR', 'OPERATORS_BY_FIRST_CHAR',
+                 'KEYWORDS'):
+        lines.extend(['', '{} = {{'.format(name)])
+        lines.extend(
+            '    {!r}: {!r},'.format(key, value)
+            for key, value in sorted(tables[name].items()))
+        lines.append('}')
+    lines.extend(['', 'TOKEN_PATTERN = ('])
+    lines.extend(
+        '    ' + literal for literal in split_literal(
+            tables['TOKEN_PATTERN'], 70))
+    lines.append(')')
+    return '\n'.join(lines) + '\n'
+
+
+def write_scanner_tables(tables, path=SCANNER_TABLES_PATH):
+    """
+        Write the scanner_tables module, replacing it atomically. Each
+        process writes its own temporary file, so a process importing while
+        others write never reads a partial module
+    """
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'w') as tables_file:
+        tables_file.write(scanner_tables_source(tables))
+    os.replace(temporary_path, path)
+
+
+def load_scanner_tables(table_tokens, path=SCANNER_TABLES_PATH):
+    """
+        Return the ScannerTables of table_tokens. They're read from
+        scanner_tables.py, generated again when it's missing or was
+        generated from another table
+    """
+    tables = {}
+    try:
+        if path == SCANNER_TABLES_PATH:
+            # imported as the other modules, so its bytecode is cached and
+            # importlib.machinery isn't imported on each startup
+            import scanner_tables
+            tables = vars(scanner_tables)
+        else:
+            from importlib.machinery import SourceFileLoader
+            loader = SourceFileLoader('scanner_tables', path)
+            exec(loader.get_code('scanner_tables'), tables)
+    except (ImportError, OSError, SyntaxError):
+        pass
+
+    if tables.get('TABLE') != describe_table(table_tokens) or any(
+            name not in tables for name in SCANNER_TABLES_NAMES):
+        tables = build_scanner_tables(table_tokens)
+        try:
+            write_scanner_tables(tables, path)
+        except OSError:
+            # a read-only install builds the tables on each import
+            pass
+
+    def by_first_char(index):
+        return {
+            char: tuple(table_tokens[name] for name in names)
+            for char, names in index.items()}
+
+    return ScannerTables(
+        fingerprint=tables['FINGERPRINT'],
+        tokens_by_first_char=by_first_char(tables['TOKENS_BY_FIRST_CHAR']),
+        operators_by_first_char=by_first_char(
+            tables['OPERATORS_BY_FIRST_CHAR']),
+        keywords={
+            lexogram: table_tokens[name]
+            for lexogram, name in tables['KEYWORDS'].items()},
+        token_pattern=tables['TOKEN_PATTERN'],
+    )
+
+
+class ScanState(object):
+    """
+        The input, the tokens and the scan state of a single lexing. The
+        methods of the scan receive it, so a Lexical keeps only its options
+        and many inputs can be lexed at once by a single instance (see
+        Lexical.lex)
+    """
+
+    def __init__(self, input_file, tokens, token_objects, index=None):
+        self.input_file = input_file
+        # set by from_path: the mapped file
+        self.mapped = None
+        # the lines read, kept by decode (see Lexical.input_lines)
+        self.input_lines = None
+        self.diagnostics = []
+        self.tokens = tokens
+        self.token_objects = token_objects
+        self.index = index
+        self.last_token_id = None
+        self.column_index = 0
+        self.line_index = 0
+        self.string_flag = False
+        # the parts of the content of the string being recognized, they are
+        # joined when the string is closed
+        self.string_context = []
+
+        # this var store the current identation level (in number of chars)
+        self.context_stack = [0]
+
+        # the tokens of the identifiers and numbers found, by lexogram (the
+        # lexogram decides the id). Repeated lexograms reuse a single token
+        # and string
+        self.interned = {}
+
+        # the offset (in chars) of the start of each line read, and of the
+        # end of the input after the last one. The offsets of the tokens
+        # are built from it when token_at is first called
+        self.line_offsets = array('q', [0])
+        self.token_offsets = None
+
+    def __repr__(self):
+        return "<ScanState {} tokens>".format(len(self.tokens))
+
+
+def state_property(name):
+    """
+        Attribute of the Lexical read from (and written to) its current
+        ScanState
+    """
+    def get(self):
+        return getattr(self.state, name)
+
+    def set(self, value):
+        setattr(self.state, name, value)
+    return property(get, set)
 
 
 class Lexical(object):
@@ -107,90 +522,353 @@ class Lexical(object):
         'AWAIT': Token(id=97, lexogram="await"),
         'DOT': Token(id=98, lexogram="."),
         'ENDPRODUCTION': Token(id=99, lexogram='$'),
+        'ERROR': Token(id=100, lexogram=None),
     }
 
-    def __init__(self, input_file):
+    # indexes built once from TABLE_TOKENS, they avoid scanning the whole
+    # table for each char analyzed. They're precomputed on scanner_tables.py
+    SCANNER_TABLES = load_scanner_tables(TABLE_TOKENS)
+    TOKENS_BY_FIRST_CHAR = SCANNER_TABLES.tokens_by_first_char
+    OPERATORS_BY_FIRST_CHAR = SCANNER_TABLES.operators_by_first_char
+    KEYWORDS = SCANNER_TABLES.keywords
+    FINGERPRINT = SCANNER_TABLES.fingerprint
+    QUOTES = index_quotes(TABLE_TOKENS)
+    SCANNER = LazyScanner(TABLE_TOKENS, SCANNER_TABLES.token_pattern)
+    # the token pattern is ascii, so the bytes engine only scans ascii lines
+    BYTES_SCANNER = LazyScanner(
+        TABLE_TOKENS, SCANNER_TABLES.token_pattern, 'ascii')
+
+    # most lexograms interned by an instance, the ones found after it's
+    # full get tokens of their own
+    INTERN_SIZE = 1 << 16
+
+    ENGINES = ('char', 'regex')
+    # engines reading a binary file-like object
+    BINARY_ENGINES = ('bytes',)
+    STORAGES = ('list', 'buffer')
+
+    # the state of the input of the last reset, used by decode, iter_tokens
+    # and stream
+    input_file = state_property('input_file')
+    mapped = state_property('mapped')
+    diagnostics = state_property('diagnostics')
+    tokens = state_property('tokens')
+    token_objects = state_property('token_objects')
+    index = state_property('index')
+    last_token_id = state_property('last_token_id')
+    column_index = state_property('column_index')
+    line_index = state_property('line_index')
+    string_flag = state_property('string_flag')
+    string_context = state_property('string_context')
+    context_stack = state_property('context_stack')
+    interned = state_property('interned')
+    line_offsets = state_property('line_offsets')
+
+    def __init__(
+            self, input_file, engine='char', storage='list', instrument=None,
+            recover=False, index=False):
+        if engine not in Lexical.ENGINES + Lexical.BINARY_ENGINES:
+            raise ValueError("engine must be one of {}".format(
+                ', '.join(Lexical.ENGINES + Lexical.BINARY_ENGINES)))
+        if storage not in Lexical.STORAGES:
+            raise ValueError("storage must be one of {}".format(
+                ', '.join(Lexical.STORAGES)))
+        self.engine = engine
+        self.storage = storage
+        # on recover mode the errors are kept on self.diagnostics and an
+        # ERROR token is added in place of the invalid input
+        self.recover = recover
+        # with index True the tokens are indexed by id and line as they are
+        # added (see query.py), the positions count every token recognized
+        self.build_index = index
+        # set by from_path: the encoding of the lines of the mapped file
+        self.encoding = 'utf-8'
+        self.intern_size = self.INTERN_SIZE
+        # with instrument True (or a callback receiving the stats at the end
+        # of the input) the counters of the run are kept on self.stats
+        self.stats = None
+        self.state = None
+        self.reset(input_file)
+
+        if instrument:
+            # imported here, as the other opt-in features
+            import instrumentation
+            instrumentation.attach(
+                self, None if instrument is True else instrument)
+
+    def new_state(self, input_file):
+        """
+            Return a ScanState of input_file, with new containers for the
+            tokens
+        """
         if not hasattr(input_file, 'read'):
             raise TypeError("input_file must be a file-like object")
-        self.input_lines = input_file.readlines()
-        self.tokens = []
-        self.token_objects = []
-        self.column_index = 0
-        self.line_index = 0
-        self.string_flag = False
-        self.string_context = ''
+        if self.storage == 'buffer':
+            # compact storage, the tokens are read through views. Imported
+            # here, so the list storage doesn't pay for struct and array
+            from token_buffer import TokenBuffer
+            tokens = TokenBuffer()
+            token_objects = tokens.token_objects(Token)
+        else:
+            tokens = []
+            token_objects = []
+        index = None
+        if self.build_index:
+            from query import TokenIndex
+            index = TokenIndex()
+        return ScanState(input_file, tokens, token_objects, index)
 
-        # this var store the current identation level (in number of chars)
-        self.context_stack = [0]
+    def reset(self, input_file=None):
+        """
+            Forget the tokens and the scan state of the last input, so the
+            instance lexes input_file (or keeps its input, when None) as a
+            new one. The tokens already returned aren't changed, each input
+            gets new containers. A file opened by from_path is closed when
+            it's replaced, and the stats of an instrumented instance start
+            again
+        """
+        state = self.state
+        if input_file is None and state is not None:
+            self.state = self.new_state(state.input_file)
+            self.state.mapped = state.mapped
+        else:
+            self.state = self.new_state(input_file)
+            if state is not None and state.mapped is not None:
+                # the file and its mapping were opened by from_path
+                self.close(state)
+        if self.stats is not None:
+            import instrumentation
+            self.stats = instrumentation.LexicalStats()
+
+    @classmethod
+    def from_path(cls, path, encoding='utf-8', **kwargs):
+        """
+            Lexical of the file on path using the bytes engine. The file is
+            memory mapped and scanned line by line, so neither a copy of the
+            whole file nor its decoded text are kept. close() unmaps it
+        """
+        # imported here, most programs never map a file
+        import mmap
+
+        input_file = open(path, 'rb')
+        try:
+            if input_file.seek(0, 2):
+                mapped = mmap.mmap(
+                    input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # an empty file can't be mapped
+                mapped = b''
+            instance = cls(input_file, engine='bytes', **kwargs)
+        except BaseException:
+            input_file.close()
+            raise
+        instance.mapped = mapped
+        instance.encoding = encoding
+        return instance
 
     def __repr__(self):
         return "<Lexical {}>".format(self.tokens)
 
-    def add_token(self, token, column):
-        if not self.tokens and token.id == Lexical.TABLE_TOKENS['INDENT'].id:
-            raise IndentationError
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self, state=None):
+        """
+            Close the input file, and the mapping when created by from_path
+        """
+        if state is None:
+            state = self.state
+        if hasattr(state.mapped, 'close'):
+            state.mapped.close()
+        state.input_file.close()
+
+    @property
+    def input_lines(self):
+        """
+            All the lines of the input, reading them on the first access.
+            decode() keeps the lines it reads, iter_tokens and stream don't
+            (the input is consumed, so they're read only before them). The
+            lines of a mapped file are copied from the mapping on each
+            access, they aren't kept
+        """
+        state = self.state
+        if state.input_lines is not None:
+            return state.input_lines
+        if state.mapped is not None:
+            return list(self.mapped_lines(state.mapped))
+        state.input_lines = state.input_file.readlines()
+        return state.input_lines
+
+    def source_lines(self, state):
+        """
+            Yield the lines of the input, reading them one by one
+        """
+        if state.input_lines is not None:
+            yield from state.input_lines
+            return
+
+        if state.mapped is not None:
+            yield from self.mapped_lines(state.mapped)
+            return
+
+        readline = state.input_file.readline
+        line = readline()
+        while line:
+            yield line
+            line = readline()
+
+    def mapped_lines(self, data):
+        """
+            Yield the lines of the mapped file, each one copied only when
+            it's reached. The '\r\n' and '\r' endings are translated to
+            '\n', as on the universal newlines mode of a text file
+        """
+        if data.find(b'\r') != -1:
+            yield from self.mapped_lines_with_cr(data)
+            return
+
+        find = data.find
+        start = 0
+        while start < len(data):
+            end = find(b'\n', start)
+            end = len(data) if end == -1 else end + 1
+            yield data[start:end]
+            start = end
+
+    def mapped_lines_with_cr(self, data):
+        """
+            Same as mapped_lines, for a file with '\r' endings
+        """
+        import re
+
+        search = re.compile(NEWLINE_PATTERN).search
+        start = 0
+        while start < len(data):
+            newline = search(data, start)
+            if newline is None:
+                yield data[start:]
+                return
+            if newline.group() == b'\n':
+                yield data[start:newline.end()]
+            else:
+                yield data[start:newline.start()] + b'\n'
+            start = newline.end()
 
-        if token.lexogram == '\n' and self.tokens[-1]['token'] not in (31, 93, 94):
+    def add_token(self, state, token, column):
+        if token.lexogram == '\n' and state.last_token_id not in (31, 93, 94):
             # at the end of each statement are autmatic added a token ';',
             # this facilitate the grammar construction
-            semicolon_token = next(filter(
-                lambda val: val.lexogram == ';',
-                Lexical.TABLE_TOKENS.values()))
-            self.tokens.append({
-                'token': semicolon_token.id,
-                'lexogram': ';',
-                'line': self.line_index,
-                'column': column,
-            })
-            self.token_objects.append(semicolon_token)
-
-        self.tokens.append({
+            self.add_token(state, Lexical.TABLE_TOKENS['SEMICOLON'], column)
+
+        state.last_token_id = token.id
+        # the token is stored here and not by a method of its own, this one
+        # is called for each token
+        if state.index is not None:
+            state.index.add(token.id, state.line_index)
+        if self.storage == 'buffer':
+            state.tokens.add(
+                token.id, token.lexogram, state.line_index, column)
+            return
+
+        state.tokens.append({
             'token': token.id,
             'lexogram': token.lexogram,
-            'line': self.line_index,
+            'line': state.line_index,
             'column': column
         })
-        self.token_objects.append(token)
+        state.token_objects.append(token)
+
+    def intern_token(self, state, token_id, lexogram, key=None):
+        """
+            Return the token of an identifier or a number, the same object
+            for each occurrence of lexogram. key is the lexogram before
+            being decoded, on the bytes engine
+        """
+        key = lexogram if key is None else key
+        token = state.interned.get(key)
+        if token is None:
+            token = Token(token_id, lexogram)
+            if len(state.interned) < self.intern_size:
+                state.interned[key] = token
+        return token
+
+    def syntax_error(self, state, error, column, lexogram=None):
+        """
+            Raise the error, or on recover mode keep it as a Diagnostic and
+            add an ERROR token, so the caller can skip the invalid input
+        """
+        if not self.recover:
+            raise error
+
+        state.diagnostics.append(Diagnostic(
+            type(error).__name__, str(error), state.line_index, column))
+        self.add_token(
+            state,
+            Token(id=Lexical.TABLE_TOKENS['ERROR'].id, lexogram=lexogram),
+            column=column)
 
-    def manage_context(self, line):
+    def manage_context(self, state, line):
         # here the identation is recognized
         context_lexogram = ''
-        while re.match(r'( |\t)', line[self.column_index]):
-            context_lexogram += line[self.column_index]
-            self.column_index += 1
+        while line[state.column_index] in ' \t':
+            context_lexogram += line[state.column_index]
+            state.column_index += 1
 
         # by default tabs are considered eight spaces
         context_lexogram = context_lexogram.replace('\t', ' ' * 8)
 
-        number_characters = len(context_lexogram)
-        if number_characters == self.context_stack[-1]:
+        self.update_context(state, len(context_lexogram))
+
+    def update_context(self, state, number_characters):
+        """
+            Compare the identation of the current line with the identation
+            stack, adding the INDENT and DEDENT tokens
+        """
+        if number_characters == state.context_stack[-1]:
             # same identation level just pass
             pass
-        elif number_characters > self.context_stack[-1]:
+        elif number_characters > state.context_stack[-1]:
+            if state.last_token_id is None:
+                # the first line can't be idented, when recovering it's
+                # taken as not idented
+                self.syntax_error(
+                    state, IndentationError("unexpected indent"), column=0)
+                return
+
             # identation level increase
-            self.context_stack.append(number_characters)
-            self.add_token(Lexical.TABLE_TOKENS['INDENT'], column=0)
-        elif number_characters < self.context_stack[-1]:
+            state.context_stack.append(number_characters)
+            self.add_token(state, Lexical.TABLE_TOKENS['INDENT'], column=0)
+        elif number_characters < state.context_stack[-1]:
             # identation level decreased
-            if number_characters not in self.context_stack:
+            if number_characters not in state.context_stack:
                 # if the current number of chars isn't on stack,
                 # this means that a wrong identation are found
-                raise IndentationError
+                self.syntax_error(state, IndentationError(
+                    "unindent does not match any outer identation level"),
+                    column=0)
+                # when recovering, the line is taken as idented on the
+                # nearest level
+                number_characters = min(
+                    state.context_stack,
+                    key=lambda level: abs(level - number_characters))
 
-            while number_characters != self.context_stack[-1]:
+            while number_characters != state.context_stack[-1]:
                 # while an identation level equal to the current
                 # number of charactres are found, dedent tokens are
                 # added.
-                self.context_stack.pop()
+                state.context_stack.pop()
                 self.add_token(
-                    Lexical.TABLE_TOKENS['DEDENT'], column=0)
+                    state, Lexical.TABLE_TOKENS['DEDENT'], column=0)
 
-    def is_blank_line(self, line):
+    def is_blank_line(self, state, line):
         cleaned_line = line.replace('\n', '').replace('\r', '')
         cleaned_line = cleaned_line.replace(' ', '').replace('\t', '')
 
-        if not self.string_flag and not cleaned_line:
-            self.line_index += 1
+        if not state.string_flag and not cleaned_line:
+            state.line_index += 1
             return True
         return False
 
@@ -198,12 +876,40 @@ class Lexical(object):
         """
             Return a list of tokens with starts with this char
         """
-        return [
-            token for token in Lexical.TABLE_TOKENS.values()
-            if token.lexogram is not None and token.lexogram.startswith(char)
-        ]
+        return list(Lexical.TOKENS_BY_FIRST_CHAR.get(char, ()))
 
-    def discover_const_or_identifier(self, char, line):
+    def table_token(self, state, char, line):
+        """
+            Return the reserved word or operator starting on the current
+            column, or None if the token is an constant or an identifier
+        """
+        if char == '.':
+            next_column = state.column_index + 1
+            if (
+                    next_column < len(line) and
+                    line[next_column].isdecimal()):
+                # if the next element is an number this means that this dot
+                # is part of an float number
+                return None
+
+        if char in IDENTIFIER_START:
+            # a reserved word can't be followed by a letter, so only the
+            # whole sequence of letters must be looked up
+            end = state.column_index + 1
+            while end < len(line) and line[end] in IDENTIFIER_START:
+                end += 1
+            token = Lexical.KEYWORDS.get(line[state.column_index:end])
+            if token:
+                state.column_index += len(token.lexogram)
+            return token
+
+        for token in Lexical.OPERATORS_BY_FIRST_CHAR.get(char, ()):
+            if line.startswith(token.lexogram, state.column_index):
+                state.column_index += len(token.lexogram)
+                return token
+        return None
+
+    def discover_const_or_identifier(self, state, char, line):
         """
             This method discover if the string analyzed is an constant or an
             indentifier and return the correct token object
@@ -212,242 +918,647 @@ class Lexical(object):
             # if this token starts with zero, means that it's a const zero
             # or a number in hex/oct/bin notation, or an zero in scientific
             # notation (eg: 0e123)
-            if self.column_index + 1 >= len(line):
-                return self.const_zero()
-            elif re.match(r'(x|o|b|X|O|B)', line[self.column_index + 1]):
-                return self.const_hex_oct_bin(line)
-            elif re.match(r'(e|E|\.)', line[self.column_index + 1]):
-                return self.const_float(line)
+            if state.column_index + 1 >= len(line):
+                return self.const_zero(state)
+            elif line[state.column_index + 1] in 'xobXOB':
+                return self.const_hex_oct_bin(state, line)
+            elif line[state.column_index + 1] in 'eE.':
+                return self.const_float(state, line)
             else:
-                return self.const_zero()
+                return self.const_zero(state)
         elif char == '.':
-            return self.const_float(line)
-        elif re.match(r'[0-9]', char):
-            return self.const_decimal(line)
-        elif re.match(r'(_|[A-Z]|[a-z])', char):
-            return self.identifier(line)
-
-    def const_decimal(self, line):
-        lexogram = ''
-        column = self.column_index
-
-        while column < len(line) and re.match(r'([0-9]|_)', line[column]):
-            lexogram += line[column]
+            return self.const_float(state, line)
+        elif char in DIGITS:
+            return self.const_decimal(state, line)
+        elif char in IDENTIFIER_START:
+            return self.identifier(state, line)
+
+    def const_decimal(self, state, line):
+        column = state.column_index
+
+        while column < len(line) and line[column] in DECIMAL_CHARS:
             column += 1
-        if column < len(line) and re.match(r'(\.|e|E)', line[column]):
-            return self.const_float(line)
+        if column < len(line) and line[column] in '.eE':
+            return self.const_float(state, line)
 
-        self.column_index = column
+        lexogram = line[state.column_index:column]
+        state.column_index = column
         const_dec = Lexical.TABLE_TOKENS['CONSTDEC']
-        return Token(id=const_dec.id, lexogram=lexogram)
+        return self.intern_token(state, const_dec.id, lexogram)
 
-    def identifier(self, line):
-        column = self.column_index
-        lexogram = ''
+    def identifier(self, state, line):
+        column = state.column_index
 
-        while (
-               column < len(line) and
-               re.match(r'([0-9]|_|[A-Z]|[a-z])', line[column])):
-            lexogram += line[column]
+        while column < len(line) and line[column] in IDENTIFIER_CHARS:
             column += 1
 
-        self.column_index = column
+        lexogram = line[state.column_index:column]
+        state.column_index = column
         token_id = Lexical.TABLE_TOKENS['ID']
-        return Token(id=token_id.id, lexogram=lexogram)
+        return self.intern_token(state, token_id.id, lexogram)
 
-    def const_hex_oct_bin(self, line):
-        self.column_index += 1
+    def const_hex_oct_bin(self, state, line):
+        state.column_index += 1
         mods = {
             'x': {
                 'token': Lexical.TABLE_TOKENS['CONSTHEX'],
-                'pattern': r'([0-9]|[a-f]|[A-F])'},
+                'chars': HEX_DIGITS},
             'o': {
                 'token': Lexical.TABLE_TOKENS['CONSTOCT'],
-                'pattern': r'[0-7]'},
+                'chars': OCT_DIGITS},
             'b': {
                 'token': Lexical.TABLE_TOKENS['CONSTBIN'],
-                'pattern': r'[0-1]'},
+                'chars': BIN_DIGITS},
         }
 
-        char = line[self.column_index]
+        char = line[state.column_index]
         token_type = mods[char.lower()]
-        lexogram = '0{}'.format(char)
-        column = self.column_index + 1
+        start = state.column_index - 1
+        column = state.column_index + 1
 
-        while (
-               column < len(line) and
-               re.match(token_type['pattern'], line[column])):
-            lexogram += line[column]
+        while column < len(line) and line[column] in token_type['chars']:
             column += 1
 
-        self.column_index = column
-        token = Token(id=token_type['token'].id, lexogram=lexogram)
-        return token
+        state.column_index = column
+        return self.intern_token(
+            state, token_type['token'].id, line[start:column])
 
-    def const_float(self, line):
-        column = self.column_index
-        lexogram = ''
+    def const_float(self, state, line):
+        column = state.column_index
 
-        if re.match(r'[0-9]', line[column]):
-            while column < len(line) and re.match(r'[0-9]', line[column]):
-                lexogram += line[column]
+        if line[column] in DIGITS:
+            while column < len(line) and line[column] in DIGITS:
                 column += 1
 
         elif line[column] == '.':
             pass
         else:
             raise SyntaxError("Token {} ({}:{})".format(
-                line[column], self.line_index, self.column_index))
+                line[column], state.line_index, state.column_index))
 
         if column < len(line) and '.' == line[column]:
-            lexogram += '.'
             column += 1
-            while column < len(line) and re.match(r'[0-9]', line[column]):
-                lexogram += line[column]
+            while column < len(line) and line[column] in DIGITS:
                 column += 1
-        elif column < len(line) and re.match(r'(e|E)', line[column]):
+        elif column < len(line) and line[column] in 'eE':
             pass
         else:
             raise SyntaxError("Token {} ({}:{})".format(
-                line[column], self.line_index, self.column_index))
+                line[column], state.line_index, state.column_index))
 
-        if column < len(line) and re.match(r'(e|E)', line[column]):
-            lexogram += line[column]
+        if column < len(line) and line[column] in 'eE':
             column += 1
-            if column < len(line) and re.match(r'(\+|\-)', line[column]):
-                lexogram += line[column]
+            if column < len(line) and line[column] in '+-':
                 column += 1
-            while column < len(line) and re.match(r'[0-9]', line[column]):
-                lexogram += line[column]
+            while column < len(line) and line[column] in DIGITS:
                 column += 1
 
-        self.column_index = column
+        lexogram = line[state.column_index:column]
+        state.column_index = column
         const_float = Lexical.TABLE_TOKENS['CONSTFLOAT']
-        return Token(id=const_float.id, lexogram=lexogram)
+        return self.intern_token(state, const_float.id, lexogram)
 
-    def const_zero(self):
-        self.column_index += 1
+    def const_zero(self, state):
+        state.column_index += 1
         const_dec = Lexical.TABLE_TOKENS['CONSTDEC']
-        token = Token(id=const_dec.id, lexogram='0')
-        return token
+        return self.intern_token(state, const_dec.id, '0')
 
-    def discover_token(self, line, possible_tokens):
+    def discover_token(self, state, line, possible_tokens):
         def valid_token(token):
-            lexogram = ''
-            column = self.column_index
-            for char in token.lexogram:
-                if line[column] == char:
-                    lexogram += char
-                    column += 1
-            if lexogram == token.lexogram:
-                if not re.match(r'[a-zA-Z]+', lexogram):
-                    return True
-
-                try:
-                    return not bool(re.match(r'[a-zA-Z_]+', line[column]))
-                except IndexError:
-                    return True
-            else:
+            if not line.startswith(token.lexogram, state.column_index):
                 return False
+            if token.lexogram[0] not in LETTERS:
+                return True
+
+            column = state.column_index + len(token.lexogram)
+            return column >= len(line) or line[column] not in IDENTIFIER_START
 
         compatible_tokens = list(filter(valid_token, possible_tokens))
         if not compatible_tokens:
             return None
         chosed_token = sorted(compatible_tokens, reverse=True)[0]
-        self.column_index += len(chosed_token.lexogram)
+        state.column_index += len(chosed_token.lexogram)
         return chosed_token
 
-    def process_line(self, line):
-        while self.column_index < len(line):
-            start_column = self.column_index
-            char = line[self.column_index]
+    def process_line(self, state, line):
+        while state.column_index < len(line):
+            if state.string_flag:
+                # the string content is consumed up to the next quote at once
+                state.column_index = self.string_body(
+                    state, line, state.column_index)
+                continue
+
+            start_column = state.column_index
+            char = line[state.column_index]
 
             if char in (' ', '\t'):
-                if self.string_flag:
-                    self.string_context += char
-                self.column_index += 1
+                state.column_index += 1
                 continue
 
-            possible_tokens = self.possible_tokens_for_char(char)
-            try:
-                dot_token = next(filter(
-                    lambda token: token.lexogram == '.', possible_tokens))
-
-                if re.match(r'\d', line[self.column_index + 1]):
-                    # if the next element is an number this means that this dot
-                    # is part of an float number
-                    possible_tokens.remove(dot_token)
-            except StopIteration:
-                pass
-
-            chosed_token = None
-            if not possible_tokens:
-                # if has no possible_token this means that the token is an
-                # constant of an identifier
-                chosed_token = self.discover_const_or_identifier(char, line)
-            else:
-                chosed_token = self.discover_token(line, possible_tokens)
-                if not chosed_token:
-                    # if chosed_token is None at this point this means that
-                    # this token is an id who starts with the same char that
-                    # some reserverd word
+            chosed_token = self.table_token(state, char, line)
+            if not chosed_token:
+                # if chosed_token is None at this point this means that
+                # this token is an constant or an identifier (maybe an id who
+                # starts with the same chars that some reserverd word)
+                try:
                     chosed_token = self.discover_const_or_identifier(
-                        char, line)
+                        state, char, line)
+                except SyntaxError as error:
+                    # an invalid number, its first char is skipped
+                    self.syntax_error(state, error, start_column, char)
+                    state.column_index = start_column + 1
+                    continue
 
             if chosed_token:
-                if self.string_flag and chosed_token == self.string_flag:
-                    string_token = Token(id=92, lexogram=self.string_context)
-                    self.add_token(
-                        string_token,
-                        column=start_column - len(self.string_context))
-                    self.string_flag = None
-                    self.string_context = ''
-
-                elif chosed_token in (
+                if chosed_token in (
                     Lexical.TABLE_TOKENS['QUOTE'],
                     Lexical.TABLE_TOKENS['DQUOTE'],
                     Lexical.TABLE_TOKENS['TRIPLEQUOTE'],
                     Lexical.TABLE_TOKENS['TRIPLEDQUOTE']):
-                    self.string_flag = chosed_token
-
-                elif self.string_flag:
-                    self.string_context += chosed_token.lexogram
-                    continue
+                    state.string_flag = chosed_token
 
                 elif chosed_token.lexogram == '#':
                     self.add_token(
-                        Lexical.TABLE_TOKENS['NEWLINE'],
-                        column=self.column_index)
+                        state, Lexical.TABLE_TOKENS['NEWLINE'],
+                        column=state.column_index)
                     break
-                self.add_token(chosed_token, column=start_column)
+                self.add_token(state, chosed_token, column=start_column)
             else:
-                if self.string_flag:
-                    self.string_context += char
-                    self.column_index += 1
-                    continue
+                self.syntax_error(state, SyntaxError("Token {} ({}:{})".format(
+                    line[start_column], state.line_index,
+                    state.column_index)), start_column, char)
+                state.column_index = start_column + 1
+
+        state.line_index += 1
+
+    def process_line_regex(self, state, line):
+        """
+            Same as process_line, but consuming a whole token per match of
+            the scanner pattern
+        """
+        scanner = self.SCANNER
+        match_token = scanner.token.match
+        operators = scanner.operators
+        id_token = Lexical.TABLE_TOKENS['ID'].id
+        add_token = self.add_token
+        interned = state.interned
+        intern_token = self.intern_token
+        column = state.column_index
+        line_length = len(line)
+
+        while column < line_length:
+            if state.string_flag:
+                column = self.string_body(state, line, column)
+                continue
+
+            match = match_token(line, column)
+            kind = match.lastgroup
+            column = match.start(kind)
+            if kind == 'identifier':
+                token = Lexical.KEYWORDS.get(match.group('word'))
+                if token:
+                    add_token(state, token, column=column)
+                    column = match.end('word')
+                else:
+                    lexogram = match.group(kind)
+                    add_token(
+                        state, interned.get(lexogram) or
+                        intern_token(state, id_token, lexogram), column=column)
+                    column = match.end()
+            elif kind == 'operator':
+                token = operators[match.group(kind)]
+                if token.lexogram in scanner.quotes:
+                    state.string_flag = token
+                elif token.lexogram == '#':
+                    add_token(
+                        state, Lexical.TABLE_TOKENS['NEWLINE'],
+                        column=column + 1)
+                    break
+                add_token(state, token, column=column)
+                column = match.end()
+            elif kind == 'end':
+                break
+            elif kind == 'error':
+                state.column_index = column
+                self.syntax_error(state, SyntaxError("Token {} ({}:{})".format(
+                    line[column], state.line_index, column)),
+                    column, line[column])
+                column += 1
+            else:
+                if kind == 'decimal':
+                    end = match.end()
+                    if end < line_length and line[end] in '.eE':
+                        # an decimal with '_' can't be part of an float
+                        state.column_index = column
+                        self.syntax_error(
+                            state, SyntaxError("Token _ ({}:{})".format(
+                                state.line_index, column)),
+                            column, line[column])
+                        column += 1
+                        continue
+                    token_id = Lexical.TABLE_TOKENS['CONSTDEC'].id
                 else:
-                    raise SyntaxError("Token {} ({}:{})".format(
-                        line[start_column], self.line_index,
-                        self.column_index))
+                    token_id = Lexical.TABLE_TOKENS[
+                        'CONST' + kind.upper()].id
+                lexogram = match.group(kind)
+                add_token(
+                    state, interned.get(lexogram) or
+                    intern_token(state, token_id, lexogram), column=column)
+                column = match.end()
 
-        self.line_index += 1
+        state.column_index = line_length
+        state.line_index += 1
 
-    def decode(self):
-        for line in self.input_lines:
-            self.column_index = 0
+    def process_line_bytes(self, state, line):
+        """
+            Same as process_line_regex, over the bytes of an ascii line. The
+            lexograms are decoded only when their tokens are added
+        """
+        scanner = self.BYTES_SCANNER
+        match_token = scanner.token.match
+        operators = scanner.operators
+        keywords = scanner.keywords
+        id_token = Lexical.TABLE_TOKENS['ID'].id
+        add_token = self.add_token
+        interned = state.interned
+        intern_token = self.intern_token
+        column = state.column_index
+        line_length = len(line)
 
-            if self.is_blank_line(line):
-                # blank line, just ignore it
+        while column < line_length:
+            if state.string_flag:
+                column = self.string_body_bytes(state, line, column)
                 continue
 
-            if not self.string_flag:
-                self.manage_context(line)
+            match = match_token(line, column)
+            kind = match.lastgroup
+            column = match.start(kind)
+            if kind == 'identifier':
+                token = keywords.get(match.group('word'))
+                if token:
+                    add_token(state, token, column=column)
+                    column = match.end('word')
+                else:
+                    lexogram = match.group(kind)
+                    add_token(
+                        state, interned.get(lexogram) or intern_token(
+                            state, id_token, lexogram.decode('ascii'),
+                            lexogram),
+                        column=column)
+                    column = match.end()
+            elif kind == 'operator':
+                lexogram = match.group(kind)
+                token = operators[lexogram]
+                if lexogram in scanner.quotes:
+                    state.string_flag = token
+                elif token.lexogram == '#':
+                    add_token(
+                        state, Lexical.TABLE_TOKENS['NEWLINE'],
+                        column=column + 1)
+                    break
+                add_token(state, token, column=column)
+                column = match.end()
+            elif kind == 'end':
+                break
+            elif kind == 'error':
+                char = chr(line[column])
+                state.column_index = column
+                self.syntax_error(state, SyntaxError("Token {} ({}:{})".format(
+                    char, state.line_index, column)), column, char)
+                column += 1
+            else:
+                if kind == 'decimal':
+                    end = match.end()
+                    if end < line_length and line[end] in b'.eE':
+                        # an decimal with '_' can't be part of an float
+                        state.column_index = column
+                        self.syntax_error(
+                            state, SyntaxError("Token _ ({}:{})".format(
+                                state.line_index, column)),
+                            column, chr(line[column]))
+                        column += 1
+                        continue
+                    token_id = Lexical.TABLE_TOKENS['CONSTDEC'].id
+                else:
+                    token_id = Lexical.TABLE_TOKENS[
+                        'CONST' + kind.upper()].id
+                lexogram = match.group(kind)
+                add_token(
+                    state, interned.get(lexogram) or intern_token(
+                        state, token_id, lexogram.decode('ascii'), lexogram),
+                    column=column)
+                column = match.end()
+
+        state.column_index = line_length
+        state.line_index += 1
 
-            self.process_line(line)
+    def string_body(self, state, line, column):
+        """
+            Consume the string content until the next quote, returning the
+            column after it. The content is kept as slices of the lines, so
+            a long string is copied only once, when it's closed
+        """
+        start = find_quote(line, column)
+        if start == -1:
+            state.string_context.append(line[column:])
+            return len(line)
 
-        for value in [ele for ele in self.context_stack if ele]:
-            self.add_token(Lexical.TABLE_TOKENS['DEDENT'], column=0)
+        state.string_context.append(line[column:start])
+        triple = line[start] * 3
+        if line.startswith(triple, start):
+            token = Lexical.QUOTES[triple]
+        else:
+            token = Lexical.QUOTES[line[start]]
+
+        if token == state.string_flag:
+            content = ''.join(state.string_context)
+            string_token = Token(id=92, lexogram=content)
+            self.add_token(state, string_token, column=start - len(content))
+            state.string_flag = None
+            state.string_context = []
+        else:
+            state.string_flag = token
+        self.add_token(state, token, column=start)
+        return start + len(token.lexogram)
+
+    def string_body_bytes(self, state, line, column):
+        """
+            Same as string_body, over the bytes of an ascii line
+        """
+        scanner = self.BYTES_SCANNER
+        quote = scanner.quote.search(line, column)
+        if not quote:
+            state.string_context.append(line[column:].decode('ascii'))
+            return len(line)
+
+        start = quote.start()
+        state.string_context.append(line[column:start].decode('ascii'))
+        triple = quote.group() * 3
+        if line.startswith(triple, start):
+            token = scanner.quotes[triple]
+        else:
+            token = scanner.quotes[quote.group()]
+
+        if token == state.string_flag:
+            content = ''.join(state.string_context)
+            string_token = Token(id=92, lexogram=content)
+            self.add_token(state, string_token, column=start - len(content))
+            state.string_flag = None
+            state.string_context = []
+        else:
+            state.string_flag = token
+        self.add_token(state, token, column=start)
+        return start + len(token.lexogram)
+
+    def decode_line(self, state, line):
+        state.column_index = 0
+
+        if self.is_blank_line(state, line):
+            # blank line, just ignore it
+            return
+
+        if not state.string_flag:
+            self.manage_context(state, line)
+
+        self.process_line(state, line)
+
+    def decode_line_regex(self, state, line):
+        state.column_index = 0
+
+        if not state.string_flag:
+            scanner = self.SCANNER
+            if scanner.blank.fullmatch(line):
+                # blank line, just ignore it
+                state.line_index += 1
+                return
+
+            context_lexogram = scanner.indentation.match(line).group()
+            state.column_index = len(context_lexogram)
+            # by default tabs are considered eight spaces
+            self.update_context(
+                state, state.column_index + 7 * context_lexogram.count('\t'))
+
+        self.process_line_regex(state, line)
+
+    def decode_line_bytes(self, state, line):
+        if not line.isascii():
+            # the columns count chars, so the few lines with other chars are
+            # decoded and recognized by the regex engine
+            self.decode_line_regex(state, line.decode(self.encoding))
+            return
+
+        state.column_index = 0
+
+        if not state.string_flag:
+            scanner = self.BYTES_SCANNER
+            if scanner.blank.fullmatch(line):
+                # blank line, just ignore it
+                state.line_index += 1
+                return
+
+            context_lexogram = scanner.indentation.match(line).group()
+            state.column_index = len(context_lexogram)
+            # by default tabs are considered eight spaces
+            self.update_context(
+                state, state.column_index + 7 * context_lexogram.count(b'\t'))
+
+        self.process_line_bytes(state, line)
+
+    def scan(self, state=None, keep_lines=False):
+        """
+            Recognize the input of state (default: self.state) line by line,
+            the tokens are added to state.tokens. This generator yields
+            after each line and after the end of the input. With keep_lines
+            the lines read are kept as state.input_lines
+        """
+        if state is None:
+            state = self.state
+        if self.engine == 'regex':
+            decode_line = self.decode_line_regex
+        elif self.engine == 'bytes':
+            decode_line = self.decode_line_bytes
+        else:
+            decode_line = self.decode_line
+
+        binary = self.engine in Lexical.BINARY_ENGINES
+        line_offsets = state.line_offsets
+        lines = self.source_lines(state)
+        if keep_lines and state.input_lines is None:
+            lines = self.kept_lines(state, lines)
+        for line in lines:
+            decode_line(state, line)
+            length = len(line)
+            if binary and not line.isascii():
+                length = len(line.decode(self.encoding))
+            line_offsets.append(line_offsets[-1] + length)
+            yield
+
+        self.finish(state)
+        yield
+
+    def kept_lines(self, state, lines):
+        """
+            Yield the lines, keeping them on state.input_lines once all of
+            them are read
+        """
+        kept = []
+        for line in lines:
+            kept.append(line)
+            yield line
+        state.input_lines = kept
+
+    def finish(self, state):
+        """
+            Add the tokens of the end of the input: a DEDENT for each
+            identation level still open and the ENDMARKER
+        """
+        for value in [ele for ele in state.context_stack if ele]:
+            self.add_token(state, Lexical.TABLE_TOKENS['DEDENT'], column=0)
 
         self.add_token(
-            Token(id=Lexical.TABLE_TOKENS['ENDMARKER'].id,
-                  lexogram='$'), column=0)
+            state,
+            Token(id=Lexical.TABLE_TOKENS['ENDMARKER'].id, lexogram='$'),
+            column=0)
+        # the tokens added keep the interned lexograms they use
+        state.interned.clear()
+
+    def iter_tokens(self):
+        """
+            Yield the tokens as soon as each line is recognized. The input is
+            read lazily and the yielded tokens aren't kept on the instance,
+            so the memory used doesn't grow with the input size. Neither are
+            the line offsets, offset_of and token_at need decode
+        """
+        state = self.state
+        for _ in self.scan(state):
+            yield from state.tokens
+            self.release_tokens(state)
+
+    def release_tokens(self, state=None):
+        """
+            Forget the tokens recognized, the offsets of the lines read and
+            the interned lexograms, there are no tokens left to share them
+        """
+        if state is None:
+            state = self.state
+        state.tokens.clear()
+        if self.storage == 'list':
+            state.token_objects.clear()
+        state.interned.clear()
+        del state.line_offsets[:-1]
+
+    def stream(self, consumer, batch_size=1024):
+        """
+            Hand the tokens to consumer in lists of about batch_size tokens
+            (the tokens of whole lines), as they are recognized. consumer is
+            a callable, or a queue (as queue.Queue(maxsize)) that receives
+            None after the last list, even when an error is raised.
+
+            Only the current line, the identation levels and the string
+            still open are kept, and the input is read only while consumer
+            accepts the tokens: a full queue blocks the reading, so a slow
+            consumer throttles the stream instead of the tokens piling up
+        """
+        put = getattr(consumer, 'put', consumer)
+        state = self.state
+        try:
+            for _ in self.scan(state):
+                if len(state.tokens) >= batch_size:
+                    put(list(state.tokens))
+                    self.release_tokens(state)
+            if state.tokens:
+                put(list(state.tokens))
+                self.release_tokens(state)
+        finally:
+            if put is not consumer:
+                put(None)
+
+    def source_file(self, source):
+        """
+            Return source (a str, bytes or a file-like object) as a
+            file-like object of the kind read by the engine: the text is
+            encoded for the bytes engine, the bytes are decoded for the others
+        """
+        binary = self.engine in Lexical.BINARY_ENGINES
+        if isinstance(source, str):
+            if binary:
+                return io.BytesIO(source.encode(self.encoding))
+            return io.StringIO(source)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            if binary:
+                return io.BytesIO(source)
+            return io.StringIO(bytes(source).decode(self.encoding))
+        return source
+
+    def lex(self, source):
+        """
+            Recognize the whole source (a str, bytes or a file-like object),
+            returning its ScanState: the tokens, the diagnostics and the
+            offsets of the lines. The instance isn't changed, so it can lex
+            many sources at once, on many threads
+        """
+        state = self.new_state(self.source_file(source))
+        for _ in self.scan(state):
+            pass
+        return state
+
+    def decode(self, source=None):
+        """
+            Recognize the whole input, returning self.tokens. With source (a
+            str, bytes or a file-like object) the instance is reset to lex
+            it, so a single instance can lex many inputs, one at a time
+        """
+        if source is not None:
+            self.reset(self.source_file(source))
+        # the lines of a mapped file can be read again from the mapping
+        keep_lines = self.state.mapped is None
+        for _ in self.scan(self.state, keep_lines=keep_lines):
+            pass
+        return self.tokens
+
+    def offset_of(self, token_index):
+        """
+            Return the offset (in chars) of the token on the input
+        """
+        token = self.tokens[token_index]
+        return self.line_offsets[token['line']] + token['column']
+
+    def token_offsets(self):
+        """
+            Return a sorted array with the offset of each token, built again
+            when tokens were added since the last call. The STRING after a
+            quote of the other kind inside a string has its column counted
+            from that quote, its offset is raised to the previous one
+        """
+        state = self.state
+        if (
+                state.token_offsets is None or
+                len(state.token_offsets) != len(state.tokens)):
+            line_offsets = state.line_offsets
+            if self.storage == 'buffer':
+                offsets = (
+                    line_offsets[line] + column for line, column in zip(
+                        state.tokens.lines, state.tokens.columns))
+            else:
+                offsets = (
+                    line_offsets[token['line']] + token['column']
+                    for token in state.tokens)
+            state.token_offsets = array('q', accumulate(offsets, max))
+        return state.token_offsets
+
+    def token_at(self, offset):
+        """
+            Return the index of the token whose lexogram covers the offset,
+            or None when the offset is on a blank or a comment. The tokens
+            without lexogram (INDENT and DEDENT) cover no offset
+        """
+        from bisect import bisect_right
+
+        offsets = self.token_offsets()
+        index = bisect_right(offsets, offset) - 1
+        if index < 0:
+            return None
+        lexogram = self.tokens[index]['lexogram']
+        if offset < offsets[index] + len(lexogram or ''):
+            return index
+        return None
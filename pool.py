@@ -0,0 +1,107 @@
+"""
+    Bounded pool of reusable Lexical instances for programs lexing on many
+    threads. An instance lexes one input at a time, the pool hands each one
+    to a single thread until it's released:
+
+        lexers = LexerPool(size=8, engine='regex')
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lexers.decode, sources))
+
+    At most size instances are created, later calls reuse the released
+    ones, reset between inputs. A program needing only the tokens (or the
+    diagnostics) can share a single instance instead, Lexical.lex keeps
+    the state of each input apart:
+
+        lexer = Lexical(io.StringIO(), engine='regex')
+        with ThreadPoolExecutor(8) as executor:
+            states = list(executor.map(lexer.lex, sources))
+"""
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+from lexical import Lexical
+
+
+class LexerPool(object):
+    """
+        Pool of at most size (default: the number of CPUs) instances of
+        lexical_class, created with options when first needed
+    """
+
+    def __init__(self, size=None, lexical_class=Lexical, **options):
+        self.size = size or os.cpu_count() or 1
+        self.lexical_class = lexical_class
+        self.options = options
+        # the instance released last is the first reused, its memory is
+        # the most likely to be warm
+        self.idle = []
+        self.created = 0
+        self.lock = threading.Lock()
+        # a permit for each instance, acquired while it's in use
+        self.available = threading.BoundedSemaphore(self.size)
+
+    def __repr__(self):
+        return "<LexerPool {} of {} lexers created>".format(
+            self.created, self.size)
+
+    def empty_input(self):
+        if self.options.get('engine') in Lexical.BINARY_ENGINES:
+            return io.BytesIO()
+        return io.StringIO()
+
+    def acquire(self, timeout=None):
+        """
+            Return an idle instance, creating one while there are less than
+            size. Raise TimeoutError when none is released in timeout
+            seconds
+        """
+        if not self.available.acquire(timeout=timeout):
+            raise TimeoutError(
+                "no lexer released in {} seconds".format(timeout))
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        try:
+            return self.lexical_class(self.empty_input(), **self.options)
+        except BaseException:
+            with self.lock:
+                self.created -= 1
+            self.available.release()
+            raise
+
+    def release(self, instance):
+        """
+            Put instance back on the pool. It's reset, so it doesn't keep
+            the input or the tokens of the caller
+        """
+        instance.reset(self.empty_input())
+        with self.lock:
+            self.idle.append(instance)
+        self.available.release()
+
+    @contextmanager
+    def lexer(self, timeout=None):
+        """
+            Context manager acquiring an instance and releasing it at the
+            end, for callers reading more than the tokens (as the
+            diagnostics on recover mode)
+        """
+        instance = self.acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def decode(self, source, timeout=None):
+        """
+            Return the tokens of source (a str, bytes or a file-like
+            object), lexed on an instance of the pool
+        """
+        instance = self.acquire(timeout)
+        try:
+            return instance.decode(source)
+        finally:
+            self.release(instance)
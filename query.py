@@ -0,0 +1,143 @@
+"""
+    Index of the recognized tokens answering queries in time proportional
+    to their results, instead of a pass over every token:
+
+        instance = Lexical(input_file, storage='buffer', index=True)
+        instance.decode()
+        instance.index.select('ID', first_line=10000, last_line=20000)
+        instance.index.match('DEF', 'ID')
+        instance.index.positions('STRING')
+
+    The results are token indexes, positions on instance.tokens. The
+    classes sharing an id (as EQUAL and DIFF) are indexed together
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+from lexical import Lexical, Token
+
+
+def token_id(token):
+    """
+        Return the id of token: an id, the name of a class on the table or
+        a Token
+    """
+    if isinstance(token, Token):
+        return token.id
+    if isinstance(token, str):
+        return Lexical.TABLE_TOKENS[token].id
+    return token
+
+
+class TokenIndex(object):
+    """
+        The indexes of the tokens of each id, sorted, and the index of the
+        first token of each line. Built while the tokens are added by
+        Lexical(index=True), or from the tokens with TokenIndex.build
+    """
+
+    def __init__(self):
+        self.ids = array('H')
+        self.postings = {}
+        # line_starts[line] is the index of the first token on that line or
+        # after it
+        self.line_starts = array('I')
+
+    def __repr__(self):
+        return "<TokenIndex {} tokens>".format(len(self))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, tokens):
+        """
+            Index tokens: a TokenBuffer, a TokenStream or a list of tokens
+            like Lexical.tokens
+        """
+        index = cls()
+        if hasattr(tokens, 'ids'):
+            pairs = zip(tokens.ids, tokens.lines)
+        else:
+            pairs = ((token['token'], token['line']) for token in tokens)
+        for pair in pairs:
+            index.add(*pair)
+        return index
+
+    def add(self, token_id, line):
+        position = len(self.ids)
+        line_starts = self.line_starts
+        while len(line_starts) <= line:
+            line_starts.append(position)
+        self.ids.append(token_id)
+        postings = self.postings.get(token_id)
+        if postings is None:
+            postings = self.postings[token_id] = array('I')
+        postings.append(position)
+
+    def positions(self, token):
+        """
+            Return the sorted indexes of the tokens of token (an id, a name
+            or a Token)
+        """
+        return self.postings.get(token_id(token), array('I'))
+
+    def first_token(self, line):
+        """
+            Return the index of the first token on line or after it
+        """
+        if line < len(self.line_starts):
+            return self.line_starts[line]
+        return len(self.ids)
+
+    def lines(self, first_line, last_line=None):
+        """
+            Return the range of indexes of the tokens from first_line up to
+            (but not including) last_line, or the end
+        """
+        if last_line is None:
+            return range(self.first_token(first_line), len(self.ids))
+        return range(self.first_token(first_line), self.first_token(last_line))
+
+    def select(self, *tokens, first_line=0, last_line=None):
+        """
+            Return the sorted indexes of the tokens of any of tokens, from
+            first_line up to (but not including) last_line
+        """
+        selected = self.lines(first_line, last_line)
+        slices = []
+        for token in tokens:
+            postings = self.positions(token)
+            slices.append(postings[
+                bisect_left(postings, selected.start):
+                bisect_left(postings, selected.stop)])
+        if len(slices) == 1:
+            return slices[0].tolist()
+        return list(heapq.merge(*slices))
+
+    def match(self, *pattern):
+        """
+            Return the indexes where the adjacent tokens of pattern start,
+            None on the pattern matches any token. Only the positions of
+            the least frequent token of the pattern are tried
+        """
+        ids = [None if token is None else token_id(token) for token in pattern]
+        known = [
+            (len(self.postings.get(token, ())), offset)
+            for offset, token in enumerate(ids) if token is not None]
+        if not known:
+            return list(range(len(self.ids) - len(ids) + 1))
+
+        rarest = min(known)[1]
+        length = len(self.ids)
+        starts = []
+        for position in self.postings.get(ids[rarest], ()):
+            start = position - rarest
+            if start < 0 or start + len(ids) > length:
+                continue
+            if all(
+                    token is None or self.ids[start + offset] == token
+                    for offset, token in enumerate(ids)):
+                starts.append(start)
+        return starts
@@ -0,0 +1,247 @@
+"""
+    Tables of the scanner, generated by build_tables.py from
+    Lexical.TABLE_TOKENS. Do not edit, lexical.py generates it again
+    when the table changes
+"""
+
+TABLE = (1, (
+    ('ADD', 0, '+'),
+    ('SUB', 1, '-'),
+    ('MUL', 2, '*'),
+    ('POW', 3, '**'),
+    ('ANDBIN', 4, '&'),
+    ('ORBIN', 5, '|'),
+    ('EQUAL', 6, '=='),
+    ('DIFF', 6, '!='),
+    ('DIV', 8, '/'),
+    ('INTDIV', 9, '//'),
+    ('MOD', 10, '%'),
+    ('LEFTBIN', 11, '<<'),
+    ('RIGHTBIN', 12, '>>'),
+    ('LESS', 13, '<'),
+    ('GRETHER', 14, '>'),
+    ('LESSEQUAL', 15, '<='),
+    ('GRETHEREQUAL', 16, '>='),
+    ('AND', 17, 'and'),
+    ('OR', 18, 'or'),
+    ('NOT', 19, 'not'),
+    ('XORBIN', 20, '^'),
+    ('NOTBIN', 21, '~'),
+    ('IF', 22, 'if'),
+    ('ELIF', 23, 'elif'),
+    ('ELSE', 24, 'else'),
+    ('FOR', 25, 'for'),
+    ('WHILE', 26, 'while'),
+    ('COMMENT', 27, '#'),
+    ('NEWLINE', 28, '\n'),
+    ('CR', 29, '\r'),
+    ('ID', 30, None),
+    ('COLON', 31, ':'),
+    ('CONSTHEX', 33, None),
+    ('CONSTOCT', 34, None),
+    ('CONSTBIN', 35, None),
+    ('CONSTDEC', 36, None),
+    ('ATTRIB', 37, '='),
+    ('FALSE', 38, 'False'),
+    ('CLASS', 39, 'class'),
+    ('FINALLY', 40, 'finally'),
+    ('IS', 41, 'is'),
+    ('RETURN', 42, 'return'),
+    ('NONE', 43, 'None'),
+    ('CONTINUE', 44, 'continue'),
+    ('LAMBDA', 45, 'lambda'),
+    ('TRY', 46, 'try'),
+    ('TRUE', 47, 'True'),
+    ('DEF', 48, 'def'),
+    ('FROM', 49, 'from'),
+    ('NONLOCAL', 50, 'nonlocal'),
+    ('DEL', 51, 'del'),
+    ('GLOBAL', 52, 'global'),
+    ('WITH', 53, 'with'),
+    ('AS', 54, 'as'),
+    ('YIELD', 55, 'yield'),
+    ('ASSERT', 56, 'assert'),
+    ('IMPORT', 57, 'import'),
+    ('PASS', 58, 'pass'),
+    ('BREAK', 59, 'break'),
+    ('EXCEPT', 60, 'except'),
+    ('IN', 61, 'in'),
+    ('RAISE', 62, 'raise'),
+    ('BACKSLASH', 63, '\\'),
+    ('COMMA', 64, ','),
+    ('SEMICOLON', 65, ';'),
+    ('LEFTPARENTHESIS', 66, '('),
+    ('RIGHTPARENTHESIS', 67, ')'),
+    ('LEFTBRACKET', 68, '['),
+    ('RIGHTBRACKET', 69, ']'),
+    ('LEFTBRACE', 70, '{'),
+    ('RIGHTBRACE', 71, '}'),
+    ('AT', 72, '@'),
+    ('ARROW', 73, '->'),
+    ('ATTRIBSUM', 73, '+='),
+    ('ATTRIBSUB', 74, '-='),
+    ('ATTRIBMUL', 75, '*='),
+    ('ATTRIBDIV', 76, '/='),
+    ('ATTRIBDIVINT', 77, '//='),
+    ('ATTRIBMOD', 78, '%='),
+    ('ATTRIBMTXMUL', 79, '@='),
+    ('ATTRIBANDBIN', 80, '&='),
+    ('ATTRIBORBIN', 81, '|='),
+    ('ATTRIBXORBIN', 82, '^='),
+    ('ATTRIBRIGHTBIN', 84, '>>='),
+    ('ATTRIBLEFTBIN', 85, '<<='),
+    ('ATTRIBPOW', 86, '**='),
+    ('QUOTE', 87, "'"),
+    ('DQUOTE', 88, '"'),
+    ('TRIPLEQUOTE', 89, "'''"),
+    ('TRIPLEDQUOTE', 90, '"""'),
+    ('CONSTFLOAT', 91, None),
+    ('STRING', 92, None),
+    ('INDENT', 93, None),
+    ('DEDENT', 94, None),
+    ('ENDMARKER', 95, None),
+    ('DIFF2', 96, '<>'),
+    ('AWAIT', 97, 'await'),
+    ('DOT', 98, '.'),
+    ('ENDPRODUCTION', 99, '$'),
+    ('ERROR', 100, None),
+))
+
+FINGERPRINT = (
+    'f41b53cfb2a6d2ea03159a13fad67806b3f4f9bd76cd96fc2b6f6f13126525f6'
+)
+
+TOKENS_BY_FIRST_CHAR = {
+    '\n': ('NEWLINE',),
+    '\r': ('CR',),
+    '!': ('DIFF',),
+    '"': ('DQUOTE', 'TRIPLEDQUOTE'),
+    '#': ('COMMENT',),
+    '$': ('ENDPRODUCTION',),
+    '%': ('MOD', 'ATTRIBMOD'),
+    '&': ('ANDBIN', 'ATTRIBANDBIN'),
+    "'": ('QUOTE', 'TRIPLEQUOTE'),
+    '(': ('LEFTPARENTHESIS',),
+    ')': ('RIGHTPARENTHESIS',),
+    '*': ('MUL', 'POW', 'ATTRIBMUL', 'ATTRIBPOW'),
+    '+': ('ADD', 'ATTRIBSUM'),
+    ',': ('COMMA',),
+    '-': ('SUB', 'ARROW', 'ATTRIBSUB'),
+    '.': ('DOT',),
+    '/': ('DIV', 'INTDIV', 'ATTRIBDIV', 'ATTRIBDIVINT'),
+    ':': ('COLON',),
+    ';': ('SEMICOLON',),
+    '<': ('LEFTBIN', 'LESS', 'LESSEQUAL', 'ATTRIBLEFTBIN', 'DIFF2'),
+    '=': ('EQUAL', 'ATTRIB'),
+    '>': ('RIGHTBIN', 'GRETHER', 'GRETHEREQUAL', 'ATTRIBRIGHTBIN'),
+    '@': ('AT', 'ATTRIBMTXMUL'),
+    'F': ('FALSE',),
+    'N': ('NONE',),
+    'T': ('TRUE',),
+    '[': ('LEFTBRACKET',),
+    '\\': ('BACKSLASH',),
+    ']': ('RIGHTBRACKET',),
+    '^': ('XORBIN', 'ATTRIBXORBIN'),
+    'a': ('AND', 'AS', 'ASSERT', 'AWAIT'),
+    'b': ('BREAK',),
+    'c': ('CLASS', 'CONTINUE'),
+    'd': ('DEF', 'DEL'),
+    'e': ('ELIF', 'ELSE', 'EXCEPT'),
+    'f': ('FOR', 'FINALLY', 'FROM'),
+    'g': ('GLOBAL',),
+    'i': ('IF', 'IS', 'IMPORT', 'IN'),
+    'l': ('LAMBDA',),
+    'n': ('NOT', 'NONLOCAL'),
+    'o': ('OR',),
+    'p': ('PASS',),
+    'r': ('RETURN', 'RAISE'),
+    't': ('TRY',),
+    'w': ('WHILE', 'WITH'),
+    'y': ('YIELD',),
+    '{': ('LEFTBRACE',),
+    '|': ('ORBIN', 'ATTRIBORBIN'),
+    '}': ('RIGHTBRACE',),
+    '~': ('NOTBIN',),
+}
+
+OPERATORS_BY_FIRST_CHAR = {
+    '\n': ('NEWLINE',),
+    '\r': ('CR',),
+    '!': ('DIFF',),
+    '"': ('TRIPLEDQUOTE', 'DQUOTE'),
+    '#': ('COMMENT',),
+    '$': ('ENDPRODUCTION',),
+    '%': ('ATTRIBMOD', 'MOD'),
+    '&': ('ATTRIBANDBIN', 'ANDBIN'),
+    "'": ('TRIPLEQUOTE', 'QUOTE'),
+    '(': ('LEFTPARENTHESIS',),
+    ')': ('RIGHTPARENTHESIS',),
+    '*': ('ATTRIBPOW', 'ATTRIBMUL', 'POW', 'MUL'),
+    '+': ('ATTRIBSUM', 'ADD'),
+    ',': ('COMMA',),
+    '-': ('ATTRIBSUB', 'ARROW', 'SUB'),
+    '.': ('DOT',),
+    '/': ('ATTRIBDIVINT', 'ATTRIBDIV', 'INTDIV', 'DIV'),
+    ':': ('COLON',),
+    ';': ('SEMICOLON',),
+    '<': ('DIFF2', 'ATTRIBLEFTBIN', 'LESSEQUAL', 'LESS', 'LEFTBIN'),
+    '=': ('ATTRIB', 'EQUAL'),
+    '>': ('ATTRIBRIGHTBIN', 'GRETHEREQUAL', 'GRETHER', 'RIGHTBIN'),
+    '@': ('ATTRIBMTXMUL', 'AT'),
+    '[': ('LEFTBRACKET',),
+    '\\': ('BACKSLASH',),
+    ']': ('RIGHTBRACKET',),
+    '^': ('ATTRIBXORBIN', 'XORBIN'),
+    '{': ('LEFTBRACE',),
+    '|': ('ATTRIBORBIN', 'ORBIN'),
+    '}': ('RIGHTBRACE',),
+    '~': ('NOTBIN',),
+}
+
+KEYWORDS = {
+    'False': 'FALSE',
+    'None': 'NONE',
+    'True': 'TRUE',
+    'and': 'AND',
+    'as': 'AS',
+    'assert': 'ASSERT',
+    'await': 'AWAIT',
+    'break': 'BREAK',
+    'class': 'CLASS',
+    'continue': 'CONTINUE',
+    'def': 'DEF',
+    'del': 'DEL',
+    'elif': 'ELIF',
+    'else': 'ELSE',
+    'except': 'EXCEPT',
+    'finally': 'FINALLY',
+    'for': 'FOR',
+    'from': 'FROM',
+    'global': 'GLOBAL',
+    'if': 'IF',
+    'import': 'IMPORT',
+    'in': 'IN',
+    'is': 'IS',
+    'lambda': 'LAMBDA',
+    'nonlocal': 'NONLOCAL',
+    'not': 'NOT',
+    'or': 'OR',
+    'pass': 'PASS',
+    'raise': 'RAISE',
+    'return': 'RETURN',
+    'try': 'TRY',
+    'while': 'WHILE',
+    'with': 'WITH',
+    'yield': 'YIELD',
+}
+
+TOKEN_PATTERN = (
+    '[ \\t]*(?:(?P<identifier>(?P<word>[a-zA-Z_]+)[0-9a-zA-Z_]*)|(?P<floa'
+    't>(?:0|[1-9][0-9]*)(?:\\.[0-9]*(?:[eE][+\\-]?[0-9]*)?|(?:[eE][+\\-]?'
+    '[0-9]*))|\\.(?=\\d)[0-9]*(?:[eE][+\\-]?[0-9]*)?)|(?P<hex>0[xX][0-9a-'
+    'fA-F]*)|(?P<oct>0[oO][0-7]*)|(?P<bin>0[bB][01]*)|(?P<decimal>[1-9][0'
+    '-9_]*|0)|(?P<operator>\\$|\\.|<>|"""|\'\'\'|"|\'|\\*\\*=|<<=|>>=|\\^'
+    '=|\\|=|\\&=|@=|%=|//=|/=|\\*=|\\-=|\\->|\\+=|@|\\}|\\{|\\]|\\[|\\)|'
+    '\\(|;|,|\\\\|=|:|\\\r|\\\n|\\#|\\~|\\^|>=|<=|>|<|>>|<<|%|//|/|==|!=|'
+    '\\||\\&|\\*\\*|\\*|\\-|\\+)|(?P<error>.)|(?P<end>\\Z))'
+)
@@ -0,0 +1,158 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from token_buffer import TokenBuffer, sections
+
+
+MAGIC = b'FLHT'
+FORMAT_VERSION = 1
+# magic, format version and a reserved field keeping the arrays aligned
+FILE_HEADER = struct.Struct('<4sHH')
+# length of the name and of the data of a record
+RECORD_HEADER = struct.Struct('<IQ')
+
+
+def dump_tokens(tokens, output_file):
+    """
+        Write the tokens (a TokenBuffer or a list of tokens like
+        Lexical.tokens) on a binary file-like object
+    """
+    if not isinstance(tokens, TokenBuffer):
+        buffer = TokenBuffer()
+        for token in tokens:
+            buffer.add(
+                token['token'], token['lexogram'], token['line'],
+                token['column'])
+        tokens = buffer
+
+    output_file.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+    output_file.write(tokens.tobytes())
+
+
+def load_tokens(path):
+    """
+        Map the file on path written by dump_tokens, returning a TokenStream
+    """
+    with open(path, 'rb') as input_file:
+        if not input_file.seek(0, 2):
+            raise ValueError("{} is empty".format(path))
+        data = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return TokenStream(data)
+
+
+def write_record(output_file, name, data):
+    """
+        Write on output_file a record of a stream of many token files: name
+        (as the path of the file lexed) and data, written by dump_tokens
+    """
+    name = name.encode('utf-8', 'surrogateescape')
+    output_file.write(RECORD_HEADER.pack(len(name), len(data)))
+    output_file.write(name)
+    output_file.write(data)
+
+
+def iter_records(input_file):
+    """
+        Yield the (name, TokenStream) of each record written by write_record
+        on a binary file-like object, reading a record at a time
+    """
+    while True:
+        header = input_file.read(RECORD_HEADER.size)
+        if not header:
+            return
+        if len(header) < RECORD_HEADER.size:
+            raise ValueError("truncated record header")
+        name_length, data_length = RECORD_HEADER.unpack(header)
+        name = input_file.read(name_length)
+        data = input_file.read(data_length)
+        if len(name) < name_length or len(data) < data_length:
+            raise ValueError("truncated record")
+        yield name.decode('utf-8', 'surrogateescape'), TokenStream(data)
+
+
+class TokenStream(Sequence):
+    """
+        Read-only view of the tokens written by dump_tokens. The ids, lines,
+        columns and lexogram indexes are memoryviews over the data, so the
+        tokens are read without being loaded, and only the lexograms of the
+        tokens accessed are decoded
+    """
+
+    def __init__(self, data):
+        magic, version, reserved = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a token stream")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                "unsupported token stream version {}".format(version))
+
+        self.data = data
+        self.view = memoryview(data)
+        arrays, strings_start = sections(data, FILE_HEADER.size)
+        columns = [
+            self.view[start:end].cast(typecode)
+            for typecode, (start, end) in zip('HIiII', arrays)]
+        if sys.byteorder == 'big':
+            # the data is little-endian, it must be copied to be read
+            columns = [array(column.format, column) for column in columns]
+            for column in columns:
+                column.byteswap()
+
+        (self.ids, self.lines, self.columns, self.lexograms,
+         self.string_offsets) = columns
+        self.strings_start = strings_start
+
+    def __repr__(self):
+        return "<TokenStream {} tokens>".format(len(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+            Release the views, and the mapping when the data is an mmap
+        """
+        for column in (
+                self.ids, self.lines, self.columns, self.lexograms,
+                self.string_offsets):
+            if isinstance(column, memoryview):
+                column.release()
+        self.view.release()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+
+        return {
+            'token': self.ids[index],
+            'lexogram': self.string(self.lexograms[index]),
+            'line': self.lines[index],
+            'column': self.columns[index],
+        }
+
+    def string(self, string_index):
+        """
+            Decode the lexogram with index string_index on the string table
+        """
+        if not string_index:
+            return None
+        start = self.strings_start + self.string_offsets[string_index]
+        end = self.strings_start + self.string_offsets[string_index + 1]
+        return str(self.view[start:end], 'utf-8', 'surrogatepass')
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            token == other_token for token, other_token in zip(self, other))
@@ -0,0 +1,323 @@
+"""
+    Lexing service for asyncio programs. AsyncLexer keeps a pool of warm
+    workers, each one lexing a request at a time and sending its tokens back
+    in batches, so the event loop is never blocked by the lexer:
+
+        async with AsyncLexer(workers=4) as lexer:
+            async for batch in lexer.lex(source):
+                ...
+
+    The workers are processes, or threads with backend='thread' (the local
+    stand-in, running the same protocol on the current process). A request
+    is cancelled when its iteration is closed or its task is cancelled: the
+    worker stops at the next batch, or it's replaced when it doesn't answer
+    in cancel_timeout seconds
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+
+from batch import LexError
+from lexical import Lexical
+
+
+BACKENDS = ('process', 'thread')
+PROCESSES = multiprocessing.get_context('spawn')
+
+
+class Overloaded(RuntimeError):
+    """
+        Raised by AsyncLexer.lex when max_pending requests are waiting for a
+        worker
+    """
+
+
+def serve(connection):
+    """
+        Loop of a worker: lex each request received on connection, sending
+        its tokens in batches, until None is received.
+
+        The messages sent are ('ready', None) once, ('tokens', batch), and
+        to end each request ('done', None), ('error', LexError) or
+        ('cancelled', None). Each 'cancel' received is answered by a single
+        'cancelled', even when it arrives after the end of the request
+    """
+    # the patterns are compiled before the first request
+    for engine in Lexical.ENGINES:
+        Lexical(io.StringIO('x = "a"\n'), engine=engine).decode()
+
+    try:
+        connection.send(('ready', None))
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            if request == 'cancel':
+                connection.send(('cancelled', None))
+                continue
+            lex_request(connection, *request)
+    except (EOFError, OSError):
+        # the pipe was closed by the pool
+        pass
+    connection.close()
+
+
+def lex_request(connection, source, engine, batch_size):
+    instance = Lexical(io.StringIO(source), engine=engine)
+    batch = []
+    try:
+        for token in instance.iter_tokens():
+            batch.append(token)
+            if len(batch) < batch_size:
+                continue
+            connection.send(('tokens', batch))
+            batch = []
+            if connection.poll():
+                # the only message received during a request is a cancel
+                connection.recv()
+                connection.send(('cancelled', None))
+                return
+    except Exception as error:
+        if batch:
+            connection.send(('tokens', batch))
+        connection.send(('error', LexError(
+            type(error).__name__, str(error), instance.line_index,
+            instance.column_index)))
+        return
+
+    if batch:
+        connection.send(('tokens', batch))
+    connection.send(('done', None))
+
+
+def raise_error(error):
+    """
+        Raise the error received from a worker, SyntaxError and
+        IndentationError keep its type
+    """
+    if error.type == 'IndentationError':
+        raise IndentationError(error.message)
+    if error.type == 'SyntaxError':
+        raise SyntaxError(error.message)
+    raise RuntimeError("{}: {}".format(error.type, error.message))
+
+
+class Worker(object):
+    """
+        A worker process (or thread) and the end of its pipe. The messages
+        received are forwarded to an asyncio queue by a reader thread, at
+        most window messages ahead of the consumer, so a slow consumer
+        blocks the worker instead of buffering its tokens
+    """
+
+    def __init__(self, backend, loop, window):
+        self.connection, worker_connection = multiprocessing.Pipe()
+        if backend == 'process':
+            # spawned, as forking a process running the reader threads isn't
+            # safe. The tables are loaded by the worker before it's ready
+            self.runner = PROCESSES.Process(
+                target=serve, args=(worker_connection,), daemon=True)
+            self.runner.start()
+            worker_connection.close()
+        else:
+            self.runner = threading.Thread(
+                target=serve, args=(worker_connection,), daemon=True)
+            self.runner.start()
+
+        self.messages = asyncio.Queue()
+        self.credits = threading.Semaphore(window)
+        self.reader = threading.Thread(
+            target=self.read, args=(loop,), daemon=True)
+        self.reader.start()
+
+    def read(self, loop):
+        while True:
+            self.credits.acquire()
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                message = ('exit', None)
+            try:
+                loop.call_soon_threadsafe(self.messages.put_nowait, message)
+            except RuntimeError:
+                # the loop is closed
+                return
+            if message[0] == 'exit':
+                return
+
+    async def receive(self):
+        message = await self.messages.get()
+        self.credits.release()
+        return message
+
+    def stop(self, timeout):
+        """
+            Ask the worker to finish, terminating a process that doesn't
+        """
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.runner.join(timeout)
+        if self.runner.is_alive() and hasattr(self.runner, 'terminate'):
+            self.runner.terminate()
+            self.runner.join()
+        self.connection.close()
+
+
+class AsyncLexer(object):
+    """
+        Pool of warm workers lexing the requests of an asyncio program.
+
+        workers: number of workers, the requests lexed at the same time
+        (default: the number of CPUs)
+        max_size: the longest source accepted, in chars
+        max_pending: requests waiting for a worker past it are refused with
+        Overloaded, so the latency doesn't grow without bound (default: no
+        limit)
+        batch_size: tokens sent on each batch
+    """
+
+    def __init__(
+            self, workers=None, backend='process', engine='regex',
+            batch_size=1024, max_size=16 * 1024 * 1024, max_pending=None,
+            cancel_timeout=1.0, window=4):
+        if backend not in BACKENDS:
+            raise ValueError("backend must be one of {}".format(
+                ', '.join(BACKENDS)))
+        if engine not in Lexical.ENGINES:
+            raise ValueError("engine must be one of {}".format(
+                ', '.join(Lexical.ENGINES)))
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.max_pending = max_pending
+        self.cancel_timeout = cancel_timeout
+        self.window = window
+        self.pending = 0
+        self.loop = None
+        self.idle = None
+        self.pool = []
+
+    def __repr__(self):
+        return "<AsyncLexer {} {} workers>".format(
+            self.workers, self.backend)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """
+            Start the workers, returning when all of them are ready
+        """
+        self.loop = asyncio.get_running_loop()
+        self.idle = asyncio.Queue()
+        workers = [
+            Worker(self.backend, self.loop, self.window)
+            for _ in range(self.workers)]
+        for worker in workers:
+            await self.ready(worker)
+
+    async def ready(self, worker):
+        kind, value = await worker.receive()
+        if kind != 'ready':
+            raise RuntimeError("the worker exited while starting")
+        self.pool.append(worker)
+        self.idle.put_nowait(worker)
+
+    async def replace(self, worker):
+        """
+            Stop the worker and start a new one in its place
+        """
+        self.pool.remove(worker)
+        worker.stop(timeout=0)
+        await self.ready(Worker(self.backend, self.loop, self.window))
+
+    async def close(self):
+        pool, self.pool = self.pool, []
+        await self.loop.run_in_executor(None, lambda: [
+            worker.stop(self.cancel_timeout) for worker in pool])
+
+    async def lex(self, source):
+        """
+            Yield the tokens of source in batches (lists of tokens like
+            Lexical.tokens). The errors of the lexer are raised after the
+            batches recognized before them
+        """
+        if len(source) > self.max_size:
+            raise ValueError("the source has {} chars, over the limit of "
+                             "{}".format(len(source), self.max_size))
+        if self.max_pending is not None and self.pending >= self.max_pending:
+            raise Overloaded(
+                "{} requests waiting for a worker".format(self.pending))
+
+        self.pending += 1
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.pending -= 1
+
+        kind = None
+        # a long source is sent without blocking the loop
+        sent = self.loop.run_in_executor(
+            None, worker.connection.send,
+            (source, self.engine, self.batch_size))
+        try:
+            await asyncio.shield(sent)
+            while True:
+                kind, value = await worker.receive()
+                if kind == 'tokens':
+                    yield value
+                    continue
+                if kind == 'error':
+                    raise_error(value)
+                elif kind == 'exit':
+                    raise RuntimeError("the worker exited")
+                return
+        finally:
+            await asyncio.shield(self.release(worker, sent, kind))
+
+    async def decode(self, source):
+        """
+            Return all the tokens of source on a list
+        """
+        tokens = []
+        async for batch in self.lex(source):
+            tokens.extend(batch)
+        return tokens
+
+    async def release(self, worker, sent, kind):
+        """
+            Put the worker back on the pool, kind is the last message
+            received. When the request didn't finish it's cancelled first,
+            the worker is replaced when it doesn't answer
+        """
+        try:
+            # the pipe can't be written by two threads
+            await sent
+            if kind == 'exit':
+                raise OSError("the worker exited")
+            if kind not in ('done', 'error'):
+                worker.connection.send('cancel')
+                await asyncio.wait_for(
+                    self.cancelled(worker), self.cancel_timeout)
+        except (OSError, asyncio.TimeoutError):
+            await self.replace(worker)
+            return
+        self.idle.put_nowait(worker)
+
+    async def cancelled(self, worker):
+        while True:
+            kind, value = await worker.receive()
+            if kind == 'cancelled':
+                return
+            if kind == 'exit':
+                raise OSError("the worker exited")
@@ -0,0 +1,540 @@
+"""
+    LL(1) syntactic analyser of the tokens recognized by Lexical.
+
+    The grammar is written with the names of Lexical.TABLE_TOKENS as the
+    terminals and lowercase names as the nonterminals, one rule per line
+    (a line starting with blanks continues the rule above). An empty
+    alternative is the empty production. The parse table is built from the
+    FIRST and FOLLOW sets of the grammar and kept on disk, so it's built
+    only once for each grammar.
+
+    The parse loop keeps an explicit stack and reads the tokens as they
+    are produced, so a file is parsed without building its list of tokens
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from lexical import Lexical
+
+
+Production = namedtuple("Production", ('head', 'body'))
+
+
+def cache_directory():
+    """
+        Return the directory of the parse tables of the current user,
+        $XDG_CACHE_HOME/folahe or ~/.cache/folahe
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'folahe')
+
+
+CACHE_DIR = cache_directory()
+
+# the empty string on the FIRST sets
+EMPTY = None
+END = Lexical.TABLE_TOKENS['ENDPRODUCTION'].id
+
+GRAMMAR = """
+file: stmts ENDMARKER
+stmts: stmt stmts |
+stmt: simple_stmt | compound_stmt
+
+# the lexer adds a SEMICOLON at the end of each line
+simple_stmt: small_stmt SEMICOLON semicolons
+semicolons: NEWLINE | SEMICOLON semicolons | small_stmt SEMICOLON semicolons
+small_stmt: expr_stmt | DEL targets | PASS | BREAK | CONTINUE
+    | RETURN return_value | RAISE raise_value | yield_expr | import_stmt
+    | GLOBAL names | NONLOCAL names | ASSERT test assert_message
+expr_stmt: testlist assignment
+assignment: ATTRIB assigned assignment | augassign assigned
+    | COLON test annotation_value |
+assigned: yield_expr | testlist
+annotation_value: ATTRIB assigned |
+augassign: ATTRIBSUM | ATTRIBSUB | ATTRIBMUL | ATTRIBDIV | ATTRIBDIVINT
+    | ATTRIBMOD | ATTRIBMTXMUL | ATTRIBANDBIN | ATTRIBORBIN | ATTRIBXORBIN
+    | ATTRIBRIGHTBIN | ATTRIBLEFTBIN | ATTRIBPOW
+return_value: testlist |
+raise_value: test raise_from |
+raise_from: FROM test |
+yield_expr: YIELD yield_value
+yield_value: FROM test | testlist |
+assert_message: COMMA test |
+names: ID names_rest
+names_rest: COMMA ID names_rest |
+
+import_stmt: IMPORT dotted_as_names | FROM import_from
+dotted_as_names: dotted_as_name dotted_as_names_rest
+dotted_as_names_rest: COMMA dotted_as_name dotted_as_names_rest |
+dotted_as_name: dotted_name as_name
+dotted_name: ID dotted_name_rest
+dotted_name_rest: DOT ID dotted_name_rest |
+as_name: AS ID |
+import_from: DOT relative_from | dotted_name IMPORT import_targets
+relative_from: DOT relative_from | dotted_name IMPORT import_targets
+    | IMPORT import_targets
+import_targets: MUL | LEFTPARENTHESIS import_names RIGHTPARENTHESIS
+    | import_names
+import_names: ID as_name import_names_rest
+import_names_rest: COMMA import_names_more |
+import_names_more: ID as_name import_names_rest |
+
+compound_stmt: if_stmt | while_stmt | for_stmt | try_stmt | with_stmt
+    | funcdef | classdef | decorated
+suite: NEWLINE INDENT stmt stmts DEDENT | simple_stmt
+if_stmt: IF test COLON suite elif_clauses
+elif_clauses: ELIF test COLON suite elif_clauses | else_clause
+else_clause: ELSE COLON suite |
+while_stmt: WHILE test COLON suite else_clause
+for_stmt: FOR targets IN testlist COLON suite else_clause
+try_stmt: TRY COLON suite handlers
+handlers: except_clause except_clauses else_clause finally_clause
+    | FINALLY COLON suite
+except_clauses: except_clause except_clauses |
+except_clause: EXCEPT except_type COLON suite
+except_type: test except_name |
+except_name: AS ID |
+finally_clause: FINALLY COLON suite |
+with_stmt: WITH with_item with_items COLON suite
+with_items: COMMA with_item with_items |
+with_item: test with_target
+with_target: AS expr |
+funcdef: DEF ID LEFTPARENTHESIS parameters RIGHTPARENTHESIS
+    return_annotation COLON suite
+return_annotation: ARROW test |
+parameters: parameter parameters_rest |
+parameters_rest: COMMA parameters |
+parameter: ID annotation default | MUL star_parameter | POW ID annotation
+star_parameter: ID annotation |
+annotation: COLON test |
+default: ATTRIB test |
+classdef: CLASS ID class_arguments COLON suite
+class_arguments: LEFTPARENTHESIS arguments RIGHTPARENTHESIS |
+decorated: decorator decorators definition
+decorators: decorator decorators |
+decorator: AT test SEMICOLON NEWLINE
+definition: funcdef | classdef
+
+testlist: test testlist_rest
+testlist_rest: COMMA testlist_more |
+testlist_more: test testlist_rest |
+targets: expr targets_rest
+targets_rest: COMMA targets_more |
+targets_more: expr targets_rest |
+test: or_test test_condition | lambdef
+test_condition: IF or_test ELSE test |
+test_nocond: or_test | lambdef_nocond
+lambdef: LAMBDA lambda_parameters COLON test
+lambdef_nocond: LAMBDA lambda_parameters COLON test_nocond
+lambda_parameters: lambda_parameter lambda_parameters_rest |
+lambda_parameters_rest: COMMA lambda_parameters |
+lambda_parameter: ID default | MUL star_lambda_parameter | POW ID
+star_lambda_parameter: ID |
+or_test: and_test or_tests
+or_tests: OR and_test or_tests |
+and_test: not_test and_tests
+and_tests: AND not_test and_tests |
+not_test: NOT not_test | comparison
+comparison: expr comparisons
+comparisons: comparison_operator expr comparisons |
+# EQUAL has the id of DIFF too
+comparison_operator: LESS | GRETHER | EQUAL | LESSEQUAL | GRETHEREQUAL
+    | DIFF2 | IN | NOT IN | IS is_not
+is_not: NOT |
+expr: xor_expr exprs
+exprs: ORBIN xor_expr exprs |
+xor_expr: and_expr xor_exprs
+xor_exprs: XORBIN and_expr xor_exprs |
+and_expr: shift_expr and_exprs
+and_exprs: ANDBIN shift_expr and_exprs |
+shift_expr: arith_expr shift_exprs
+shift_exprs: LEFTBIN arith_expr shift_exprs | RIGHTBIN arith_expr shift_exprs
+    |
+arith_expr: term arith_exprs
+arith_exprs: ADD term arith_exprs | SUB term arith_exprs |
+term: factor terms
+terms: term_operator factor terms |
+term_operator: MUL | DIV | INTDIV | MOD | AT
+factor: ADD factor | SUB factor | NOTBIN factor | power
+power: await_primary power_exponent
+power_exponent: POW factor |
+await_primary: AWAIT primary | primary
+primary: atom trailers
+trailers: trailer trailers |
+trailer: LEFTPARENTHESIS arguments RIGHTPARENTHESIS
+    | LEFTBRACKET subscripts RIGHTBRACKET | DOT ID
+atom: LEFTPARENTHESIS parenthesis_body RIGHTPARENTHESIS
+    | LEFTBRACKET list_body RIGHTBRACKET | LEFTBRACE dict_body RIGHTBRACE
+    | ID string_prefix | number | strings | NONE | TRUE | FALSE | DOT DOT DOT
+# the prefixes of strings (r'', b'', f'') are recognized as identifiers
+string_prefix: strings |
+number: CONSTDEC | CONSTHEX | CONSTOCT | CONSTBIN | CONSTFLOAT
+strings: string strings_rest
+strings_rest: string strings_rest |
+string: quote quotes STRING quote
+quotes: quote quotes |
+quote: QUOTE | DQUOTE | TRIPLEQUOTE | TRIPLEDQUOTE
+parenthesis_body: test elements | yield_expr |
+list_body: test elements |
+elements: comprehension | COMMA elements_more |
+elements_more: test elements_rest |
+elements_rest: COMMA elements_more |
+comprehension: FOR targets IN or_test comprehension_rest
+comprehension_rest: comprehension | IF test_nocond comprehension_rest |
+dict_body: test dict_or_set |
+dict_or_set: COLON test dict_rest | elements
+dict_rest: comprehension | COMMA dict_more |
+dict_more: test COLON test dict_more_rest |
+dict_more_rest: COMMA dict_more |
+subscripts: subscript subscripts_rest
+subscripts_rest: COMMA subscripts_more |
+subscripts_more: subscript subscripts_rest |
+subscript: test slice | COLON slice_upper
+slice: COLON slice_upper |
+slice_upper: test slice_step | slice_step
+slice_step: COLON slice_stop |
+slice_stop: test |
+arguments: argument arguments_rest |
+arguments_rest: COMMA arguments |
+argument: test argument_value | MUL test | POW test
+argument_value: ATTRIB test | comprehension |
+"""
+
+
+def parse_grammar(grammar, table_tokens=Lexical.TABLE_TOKENS):
+    """
+        Return the productions of the grammar text, the terminals are
+        replaced by their token ids. The head of the first rule is the start
+        symbol
+    """
+    rules = []
+    for line in grammar.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if line[0].isspace():
+            rules[-1] += ' ' + line.strip()
+        else:
+            rules.append(line)
+
+    productions = []
+    for rule in rules:
+        head, alternatives = rule.split(':', 1)
+        for alternative in alternatives.split('|'):
+            productions.append(Production(head.strip(), tuple(
+                table_tokens[symbol].id if symbol.isupper() else symbol
+                for symbol in alternative.split())))
+
+    heads = {production.head for production in productions}
+    for production in productions:
+        for symbol in production.body:
+            if isinstance(symbol, str) and symbol not in heads:
+                raise ValueError("undefined nonterminal {}".format(symbol))
+    return productions
+
+
+def first_of(symbols, first):
+    """
+        Return the FIRST set of a sequence of symbols
+    """
+    result = set()
+    for symbol in symbols:
+        symbol_first = first.get(symbol, {symbol})
+        result |= symbol_first - {EMPTY}
+        if EMPTY not in symbol_first:
+            return result
+    result.add(EMPTY)
+    return result
+
+
+def first_sets(productions):
+    """
+        Map each nonterminal to its FIRST set, EMPTY on the set means that
+        the nonterminal derives the empty string
+    """
+    first = {production.head: set() for production in productions}
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            symbols = first_of(body, first)
+            if not symbols <= first[head]:
+                first[head] |= symbols
+                changed = True
+    return first
+
+
+def follow_sets(productions, first):
+    """
+        Map each nonterminal to its FOLLOW set, END follows the start symbol
+    """
+    follow = {production.head: set() for production in productions}
+    follow[productions[0].head].add(END)
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            for position, symbol in enumerate(body):
+                if symbol not in follow:
+                    continue
+                symbols = first_of(body[position + 1:], first)
+                if EMPTY in symbols:
+                    symbols = (symbols - {EMPTY}) | follow[head]
+                if not symbols <= follow[symbol]:
+                    follow[symbol] |= symbols
+                    changed = True
+    return follow
+
+
+def parse_table(productions):
+    """
+        Map each nonterminal and lookahead token id to the index of the
+        production to be applied. Raise ValueError if the grammar isn't LL(1)
+    """
+    first = first_sets(productions)
+    follow = follow_sets(productions, first)
+    table = {head: {} for head in first}
+    conflicts = []
+    for index, (head, body) in enumerate(productions):
+        lookaheads = first_of(body, first)
+        if EMPTY in lookaheads:
+            lookaheads = (lookaheads - {EMPTY}) | follow[head]
+        for token_id in lookaheads:
+            chosen = table[head].setdefault(token_id, index)
+            if chosen != index:
+                conflicts.append("{} on {}: {} / {}".format(
+                    head, token_id, productions[chosen].body, body))
+    if conflicts:
+        raise ValueError("the grammar isn't LL(1):\n" + '\n'.join(conflicts))
+    return table
+
+
+def grammar_hash(grammar):
+    """
+        Return an hash identifying the grammar and the table of tokens
+    """
+    digest = hashlib.sha256(Lexical.FINGERPRINT.encode('ascii'))
+    digest.update(grammar.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_table(grammar, cache_dir=CACHE_DIR):
+    """
+        Return the productions and the parse table of the grammar. The table
+        is read from cache_dir when it was built before, with cache_dir None
+        it's always built. It's kept as JSON, so a cached file holds only
+        data
+    """
+    if cache_dir is None:
+        productions = parse_grammar(grammar)
+        return productions, parse_table(productions)
+
+    path = os.path.join(
+        cache_dir, 'll1-{}.json'.format(grammar_hash(grammar)))
+    try:
+        with open(path, encoding='utf-8') as cache_file:
+            productions, table = json.load(cache_file)
+        # the keys of JSON objects are strings
+        return [Production(head, tuple(body)) for head, body in productions], {
+            head: {
+                int(token_id): index
+                for token_id, index in lookaheads.items()}
+            for head, lookaheads in table.items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+
+    productions = parse_grammar(grammar)
+    table = parse_table(productions)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'w', encoding='utf-8') as cache_file:
+        json.dump([productions, table], cache_file)
+    os.replace(temporary_path, path)
+    return productions, table
+
+
+def join_operators(tokens):
+    """
+        The table gives precedence to the token with the higher id, so the
+        lexer recognizes '==', '<<' and '>>' as two tokens. Two adjacent
+        tokens of them are joined back
+    """
+    ids = {name: token.id for name, token in Lexical.TABLE_TOKENS.items()}
+    joined = {
+        (ids['ATTRIB'], ids['ATTRIB']): ids['EQUAL'],
+        (ids['LESS'], ids['LESS']): ids['LEFTBIN'],
+        (ids['GRETHER'], ids['GRETHER']): ids['RIGHTBIN'],
+    }
+
+    previous = None
+    for token in tokens:
+        if previous is not None:
+            token_id = joined.get((previous['token'], token['token']))
+            if (
+                    token_id is not None and
+                    token['line'] == previous['line'] and
+                    token['column'] == previous['column'] + 1):
+                yield dict(
+                    previous, token=token_id,
+                    lexogram=previous['lexogram'] + token['lexogram'])
+                previous = None
+                continue
+            yield previous
+        previous = token
+
+    if previous is not None:
+        yield previous
+
+
+def logical_tokens(tokens):
+    """
+        Adapt the tokens of Lexical to the grammar, like the logical lines
+        of python: inside brackets, and after a backslash, the line breaks
+        are ignored, and the lines with only comments are dropped. The
+        INDENT and DEDENT tokens are computed again from the column of the
+        first token of each logical line, since the lexer counts the
+        identation of the continuation lines too
+    """
+    ids = {name: token.id for name, token in Lexical.TABLE_TOKENS.items()}
+    opening = {ids['LEFTPARENTHESIS'], ids['LEFTBRACKET'], ids['LEFTBRACE']}
+    closing = {
+        ids['RIGHTPARENTHESIS'], ids['RIGHTBRACKET'], ids['RIGHTBRACE']}
+    ignored = {ids['CR'], ids['INDENT'], ids['DEDENT']}
+
+    def virtual_token(name, position, lexogram=None):
+        return {
+            'token': ids[name], 'lexogram': lexogram,
+            'line': position['line'], 'column': position['column']}
+
+    context_stack = [0]
+    depth = 0
+    continued = False
+    # the tokens of the current physical line
+    line = []
+    for token in join_operators(tokens):
+        token_id = token['token']
+        if token_id in ignored:
+            continue
+        if token_id == ids['NEWLINE']:
+            newline = token
+        elif token_id == ids['ENDMARKER']:
+            # the last line may not end with a line break
+            newline = virtual_token('NEWLINE', token, '\n')
+            if line and line[-1]['token'] != ids['COLON']:
+                line.append(virtual_token('SEMICOLON', token, ';'))
+        else:
+            line.append(token)
+            continue
+
+        semicolon = None
+        if line and line[-1]['token'] == ids['SEMICOLON']:
+            # added by the lexer at the end of the line
+            semicolon = line.pop()
+        if line:
+            first = line[0]
+            if line[-1]['token'] == ids['BACKSLASH']:
+                line.pop()
+                line_continues = True
+            else:
+                line_continues = False
+
+            if not depth and not continued:
+                if first['column'] > context_stack[-1]:
+                    context_stack.append(first['column'])
+                    yield virtual_token('INDENT', first)
+                while first['column'] < context_stack[-1]:
+                    context_stack.pop()
+                    if first['column'] > context_stack[-1]:
+                        raise IndentationError(
+                            "unindent does not match any outer identation "
+                            "level ({}:{})".format(
+                                first['line'], first['column']))
+                    yield virtual_token('DEDENT', first)
+
+            for line_token in line:
+                if line_token['token'] in opening:
+                    depth += 1
+                elif line_token['token'] in closing and depth:
+                    depth -= 1
+                yield line_token
+
+            continued = line_continues
+            if not depth and not continued:
+                if semicolon is not None:
+                    yield semicolon
+                yield newline
+            line = []
+
+        if token_id == ids['ENDMARKER']:
+            for level in context_stack[1:]:
+                yield virtual_token('DEDENT', token)
+            yield token
+
+
+class Parser(object):
+    """
+        Predictive parser of a grammar, by default the python subset of
+        GRAMMAR
+    """
+
+    def __init__(self, grammar=GRAMMAR, cache_dir=CACHE_DIR):
+        self.productions, self.table = load_table(grammar, cache_dir)
+        self.start = self.productions[0].head
+        # the bodies are pushed on the stack from the last symbol
+        self.reversed_bodies = [
+            production.body[::-1] for production in self.productions]
+        self.names = {}
+        for name, token in Lexical.TABLE_TOKENS.items():
+            self.names.setdefault(token.id, name)
+
+    def error(self, token):
+        lexogram = token['lexogram']
+        if lexogram is None or not lexogram.strip():
+            lexogram = self.names.get(token['token'], token['token'])
+        return SyntaxError("Token {} ({}:{})".format(
+            lexogram, token['line'], token['column']))
+
+    def derive(self, tokens):
+        """
+            Parse the tokens (dicts like the ones of Lexical.iter_tokens),
+            yielding each production applied, in the order of a leftmost
+            derivation. Raise SyntaxError on the first unexpected token
+        """
+        table = self.table
+        productions = self.productions
+        reversed_bodies = self.reversed_bodies
+        stream = logical_tokens(tokens)
+        end = {'token': END, 'lexogram': '$', 'line': None, 'column': None}
+
+        token = next(stream, end)
+        lookahead = token['token']
+        stack = [END, self.start]
+        while stack:
+            symbol = stack.pop()
+            if symbol.__class__ is int:
+                if symbol != lookahead:
+                    raise self.error(token)
+                token = next(stream, end)
+                lookahead = token['token']
+                continue
+
+            index = table[symbol].get(lookahead)
+            if index is None:
+                raise self.error(token)
+            stack.extend(reversed_bodies[index])
+            yield productions[index]
+
+    def parse(self, tokens):
+        for _ in self.derive(tokens):
+            pass
+
+
+def parse(input_file, engine='regex', cache_dir=CACHE_DIR):
+    """
+        Lex and parse the text file-like object, each line is parsed as soon
+        as its tokens are recognized
+    """
+    lexical = Lexical(input_file, engine=engine)
+    Parser(cache_dir=cache_dir).parse(lexical.iter_tokens())
@@ -0,0 +1,106 @@
+from collections import Counter
+from io import BytesIO, StringIO
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+import analytics  # noqa: E402
+from lexical import Lexical  # noqa: E402
+from serialization import TokenStream, dump_tokens  # noqa: E402
+
+
+SOURCE = '''def f(a, b):
+    if a != b:
+        for item in a:
+            yield item -> b
+    return not a
+x = f(1, 2)
+'''
+
+
+def lexed(storage):
+    instance = Lexical(StringIO(SOURCE), storage=storage)
+    instance.decode()
+    return instance.tokens
+
+
+def stream():
+    output_file = BytesIO()
+    dump_tokens(lexed('buffer'), output_file)
+    return TokenStream(output_file.getvalue())
+
+
+@pytest.fixture(params=['list', 'buffer', 'stream'])
+def tokens(request):
+    if request.param == 'stream':
+        return stream()
+    return lexed(request.param)
+
+
+def test_token_arrays(tokens):
+    arrays = analytics.token_arrays(tokens)
+
+    expected = lexed('list')
+    assert arrays.ids.tolist() == [token['token'] for token in expected]
+    assert arrays.lines.tolist() == [token['line'] for token in expected]
+    assert arrays.columns.tolist() == [token['column'] for token in expected]
+    assert [arrays.string(index) for index in arrays.lexograms] == [
+        token['lexogram'] for token in expected]
+
+
+def test_class_histogram(tokens):
+    histogram = analytics.class_histogram(analytics.token_arrays(tokens))
+
+    names = {}
+    for name, token in Lexical.TABLE_TOKENS.items():
+        names.setdefault((token.id, token.lexogram), name)
+        names.setdefault(token.id, name)
+    expected = Counter(
+        names.get((token['token'], token['lexogram'])) or
+        names[token['token']] for token in lexed('list'))
+    assert histogram == expected
+    # DIFF shares the id of EQUAL, and ARROW the one of ATTRIBSUM
+    assert histogram['DIFF'] == histogram['ARROW'] == 1
+    assert 'EQUAL' not in histogram
+
+
+def test_nesting_depth(tokens):
+    arrays = analytics.token_arrays(tokens)
+
+    depth = analytics.nesting_depth(arrays)
+
+    assert analytics.max_depth(arrays) == 3
+    assert depth[-1] == 0
+    assert depth.tolist()[arrays.ids.tolist().index(
+        Lexical.TABLE_TOKENS['YIELD'].id)] == 3
+
+
+def test_tokens_per_line(tokens):
+    arrays = analytics.token_arrays(tokens)
+
+    per_line = analytics.tokens_per_line(arrays)
+    keywords = analytics.keywords_per_line(arrays)
+
+    assert per_line.tolist() == [
+        len([token for token in lexed('list') if token['line'] == line])
+        for line in range(7)]
+    assert keywords.tolist() == [1, 1, 2, 1, 2, 0, 0]
+    assert analytics.keyword_density(arrays) == pytest.approx(
+        keywords.sum() / per_line.sum())
+
+
+def test_identifier_frequencies(tokens):
+    frequencies = analytics.identifier_frequencies(
+        analytics.token_arrays(tokens))
+
+    assert frequencies == Counter(
+        {'a': 4, 'b': 3, 'f': 2, 'item': 2, 'x': 1})
+
+
+def test_empty_tokens():
+    arrays = analytics.token_arrays([])
+
+    assert analytics.max_depth(arrays) == 0
+    assert analytics.keyword_density(arrays) == 0.0
+    assert analytics.tokens_per_line(arrays).tolist() == []
+    assert analytics.identifier_frequencies(arrays) == Counter()
@@ -0,0 +1,92 @@
+import pytest
+
+from batch import find_chunks, lex_file_parallel, lex_many, lex_path
+from lexical import Lexical
+
+
+def write_files(tmp_path, sources):
+    paths = []
+    for index, source in enumerate(sources):
+        path = tmp_path / 'file_{}.py'.format(index)
+        path.write_text(source)
+        paths.append(str(path))
+    return paths
+
+
+def test_lex_path(tmp_path):
+    path, = write_files(tmp_path, ['if a:\n    b = 0x1F\n'])
+
+    result = lex_path(path)
+
+    assert result.path == path
+    assert result.error is None
+    assert result.tokens[0]['token'] == Lexical.TABLE_TOKENS['IF'].id
+    assert result.tokens[-1]['token'] == Lexical.TABLE_TOKENS['ENDMARKER'].id
+
+
+def test_lex_path_errors(tmp_path):
+    paths = write_files(tmp_path, ['a = 1\nb = 2 ? 3\n', '  a = 1\n'])
+
+    syntax_error = lex_path(paths[0]).error
+    identation_error = lex_path(paths[1]).error
+    missing_error = lex_path(str(tmp_path / 'missing.py')).error
+
+    assert syntax_error.type == 'SyntaxError'
+    assert (syntax_error.line, syntax_error.column) == (1, 6)
+    assert identation_error.type == 'IndentationError'
+    assert identation_error.line == 0
+    assert missing_error.type == 'FileNotFoundError'
+
+
+def test_lex_many(tmp_path):
+    sources = ['x = {}\n'.format(index) for index in range(20)]
+    sources[5] = 'x = $ ?\n'
+    paths = write_files(tmp_path, sources)
+
+    results = lex_many(paths, workers=2)
+    serial_results = lex_many(paths, workers=1)
+
+    assert [result.path for result in results] == paths
+    assert results == serial_results
+    assert results[5].error.type == 'SyntaxError'
+    assert results[7].tokens[2]['lexogram'] == '7'
+
+
+PARALLEL_SOURCE = '''class A:
+    """docstring
+with a line without identation"""
+    def f(self, value):  # comment 'quoted'
+        return value * 2
+
+
+# comment
+x = A().f(0x1F)
+text = \'\'\'first
+second\'\'\'
+if x:
+    y = 'a' + "b"
+'''
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_lex_file_parallel(tmp_path, workers):
+    path, = write_files(tmp_path, [PARALLEL_SOURCE * 10])
+    instance = Lexical(open(path), engine='regex')
+    instance.decode()
+
+    tokens = lex_file_parallel(path, workers=workers, chunk_size=50)
+
+    assert len(find_chunks(path, 50)) > 10
+    assert tokens == instance.tokens
+
+
+def test_find_chunks_skip_strings(tmp_path):
+    path, = write_files(tmp_path, [PARALLEL_SOURCE])
+
+    chunks = find_chunks(path, 1)
+
+    lines = PARALLEL_SOURCE.splitlines(True)
+    assert [chunk.line for chunk in chunks] == [0, 8, 9, 11]
+    assert all(not lines[chunk.line].startswith(('\\n', ' ', '#'))
+               for chunk in chunks)
+    assert chunks[-1].end == len(PARALLEL_SOURCE)
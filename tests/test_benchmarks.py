@@ -0,0 +1,70 @@
+from io import StringIO
+import token
+import pytest
+
+from benchmarks import corpus, stdlib
+from benchmarks.run import allocations, compare, measure
+from lexical import Lexical
+
+
+@pytest.mark.parametrize('kind', sorted(corpus.KINDS))
+def test_corpus_is_deterministic_and_valid(kind):
+    source = corpus.generate(kind, 2048)
+
+    assert len(source) >= 2048
+    assert source == corpus.generate(kind, 2048)
+    assert source != corpus.generate(kind, 2048, seed=1)
+    Lexical(StringIO(source), engine='regex').decode()
+
+
+def test_measure_times_decode(tmpdir):
+    path = tmpdir.join('source.py')
+    path.write(corpus.generate('mixed', 2048))
+
+    result = measure(str(path), 'regex', 1)
+
+    phases = result['phases']
+    assert phases['decode'] >= phases['decode_line_regex'] > 0
+
+
+def test_compare():
+    def results(tokens_per_second, peak_rss_kb):
+        return {'cases': [{
+            'kind': 'mixed', 'size': '1K', 'engine': 'regex',
+            'tokens_per_second': tokens_per_second,
+            'peak_rss_kb': peak_rss_kb}]}
+
+    baseline = results(1000, 100)
+
+    assert compare(baseline, results(950, 105), 0.1) == []
+    assert compare(baseline, results(800, 100), 0.1) == [
+        'mixed/1K/regex: 20.0% slower']
+    assert compare(baseline, results(1000, 150), 0.1) == [
+        'mixed/1K/regex: 50.0% more memory']
+
+
+def test_allocations():
+    source = 'value = value + 1\n' * 50
+
+    interned = allocations(source, 'regex', 'list', Lexical.INTERN_SIZE)
+    not_interned = allocations(source, 'regex', 'list', 0)
+
+    assert interned['tokens'] == not_interned['tokens'] == 351
+    assert interned['blocks_per_token'] < not_interned['blocks_per_token']
+
+
+@pytest.mark.parametrize('kind', sorted(corpus.KINDS))
+def test_corpus_tokens_match_stdlib(kind):
+    assert stdlib.first_difference(corpus.generate(kind, 4096)) is None
+
+
+def test_stdlib_first_difference():
+    source = 'def f(a):\n    # comment\n    return a ** 2; b = "x"\n'
+
+    assert stdlib.first_difference(source) is None
+    assert stdlib.first_difference('x = r"a"\n') == (
+        ('NAME', 'r', 1), ('STRING', 'r"a"', 1))
+    assert stdlib.STDLIB_TYPES[Lexical.TABLE_TOKENS['WHILE'].id] == (
+        token.NAME)
+    assert stdlib.STDLIB_TYPES[Lexical.TABLE_TOKENS['CONSTHEX'].id] == (
+        token.NUMBER)
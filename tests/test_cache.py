@@ -0,0 +1,76 @@
+from io import StringIO
+from itertools import count
+from types import SimpleNamespace
+import pytest
+
+import cache as cache_module
+from cache import TokenCache
+from lexical import Lexical
+
+
+SOURCE = 'def f(a):\r\n    return a * 0x1F  # comment\n'
+
+
+@pytest.fixture(params=['directory', 'cache.sqlite'])
+def cache_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_decode(cache_path, monkeypatch):
+    cache = TokenCache(cache_path)
+    instance = Lexical(StringIO(SOURCE))
+    instance.decode()
+
+    tokens = cache.decode(StringIO(SOURCE))
+
+    assert tokens == instance.tokens
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def scan(self):
+        raise AssertionError("the cached tokens must be used")
+    monkeypatch.setattr(Lexical, 'scan', scan)
+
+    assert TokenCache(cache_path).decode(StringIO(SOURCE)) == tokens
+    assert cache.decode(StringIO(SOURCE)) == tokens
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lex_path(cache_path, tmp_path):
+    path = str(tmp_path / 'source.py')
+    with open(path, 'w', newline='') as source:
+        source.write(SOURCE)
+    cache = TokenCache(cache_path)
+    instance = Lexical(open(path))
+    instance.decode()
+
+    assert cache.lex_path(path) == instance.tokens
+    assert cache.lex_path(path) == instance.tokens
+    # the newlines of the file were translated, the ones of the text not
+    assert cache.decode(StringIO(SOURCE)) != instance.tokens
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_evict_least_recently_used(cache_path, monkeypatch):
+    # each use is a second after the previous one, whatever the resolution
+    # of the file system timestamps
+    clock = count(1000000)
+    monkeypatch.setattr(
+        cache_module, 'time', SimpleNamespace(time=lambda: next(clock)))
+    cache = TokenCache(cache_path)
+    sources = ['x = {}\n'.format(index) * 10 for index in range(4)]
+    for source in sources:
+        cache.decode(StringIO(source))
+    entry_size = cache.size // 4
+
+    cache.decode(StringIO(sources[0]))
+    cache.max_size = entry_size * 3
+    cache.evict()
+
+    assert cache.size <= cache.max_size
+    assert cache.size == TokenCache(cache_path).size
+    assert {key for used, size, key in cache.store.entries()} == {
+        cache.key(sources[index].encode('utf-8'), b'text')
+        for index in (0, 2, 3)}
+    cache.decode(StringIO(sources[0]))
+    cache.decode(StringIO(sources[1]))
+    assert (cache.hits, cache.misses) == (2, 5)
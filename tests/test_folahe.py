@@ -0,0 +1,134 @@
+import json
+from io import BytesIO, StringIO
+import pytest
+
+import folahe
+from lexical import Lexical
+from serialization import iter_records
+
+
+SOURCES = {
+    'a.py': 'def f(a):\n    return a != 0x1F\n',
+    'pkg/b.py': 'x = [1, 2]\nx += [3]\n',
+    'pkg/build/c.py': 'y = 1\n',
+    'pkg/notes.txt': 'not lexed\n',
+    'bad.py': 'a = 1\nb = 2 ? 3\n',
+}
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name, source in SOURCES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    return tmp_path
+
+
+def decoded(source):
+    instance = Lexical(StringIO(source), engine='regex')
+    instance.decode()
+    return instance.tokens
+
+
+def relative(tree, paths):
+    return [str(path)[len(str(tree)) + 1:] for path in paths]
+
+
+def run(*argv):
+    output_file = BytesIO()
+    error_file = StringIO()
+    status = folahe.run(
+        folahe.parse_arguments(list(argv)), output_file, error_file)
+    return status, output_file.getvalue(), error_file.getvalue()
+
+
+def test_walk(tree):
+    assert relative(tree, folahe.walk([str(tree)])) == [
+        'a.py', 'bad.py', 'pkg/b.py', 'pkg/build/c.py']
+    assert relative(tree, folahe.walk(
+        [str(tree)], exclude=['build', 'bad.py'])) == ['a.py', 'pkg/b.py']
+    assert relative(tree, folahe.walk(
+        [str(tree)], include=['pkg/*.txt', 'a.py'])) == [
+            'a.py', 'pkg/notes.txt']
+    assert list(folahe.walk([str(tree / 'a.py')])) == [str(tree / 'a.py')]
+
+
+def test_class_counts():
+    instance = Lexical(StringIO(SOURCES['a.py']), storage='buffer')
+    instance.decode()
+
+    counts = folahe.class_counts(instance.tokens)
+
+    assert counts['DIFF'] == counts['RETURN'] == 1
+    assert counts['ID'] == 3
+    assert 'EQUAL' not in counts
+    assert sum(counts.values()) == len(instance.tokens)
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_ndjson_output(tree, workers):
+    status, output, errors = run(
+        str(tree), '--exclude', 'build', '--workers', workers)
+
+    lines = [json.loads(line) for line in output.decode().splitlines()]
+    assert status == 1
+    assert relative(tree, [line['path'] for line in lines]) == [
+        'a.py', 'bad.py', 'pkg/b.py']
+    assert lines[0]['tokens'] == decoded(SOURCES['a.py'])
+    assert lines[1]['error'] == {
+        'type': 'SyntaxError', 'message': 'Token ? (1:6)', 'line': 1,
+        'column': 6}
+    assert errors.splitlines() == [
+        '{}:1:6: SyntaxError: Token ? (1:6)'.format(tree / 'bad.py'),
+        '1 of 3 files with errors']
+
+
+def test_binary_output(tree):
+    path = tree / 'tokens.bin'
+
+    status = folahe.main([
+        str(tree / 'pkg'), '--format', 'binary', '--output', str(path)])
+
+    with open(str(path), 'rb') as input_file:
+        records = list(iter_records(input_file))
+    assert status == 0
+    assert relative(tree, [name for name, stream in records]) == [
+        'pkg/b.py', 'pkg/build/c.py']
+    assert records[0][1] == decoded(SOURCES['pkg/b.py'])
+
+
+def test_summary(tree):
+    status, output, errors = run(str(tree), '--summary', '--exclude', '*/*')
+
+    lines = [json.loads(line) for line in output.decode().splitlines()]
+    assert status == 1
+    assert lines[0]['counts']['DIFF'] == 1
+    assert lines[-1] == {
+        'files': 2, 'errors': 1, 'counts': lines[0]['counts']}
+
+
+def test_fail_fast(tree):
+    status, output, errors = run(
+        str(tree), '--fail-fast', '--summary', '-j', '2')
+
+    lines = [json.loads(line) for line in output.decode().splitlines()]
+    assert status == 1
+    assert [line.get('files') for line in lines] == [None, None, 2]
+    assert lines[-1]['errors'] == 1
+
+
+def test_lex_files_keeps_a_bounded_window(tree):
+    consumed = []
+
+    def paths():
+        for index in range(100):
+            consumed.append(index)
+            yield str(tree / 'a.py')
+
+    results = folahe.lex_files(paths(), workers=2, window=3, summary=True)
+    first = next(results)
+    results.close()
+
+    assert first.error is None
+    assert len(consumed) == 6
@@ -0,0 +1,139 @@
+from io import StringIO
+import pytest
+
+from incremental import IncrementalLexical
+
+
+SOURCE = '''def f(value):
+    text = """first
+    second"""
+    if value:
+        return value * 2
+    return 0
+x = f(1)
+'''
+
+
+def decoded(source, engine='char'):
+    instance = IncrementalLexical(StringIO(source), engine=engine)
+    instance.decode()
+    return instance
+
+
+@pytest.mark.parametrize('engine', IncrementalLexical.ENGINES)
+def test_relex_changed_line(engine):
+    instance = decoded(SOURCE, engine)
+
+    changed = instance.relex(4, 5, ['        return value + 2\n'])
+
+    expected = decoded(SOURCE.replace('value * 2', 'value + 2'), engine)
+    assert instance.tokens == expected.tokens
+    assert instance.token_objects == expected.token_objects
+    assert instance.checkpoints == expected.checkpoints
+    # only the tokens of the edited line are recognized again
+    assert [instance.tokens[index]['line'] for index in changed] == [4] * 7
+
+
+def test_relex_inserted_lines():
+    instance = decoded(SOURCE)
+
+    instance.relex(6, 6, ['y = 2\n', 'z = 3\n'])
+
+    expected = decoded(SOURCE.replace('x = f(1)', 'y = 2\nz = 3\nx = f(1)'))
+    assert instance.tokens == expected.tokens
+    assert instance.tokens[-3]['line'] == 8
+    assert instance.checkpoints == expected.checkpoints
+    assert instance.line_offsets == expected.line_offsets
+    assert instance.token_offsets() == expected.token_offsets()
+
+
+def test_relex_inside_string():
+    instance = decoded(SOURCE)
+
+    instance.relex(2, 3, ['    third\n', '    second"""\n'])
+
+    expected = decoded(SOURCE.replace('first\n', 'first\n    third\n'))
+    assert instance.tokens == expected.tokens
+    assert instance.lines == expected.lines
+
+
+def test_relex_changing_identation():
+    instance = decoded(SOURCE)
+
+    instance.relex(5, 6, [])
+
+    expected = decoded(SOURCE.replace('    return 0\n', ''))
+    assert instance.tokens == expected.tokens
+    assert instance.context_stack == expected.context_stack
+
+
+def test_relex_invalid_lines_keeps_the_tokens():
+    instance = decoded(SOURCE)
+    tokens = list(instance.tokens)
+
+    with pytest.raises(IndentationError):
+        instance.relex(6, 7, ['  x = f(1)\n'])
+
+    assert instance.tokens == tokens
+    assert instance.lines == decoded(SOURCE).lines
+
+
+def test_relex_sequence_of_edits():
+    lines = (SOURCE * 20).splitlines(True)
+    instance = decoded(''.join(lines))
+    edits = [
+        (0, 0, ['import os\n']),
+        (30, 32, []),
+        (3, 4, ['    text = """first\n', '    inserted\n']),
+        (50, 50, ['y = 1\n', 'z = 2\n', 'w = 3\n']),
+        (1, 2, ['    value = 1\n']),
+        (70, 71, ['x = f(2)\n']),
+    ]
+
+    for first_line, last_line, new_lines in edits:
+        instance.relex(first_line, last_line, new_lines)
+        lines[first_line:last_line] = new_lines
+
+        expected = decoded(''.join(lines))
+        assert instance.tokens == expected.tokens
+        assert instance.token_objects == expected.token_objects
+        assert instance.checkpoints == expected.checkpoints
+        assert instance.line_offsets == expected.line_offsets
+        assert instance.token_offsets() == expected.token_offsets()
+
+
+def test_relex_does_not_rewrite_the_following_tokens():
+    instance = decoded(SOURCE * 100)
+    last_token = instance.tokens.items[-1]
+
+    instance.relex(1, 1, ['    first = 1\n', '    second = 2\n'])
+
+    # the line of the last token is shifted when it's read
+    assert instance.tokens.items[-1] is last_token
+    assert last_token['line'] == 700
+    assert instance.tokens[-1]['line'] == 702
+
+
+def test_relex_same_length_does_not_shift_the_offsets():
+    instance = decoded(SOURCE * 100)
+    line_offsets = list(instance.line_offsets)
+
+    instance.relex(4, 5, ['        return value + 2\n'])
+
+    assert not instance.line_offsets.shifts
+    assert list(instance.line_offsets) == line_offsets
+
+    instance.relex(4, 5, ['        return value + 20\n'])
+
+    assert instance.line_offsets.items[-1] == line_offsets[-1]
+    assert instance.line_offsets[-1] == line_offsets[-1] + 1
+
+
+def test_input_lines_after_relex():
+    instance = decoded(SOURCE)
+
+    instance.relex(6, 7, ['x = f(2)\n', 'y = 3\n'])
+
+    expected = SOURCE.replace('x = f(1)\n', 'x = f(2)\ny = 3\n')
+    assert instance.input_lines == StringIO(expected).readlines()
+    assert instance.state.input_lines is None
@@ -0,0 +1,74 @@
+from io import StringIO
+import pytest
+
+from lexical import Lexical
+
+
+SOURCE = '''if a:
+    if b:
+        x = 0x1F + 1.5
+s = """long
+string"""
+'''
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_stats(engine):
+    instance = Lexical(StringIO(SOURCE), engine=engine, instrument=True)
+    instance.decode()
+    stats = instance.stats
+
+    assert sum(stats.tokens.values()) == len(instance.tokens)
+    assert stats.tokens['DEDENT'] == 2
+    assert stats.tokens['ENDMARKER'] == 1
+    assert stats.tokens['TRIPLEDQUOTE'] == 2
+    assert stats.characters['STRING'] == len('long\nstring')
+    assert stats.characters['ID'] == 4
+    assert stats.max_depth == 2
+    assert stats.longest_dedent == 2
+    # the char engine tests the chars without patterns
+    assert (stats.regex_calls > 0) == (engine == 'regex')
+    assert stats.calls['finish'] == 1
+    assert stats.time['finish'] > 0
+
+
+def test_stats_fallbacks():
+    instance = Lexical(StringIO("a = 1 + b\n"), instrument=True)
+    instance.decode()
+
+    # a, 1 and b aren't on the table
+    assert instance.stats.fallbacks == 3
+    assert instance.stats.as_dict()['fallbacks'] == 3
+
+
+def test_stats_callback():
+    reports = []
+    instance = Lexical(
+        StringIO(SOURCE), engine='regex', instrument=reports.append)
+    tokens = list(instance.iter_tokens())
+
+    assert reports == [instance.stats]
+    assert sum(reports[0].tokens.values()) == len(tokens)
+
+
+def test_stats_start_again_on_reset():
+    instance = Lexical(StringIO("a = 1\n"), instrument=True)
+    instance.decode()
+
+    instance.decode("b = 2\n")
+
+    assert sum(instance.stats.tokens.values()) == len(instance.tokens) == 6
+    assert instance.stats.calls['finish'] == 1
+    assert instance.stats.calls['decode'] == 1
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_instrument_keeps_tokens(engine):
+    instance = Lexical(StringIO(SOURCE), engine=engine)
+    instance.decode()
+    instrumented = Lexical(StringIO(SOURCE), engine=engine, instrument=True)
+    instrumented.decode()
+
+    assert instance.stats is None
+    assert instrumented.tokens == instance.tokens
+    assert 'SCANNER' not in vars(instance)
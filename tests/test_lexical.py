@@ -1,6 +1,15 @@
-from io import StringIO
+import itertools
+import os
+import queue
+import threading
+import time
+import tracemalloc
+from io import BytesIO, StringIO
 import pytest
 
+import build_tables
+import lexical
+import scanner_tables
 from lexical import Lexical, Token
 
 
@@ -207,6 +216,22 @@ def test_recognize_string():
     assert tokens[4]['lexogram'] == "\n"
 
 
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_recognize_multiline_string(engine):
+    instance = Lexical(StringIO(
+        "x = '''1_0. ? # +=\n  second\n'''\n"), engine=engine)
+    instance.decode()
+
+    tokens = instance.tokens
+    string_token = Lexical.TABLE_TOKENS['STRING'].id
+    assert tokens[3]['token'] == string_token
+    assert tokens[3]['lexogram'] == "1_0. ? # +=\n  second\n"
+    assert tokens[3]['line'] == 2
+    assert tokens[3]['column'] == -len(tokens[3]['lexogram'])
+    assert tokens[4]['lexogram'] == "'''"
+    assert instance.string_context == []
+
+
 def test_recognize_if_block():
     instance = Lexical(StringIO("""
 if i < 20:
@@ -218,3 +243,561 @@ else:
     """))
     instance.decode()
     assert len(instance.tokens) == 42  # don't panic
+
+
+def test_operators_by_first_char_follow_precedence():
+    lexograms_for_star = tuple([
+        token.lexogram for token in Lexical.OPERATORS_BY_FIRST_CHAR['*']])
+
+    assert lexograms_for_star == ('**=', '*=', '**', '*')
+    assert 'o' not in Lexical.OPERATORS_BY_FIRST_CHAR
+    assert Lexical.KEYWORDS['or'] == Lexical.TABLE_TOKENS['OR']
+
+
+def test_scanner_tables_up_to_date():
+    # run build_tables.py after changing Lexical.TABLE_TOKENS
+    assert scanner_tables.TABLE == lexical.describe_table(
+        Lexical.TABLE_TOKENS)
+    assert Lexical.TOKENS_BY_FIRST_CHAR == lexical.index_by_first_char(
+        Lexical.TABLE_TOKENS)
+    assert Lexical.FINGERPRINT == lexical.table_fingerprint(
+        Lexical.TABLE_TOKENS)
+    assert Lexical.SCANNER == lexical.compile_scanner(Lexical.TABLE_TOKENS)
+
+
+def test_scanner_tables_generated_again_when_stale(tmpdir):
+    with open(lexical.SCANNER_TABLES_PATH) as tables_file:
+        source = tables_file.read()
+    path = str(tmpdir.join('scanner_tables.py'))
+    tmpdir.join('scanner_tables.py').write(source)
+    table_tokens = dict(Lexical.TABLE_TOKENS, WALRUS=Token(101, ':='))
+
+    tables = lexical.load_scanner_tables(table_tokens, path)
+
+    assert tmpdir.join('scanner_tables.py').read() != source
+    assert tables.operators_by_first_char[':'] == (
+        table_tokens['WALRUS'], table_tokens['COLON'])
+    assert lexical.load_scanner_tables(table_tokens, path) == tables
+
+
+def test_scanner_tables_generated_again_when_incomplete(tmpdir):
+    with open(lexical.SCANNER_TABLES_PATH) as tables_file:
+        source = tables_file.read()
+    tmpdir.join('scanner_tables.py').write(
+        source[:source.index('FINGERPRINT')])
+
+    tables = lexical.load_scanner_tables(
+        Lexical.TABLE_TOKENS, str(tmpdir.join('scanner_tables.py')))
+
+    assert tables == Lexical.SCANNER_TABLES
+    assert tmpdir.join('scanner_tables.py').read() == source
+    assert not tmpdir.listdir(lambda path: path.ext == '.tmp')
+
+
+def test_build_tables_writes_the_output(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    output = tmpdir.join('tables.py')
+
+    assert build_tables.main([str(output)]) == 0
+    with pytest.raises(SystemExit):
+        build_tables.main(['--help'])
+
+    with open(lexical.SCANNER_TABLES_PATH) as tables_file:
+        assert output.read() == tables_file.read()
+    assert tmpdir.listdir() == [output]
+
+
+def test_discover_token():
+    instance = Lexical(StringIO())
+    line = 'a **= 2\n'
+    instance.column_index = 2
+
+    token = instance.discover_token(
+        instance.state, line, instance.possible_tokens_for_char('*'))
+
+    assert token == Lexical.TABLE_TOKENS['ATTRIBPOW']
+    assert instance.column_index == 5
+
+
+def test_recognize_identifier_starting_with_reserved_word():
+    instance = Lexical(StringIO("notin or1\n"))
+    instance.decode()
+
+    tokens = instance.tokens
+    assert tokens[0]['token'] == Lexical.TABLE_TOKENS['ID'].id
+    assert tokens[0]['lexogram'] == 'notin'
+    assert tokens[1]['token'] == Lexical.TABLE_TOKENS['OR'].id
+    assert tokens[2]['token'] == Lexical.TABLE_TOKENS['CONSTDEC'].id
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        Lexical(StringIO(), engine='unknown')
+
+
+@pytest.mark.parametrize('source', [
+    "0x1F + 0o17 - 0b101 * 1_000 // 10e-3 ** .5 ** 0.25\n",
+    "if i <= 20 and not done:  # comment 'quoted'\n    pass\n",
+    "def f(a, b=None) -> 2:\n\treturn a >>= b\n\n\nx = f(1, 2)",
+    "value = '''first\n  second \"quoted\"\n'''\nother = \"a\" + 'b'\n",
+    "class A:\n    def m(self):\n        return self.x\n    y = {1: [2]}\n",
+])
+def test_regex_engine_matches_char_engine(source):
+    char_instance = Lexical(StringIO(source))
+    char_instance.decode()
+    regex_instance = Lexical(StringIO(source), engine='regex')
+    regex_instance.decode()
+
+    assert regex_instance.tokens == char_instance.tokens
+    assert regex_instance.token_objects == char_instance.token_objects
+
+    bytes_instance = Lexical(BytesIO(source.encode('utf-8')), engine='bytes')
+    bytes_instance.decode()
+    assert bytes_instance.tokens == char_instance.tokens
+
+
+def test_regex_engine_invalid_token():
+    instance = Lexical(StringIO("a = 1 ? 2"), engine='regex')
+    with pytest.raises(SyntaxError) as error:
+        instance.decode()
+
+    assert str(error.value) == 'Token ? (0:6)'
+
+
+class GeneratedFile(object):
+    """
+        File-like object with generates its lines on demand
+    """
+
+    def __init__(self, block, repetitions):
+        self.lines = itertools.chain.from_iterable(
+            itertools.repeat(block.splitlines(True), repetitions))
+        self.lines_read = 0
+
+    def read(self):
+        return ''.join(self.lines)
+
+    def readline(self):
+        self.lines_read += 1
+        return next(self.lines, '')
+
+
+BLOCK = '''def f(a, b=0x1F):
+    """docstring
+    with lines"""
+    if a <= 10:
+        return a * 2.5  # comment
+    return 'text'
+'''
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_iter_tokens_matches_decode(engine):
+    instance = Lexical(StringIO(BLOCK * 3), engine=engine)
+    instance.decode()
+
+    streamed = list(Lexical(StringIO(BLOCK * 3), engine=engine).iter_tokens())
+
+    assert streamed == instance.tokens
+    assert streamed[-2]['token'] == Lexical.TABLE_TOKENS['DEDENT'].id
+    assert streamed[-1]['token'] == Lexical.TABLE_TOKENS['ENDMARKER'].id
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_decode_keeps_input_lines(engine):
+    instance = Lexical(StringIO(BLOCK), engine=engine)
+
+    instance.decode()
+
+    assert instance.input_lines == StringIO(BLOCK).readlines()
+
+
+def test_decode_from_path_does_not_keep_the_lines(tmpdir):
+    path = tmpdir.join('source.py')
+    path.write_binary(BLOCK.encode('utf-8'))
+
+    with Lexical.from_path(str(path)) as instance:
+        instance.decode()
+
+        assert instance.state.input_lines is None
+        assert instance.input_lines == BytesIO(
+            BLOCK.encode('utf-8')).readlines()
+
+
+def test_iter_tokens_reads_lazily():
+    file_like = GeneratedFile(BLOCK, 1000)
+    instance = Lexical(file_like)
+    tokens = instance.iter_tokens()
+
+    first_token = next(tokens)
+
+    assert first_token['lexogram'] == 'def'
+    assert file_like.lines_read == 1
+
+
+def test_iter_tokens_memory_does_not_grow():
+    def peak_memory(repetitions):
+        tracemalloc.start()
+        for token in Lexical(
+                GeneratedFile(BLOCK, repetitions),
+                engine='regex').iter_tokens():
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    assert peak_memory(1000) < peak_memory(100) * 1.5
+
+
+@pytest.mark.parametrize('storage', Lexical.STORAGES)
+def test_iter_tokens_memory_does_not_grow_with_the_names(storage):
+    def peak_memory(names):
+        file_like = GeneratedFile('', 0)
+        file_like.lines = (
+            'name_{} = {}\n'.format(index, index) for index in range(names))
+        tracemalloc.start()
+        for token in Lexical(
+                file_like, engine='regex', storage=storage).iter_tokens():
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    # the scanner is compiled by the first run
+    peak_memory(10)
+    assert peak_memory(20000) < peak_memory(2000) * 1.5
+
+
+class PipeWriter(threading.Thread):
+    """
+        Thread writing size bytes of repetitions of block on a pipe, the
+        other end is read by the test
+    """
+
+    def __init__(self, block, size):
+        super().__init__(daemon=True)
+        read_fd, self.write_fd = os.pipe()
+        self.input_file = open(read_fd)
+        self.chunk = block * (65536 // len(block))
+        self.size = size
+        self.written = 0
+
+    def run(self):
+        try:
+            with open(self.write_fd, 'w') as output_file:
+                while self.written < self.size:
+                    output_file.write(self.chunk)
+                    self.written += len(self.chunk)
+        except BrokenPipeError:
+            pass
+
+
+def test_stream_matches_iter_tokens():
+    batches = []
+    instance = Lexical(StringIO(BLOCK * 100), engine='regex')
+
+    instance.stream(batches.append, batch_size=50)
+
+    assert all(len(batch) >= 50 for batch in batches[:-1])
+    assert [token for batch in batches for token in batch] == list(
+        Lexical(StringIO(BLOCK * 100), engine='regex').iter_tokens())
+    assert len(instance.tokens) == 0
+
+
+def test_stream_queue_ends_with_none_on_errors():
+    tokens = queue.Queue()
+
+    with pytest.raises(SyntaxError):
+        Lexical(StringIO('a = 1\nb = ?\n')).stream(tokens, batch_size=1)
+
+    # the tokens of the first line, recognized before the error
+    assert [token['lexogram'] for token in tokens.get()] == [
+        'a', '=', '1', ';', '\n']
+    assert tokens.get() is None
+
+
+def wait_until(condition, timeout=10):
+    """
+        Wait until condition() is true, failing after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def stream_from_pipe(size):
+    """
+        Stream size bytes written on a pipe, returning the number of bytes
+        written, the number of tokens and the peak of memory traced
+    """
+    writer = PipeWriter(BLOCK, size)
+    tokens = queue.Queue(maxsize=4)
+    counts = []
+
+    def consume():
+        count = 0
+        for batch in iter(tokens.get, None):
+            count += len(batch)
+        counts.append(count)
+
+    consumer = threading.Thread(target=consume)
+    tracemalloc.start()
+    writer.start()
+    consumer.start()
+    with writer.input_file:
+        Lexical(writer.input_file, engine='regex').stream(tokens)
+    consumer.join()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return writer.written, counts[0], peak
+
+
+@pytest.mark.parametrize('size', [
+    1024 * 1024,
+    pytest.param(4 * 1024 ** 3, marks=[pytest.mark.slow, pytest.mark.skipif(
+        not os.environ.get('FOLAHE_SLOW_TESTS'),
+        reason='slow, set FOLAHE_SLOW_TESTS=1 to run it')]),
+])
+def test_stream_from_pipe_has_a_memory_ceiling(size):
+    written, count, peak = stream_from_pipe(size)
+
+    assert written >= size
+    block_tokens = len(list(Lexical(StringIO(BLOCK)).iter_tokens())) - 1
+    assert count == block_tokens * written // len(BLOCK) + 1
+    assert peak < 2 * 1024 * 1024
+
+
+def test_stream_slow_consumer_throttles_reading():
+    writer = PipeWriter(BLOCK, 2 * 1024 * 1024)
+    tokens = queue.Queue(maxsize=2)
+    instance = Lexical(writer.input_file, engine='regex')
+    producer = threading.Thread(
+        target=instance.stream, args=(tokens,), kwargs={'batch_size': 100})
+    writer.start()
+    producer.start()
+
+    wait_until(tokens.full)
+    # the reading stops while the queue is full, the writer can only fill
+    # the buffers of the pipe after it
+    assert writer.written < 1024 * 1024
+
+    batches = list(iter(tokens.get, None))
+    producer.join()
+    writer.input_file.close()
+    assert writer.written >= 2 * 1024 * 1024
+    assert all(len(batch) >= 100 for batch in batches[:-1])
+
+
+def test_invalid_storage():
+    with pytest.raises(ValueError):
+        Lexical(StringIO(), storage='unknown')
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_recover_invalid_tokens(engine):
+    instance = Lexical(
+        StringIO("a = 1 ? 2\nb = 1_0.5\nc = 3\n"), engine=engine,
+        recover=True)
+    instance.decode()
+
+    error = Lexical.TABLE_TOKENS['ERROR'].id
+    errors = [token for token in instance.tokens if token['token'] == error]
+    assert [token['lexogram'] for token in errors] == ['?', '1']
+    assert [tuple(diagnostic) for diagnostic in instance.diagnostics] == [
+        ('SyntaxError', 'Token ? (0:6)', 0, 6),
+        ('SyntaxError', 'Token _ (1:4)', 1, 4),
+    ]
+    assert instance.tokens[-6]['lexogram'] == 'c'
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_recover_identation(engine):
+    source = "  a = 1\nif a:\n        b\n    c\nd\n"
+    instance = Lexical(StringIO(source), engine=engine, recover=True)
+    instance.decode()
+
+    assert [
+        (diagnostic.type, diagnostic.line)
+        for diagnostic in instance.diagnostics] == [
+            ('IndentationError', 0), ('IndentationError', 3)]
+    ids = [token['token'] for token in instance.tokens]
+    indent = Lexical.TABLE_TOKENS['INDENT'].id
+    dedent = Lexical.TABLE_TOKENS['DEDENT'].id
+    # c is snapped to the level of b, d closes it
+    assert ids.count(indent) == ids.count(dedent) == 1
+
+    with pytest.raises(IndentationError):
+        Lexical(StringIO(source), engine=engine).decode()
+
+
+def test_from_path_matches_regex_engine(tmpdir):
+    source = BLOCK + "s = 'ação'\nt = '''a\nção''' + x\n" + BLOCK
+    path = tmpdir.join('source.py')
+    path.write_binary(source.replace('\n', '\r\n').encode('utf-8'))
+    with open(str(path), encoding='utf-8') as input_file:
+        expected = Lexical(input_file, engine='regex')
+        expected.decode()
+
+    with Lexical.from_path(str(path)) as instance:
+        instance.decode()
+
+    assert instance.tokens == expected.tokens
+    assert instance.mapped.closed
+
+
+@pytest.mark.parametrize('data', [
+    b'a = 1\rb = 2\n', b'a = 1\r\nb = 2\r', b'a = (1\r\r\n)\rb\r\n'])
+def test_from_path_translates_newlines(tmpdir, data):
+    path = tmpdir.join('source.py')
+    path.write_binary(data)
+    with open(str(path), encoding='utf-8') as input_file:
+        expected = Lexical(input_file, engine='regex')
+        expected.decode()
+
+    with Lexical.from_path(str(path)) as instance:
+        instance.decode()
+
+    assert instance.tokens == expected.tokens
+    assert instance.line_offsets == expected.line_offsets
+
+
+def test_from_path_empty_file(tmpdir):
+    path = tmpdir.join('empty.py')
+    path.write_binary(b'')
+
+    with Lexical.from_path(str(path), storage='buffer') as instance:
+        instance.decode()
+
+    assert [token['token'] for token in instance.tokens] == [
+        Lexical.TABLE_TOKENS['ENDMARKER'].id]
+
+
+def test_bytes_engine_reads_binary_file_like():
+    instance = Lexical(
+        BytesIO(b"a = 1 ? 2\nb = 'x'\n"), engine='bytes', recover=True)
+    instance.decode()
+
+    expected = Lexical(
+        StringIO("a = 1 ? 2\nb = 'x'\n"), engine='regex', recover=True)
+    expected.decode()
+    assert instance.tokens == expected.tokens
+    assert instance.diagnostics == expected.diagnostics
+
+
+@pytest.mark.parametrize('storage', Lexical.STORAGES)
+def test_token_offsets(storage):
+    source = BLOCK * 3
+    instance = Lexical(StringIO(source), storage=storage)
+    instance.decode()
+
+    assert instance.line_offsets[-1] == len(source)
+    for index, token in enumerate(instance.tokens):
+        if token['token'] in (
+                Lexical.TABLE_TOKENS['ID'].id,
+                Lexical.TABLE_TOKENS['CONSTHEX'].id,
+                Lexical.TABLE_TOKENS['STRING'].id):
+            offset = instance.offset_of(index)
+            assert source[offset:].startswith(token['lexogram'])
+            assert instance.token_at(offset) == index
+            last = offset + len(token['lexogram']) - 1
+            assert instance.token_at(last) == index
+
+    # the blank before 'f' and the comment
+    assert instance.token_at(3) is None
+    assert instance.token_at(source.index('comment')) is None
+    assert instance.token_at(-1) is None
+
+
+def test_token_offsets_count_chars_on_bytes_engine():
+    source = "a = 'ação'\nb = 1\n"
+    instance = Lexical(BytesIO(source.encode('utf-8')), engine='bytes')
+    instance.decode()
+
+    index = instance.token_at(source.index('b'))
+    assert instance.tokens[index]['lexogram'] == 'b'
+    assert instance.line_offsets[-1] == len(source)
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES + Lexical.BINARY_ENGINES)
+def test_repeated_lexograms_share_a_token(engine):
+    source = 'value = value + 0x1F * 2.5\nvalue = 0x1F - 2.5 - value\n'
+    if engine in Lexical.BINARY_ENGINES:
+        instance = Lexical(BytesIO(source.encode()), engine=engine)
+    else:
+        instance = Lexical(StringIO(source), engine=engine)
+    instance.decode()
+
+    by_lexogram = {}
+    for token in instance.token_objects:
+        if token.lexogram in ('value', '0x1F', '2.5'):
+            assert by_lexogram.setdefault(token.lexogram, token) is token
+    assert len(by_lexogram) == 3
+    # the table is only kept while scanning
+    assert instance.interned == {}
+
+
+def test_intern_table_is_bounded():
+    instance = Lexical(StringIO('a = b + c + a\n'), engine='regex')
+    instance.intern_size = 2
+
+    instance.process_line_regex(instance.state, 'a = b + c + a\n')
+
+    assert list(instance.interned) == ['a', 'b']
+    assert [token['lexogram'] for token in instance.tokens] == [
+        'a', '=', 'b', '+', 'c', '+', 'a', ';', '\n']
+
+
+@pytest.mark.parametrize('storage', Lexical.STORAGES)
+def test_decode_reuses_instance(storage):
+    instance = Lexical(
+        StringIO('a = 1 ? 2\n'), engine='regex', storage=storage,
+        recover=True, index=True)
+    first = instance.decode()
+
+    second = instance.decode(BLOCK)
+
+    assert first == Lexical(
+        StringIO('a = 1 ? 2\n'), engine='regex', recover=True).decode()
+    assert second == Lexical(StringIO(BLOCK), engine='regex').decode()
+    assert second is instance.tokens and first is not second
+    assert instance.diagnostics == []
+    assert len(instance.index) == len(second)
+    assert second[instance.token_at(4)]['lexogram'] == 'f'
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES + Lexical.BINARY_ENGINES)
+@pytest.mark.parametrize('source', [BLOCK, BLOCK.encode('utf-8')])
+def test_decode_str_and_bytes_on_every_engine(engine, source):
+    instance = Lexical(StringIO(), engine=engine)
+
+    tokens = instance.decode(source)
+
+    assert tokens == Lexical(StringIO(BLOCK), engine='regex').decode()
+
+
+def test_reset_closes_file_from_path(tmpdir):
+    path = tmpdir.join('source.py')
+    path.write_binary(BLOCK.encode('utf-8'))
+    instance = Lexical.from_path(str(path))
+    input_file, mapped = instance.input_file, instance.mapped
+
+    tokens = instance.decode(b'a = 1\n')
+
+    assert input_file.closed and mapped.closed
+    assert instance.mapped is None
+    assert tokens == Lexical(StringIO('a = 1\n'), engine='regex').decode()
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES + Lexical.BINARY_ENGINES)
+def test_lex_keeps_the_instance(engine):
+    instance = Lexical(StringIO(), engine=engine, recover=True)
+    instance.decode('a = 1\n')
+    tokens = list(instance.tokens)
+
+    state = instance.lex('b = 1 ? 2\n')
+
+    assert state.tokens == Lexical(
+        StringIO('b = 1 ? 2\n'), engine='regex', recover=True).decode()
+    assert len(state.diagnostics) == 1
+    assert instance.tokens == tokens and instance.diagnostics == []
@@ -0,0 +1,99 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+import pytest
+
+from benchmarks import corpus
+from lexical import Lexical
+from pool import LexerPool
+
+
+SOURCES = [
+    corpus.generate(kind, 2048, seed)
+    for kind in sorted(corpus.KINDS) for seed in range(3)]
+
+
+def decoded(source, **options):
+    instance = Lexical(StringIO(source), **options)
+    instance.decode()
+    return instance.tokens
+
+
+@pytest.fixture
+def switch_often():
+    # the threads are switched every few bytecodes, to interleave the scans
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize('storage', Lexical.STORAGES)
+def test_pool_on_many_threads(switch_often, storage):
+    lexers = LexerPool(size=3, engine='regex', storage=storage)
+    used = set()
+    lock = threading.Lock()
+
+    def decode(source):
+        with lexers.lexer() as instance:
+            with lock:
+                used.add(id(instance))
+            return instance.decode(source)
+
+    with ThreadPoolExecutor(12) as executor:
+        results = list(executor.map(decode, SOURCES * 4))
+
+    expected = [decoded(source, engine='regex') for source in SOURCES] * 4
+    assert results == expected
+    assert lexers.created == len(used) <= 3
+
+
+def test_pool_reuses_instances():
+    lexers = LexerPool(size=2, engine='regex')
+
+    for source in SOURCES:
+        assert lexers.decode(source) == decoded(source, engine='regex')
+
+    # a single thread never needed a second instance
+    assert lexers.created == 1
+    instance = lexers.acquire()
+    assert len(instance.tokens) == 0
+    assert instance.input_file.read() == ''
+
+
+def test_pool_is_bounded():
+    lexers = LexerPool(size=1)
+    instance = lexers.acquire()
+
+    with pytest.raises(TimeoutError):
+        lexers.acquire(timeout=0.01)
+    lexers.release(instance)
+    assert lexers.acquire(timeout=0.01) is instance
+
+
+def test_pool_bytes_engine():
+    lexers = LexerPool(size=1, engine='bytes')
+
+    tokens = lexers.decode(SOURCES[0].encode())
+
+    assert tokens == decoded(SOURCES[0], engine='regex')
+
+
+def test_pool_bytes_engine_decodes_str():
+    lexers = LexerPool(size=1, engine='bytes')
+
+    tokens = lexers.decode(SOURCES[0])
+
+    assert tokens == decoded(SOURCES[0], engine='regex')
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES + Lexical.BINARY_ENGINES)
+def test_lex_shared_instance_on_many_threads(switch_often, engine):
+    lexer = Lexical(StringIO(), engine=engine)
+
+    with ThreadPoolExecutor(12) as executor:
+        states = list(executor.map(lexer.lex, SOURCES * 4))
+
+    expected = [decoded(source, engine='regex') for source in SOURCES] * 4
+    assert [state.tokens for state in states] == expected
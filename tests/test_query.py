@@ -0,0 +1,91 @@
+from io import BytesIO, StringIO
+import pytest
+
+from benchmarks import corpus
+from lexical import Lexical
+from query import TokenIndex
+from serialization import TokenStream, dump_tokens
+
+
+SOURCE = corpus.generate('mixed', 16 * 1024)
+ID = Lexical.TABLE_TOKENS['ID'].id
+DEF = Lexical.TABLE_TOKENS['DEF'].id
+STRING = Lexical.TABLE_TOKENS['STRING'].id
+
+
+@pytest.fixture(params=Lexical.STORAGES)
+def instance(request):
+    instance = Lexical(StringIO(SOURCE), storage=request.param, index=True)
+    instance.decode()
+    return instance
+
+
+def test_index_built_by_decode(instance):
+    tokens = list(instance.tokens)
+    index = instance.index
+
+    assert len(index) == len(tokens)
+    assert index.positions('STRING').tolist() == [
+        position for position, token in enumerate(tokens)
+        if token['token'] == STRING]
+    assert index.positions(Lexical.TABLE_TOKENS['AWAIT']).tolist() == []
+    for line in (0, 10, 100, tokens[-1]['line'], tokens[-1]['line'] + 5):
+        assert index.first_token(line) == next(
+            (position for position, token in enumerate(tokens)
+             if token['line'] >= line), len(tokens))
+
+
+def test_select(instance):
+    tokens = list(instance.tokens)
+
+    selected = instance.index.select('ID', STRING, first_line=50, last_line=90)
+
+    assert selected == [
+        position for position, token in enumerate(tokens)
+        if token['token'] in (ID, STRING) and 50 <= token['line'] < 90]
+    assert instance.index.select('ID', first_line=90) == [
+        position for position, token in enumerate(tokens)
+        if token['token'] == ID and token['line'] >= 90]
+    assert list(instance.index.lines(50, 90)) == [
+        position for position, token in enumerate(tokens)
+        if 50 <= token['line'] < 90]
+
+
+def test_match(instance):
+    ids = [token['token'] for token in instance.tokens]
+
+    def brute_force(*pattern):
+        return [
+            start for start in range(len(ids) - len(pattern) + 1)
+            if all(token is None or ids[start + offset] == token
+                   for offset, token in enumerate(pattern))]
+
+    assert instance.index.match('DEF', 'ID') == brute_force(DEF, ID)
+    assert instance.index.match('DEF', None, 'LEFTPARENTHESIS') == brute_force(
+        DEF, None, Lexical.TABLE_TOKENS['LEFTPARENTHESIS'].id)
+    assert instance.index.match('DEF', 'ID')
+    assert instance.index.match('AWAIT', 'ID') == []
+    assert instance.index.match(None, None) == list(range(len(ids) - 1))
+
+
+def test_build_from_tokens():
+    instance = Lexical(StringIO(SOURCE), storage='buffer', index=True)
+    instance.decode()
+    output_file = BytesIO()
+    dump_tokens(instance.tokens, output_file)
+
+    from_stream = TokenIndex.build(TokenStream(output_file.getvalue()))
+    from_list = TokenIndex.build(list(instance.tokens))
+
+    for index in (from_stream, from_list):
+        assert index.ids == instance.index.ids
+        assert index.postings == instance.index.postings
+        assert index.line_starts == instance.index.line_starts
+
+
+def test_without_index():
+    instance = Lexical(StringIO(SOURCE))
+    instance.decode()
+
+    assert instance.index is None
+    assert TokenIndex().select('ID') == []
@@ -0,0 +1,61 @@
+from io import BytesIO, StringIO
+import pytest
+
+from lexical import Lexical
+from serialization import (
+    TokenStream, dump_tokens, iter_records, load_tokens, write_record)
+
+
+SOURCE = '''def f(value):
+    """ação
+    doc"""
+    return value * 0x1F
+'''
+
+
+@pytest.mark.parametrize('storage', Lexical.STORAGES)
+def test_dump_and_load_tokens(tmp_path, storage):
+    instance = Lexical(StringIO(SOURCE), storage=storage)
+    instance.decode()
+    path = tmp_path / 'tokens.bin'
+    with open(str(path), 'wb') as output_file:
+        dump_tokens(instance.tokens, output_file)
+
+    with load_tokens(str(path)) as stream:
+        assert len(stream) == len(instance.tokens)
+        assert stream == instance.tokens
+        assert stream[-2:] == instance.tokens[-2:]
+        assert stream.ids.tolist() == [
+            token['token'] for token in instance.tokens]
+        assert stream.lines[-1] == 4
+        assert stream[9]['lexogram'] == 'ação\n    doc'
+        assert stream[9]['column'] == -5
+
+
+def test_token_stream_invalid_data():
+    output_file = BytesIO()
+    dump_tokens([], output_file)
+    data = output_file.getvalue()
+
+    assert len(TokenStream(data)) == 0
+    with pytest.raises(ValueError):
+        TokenStream(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        TokenStream(data[:4] + b'\x02' + data[5:])
+
+
+def test_records():
+    instance = Lexical(StringIO(SOURCE), storage='buffer')
+    instance.decode()
+    data = BytesIO()
+    dump_tokens(instance.tokens, data)
+    output_file = BytesIO()
+    write_record(output_file, 'a.py', data.getvalue())
+    write_record(output_file, 'ação.py', data.getvalue())
+
+    records = list(iter_records(BytesIO(output_file.getvalue())))
+
+    assert [name for name, stream in records] == ['a.py', 'ação.py']
+    assert all(stream == instance.tokens for name, stream in records)
+    with pytest.raises(ValueError):
+        list(iter_records(BytesIO(output_file.getvalue()[:-1])))
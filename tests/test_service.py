@@ -0,0 +1,129 @@
+import asyncio
+from io import StringIO
+import pytest
+
+from lexical import Lexical
+from service import AsyncLexer, Overloaded
+
+
+SOURCE = '''def f(a, b=0x1F):
+    """docstring"""
+    if a <= 10:
+        return a * 2.5  # comment
+    return 'text'
+'''
+
+
+def decoded(source):
+    instance = Lexical(StringIO(source), engine='regex')
+    instance.decode()
+    return instance.tokens
+
+
+def run(coroutine_function, **kwargs):
+    async def main():
+        async with AsyncLexer(**kwargs) as lexer:
+            return await coroutine_function(lexer)
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('backend', ['process', 'thread'])
+def test_lex_streams_batches(backend):
+    async def lex(lexer):
+        return [batch async for batch in lexer.lex(SOURCE * 20)]
+
+    batches = run(lex, workers=1, backend=backend, batch_size=50)
+
+    assert all(len(batch) == 50 for batch in batches[:-1])
+    assert [token for batch in batches for token in batch] == decoded(
+        SOURCE * 20)
+
+
+def test_lex_concurrent_requests():
+    sources = [SOURCE * count for count in range(1, 9)]
+
+    async def lex(lexer):
+        return await asyncio.gather(*map(lexer.decode, sources))
+
+    results = run(lex, workers=3, backend='thread', batch_size=16)
+
+    assert results == [decoded(source) for source in sources]
+
+
+def test_lex_errors():
+    async def lex(lexer):
+        with pytest.raises(SyntaxError) as error:
+            await lexer.decode('a = 1\nb = 2 ? 3\n')
+        with pytest.raises(IndentationError):
+            await lexer.decode('  a = 1\n')
+        # the worker is still usable
+        return error.value, await lexer.decode(SOURCE)
+
+    error, tokens = run(lex, workers=1, backend='thread')
+
+    assert str(error) == 'Token ? (1:6)'
+    assert tokens == decoded(SOURCE)
+
+
+def test_lex_limits_size():
+    async def lex(lexer):
+        with pytest.raises(ValueError):
+            await lexer.decode('a = 1\n' * 10)
+        return await lexer.decode('a = 1\n')
+
+    assert len(run(lex, workers=1, backend='thread', max_size=10)) == 6
+
+
+@pytest.mark.parametrize('backend', ['process', 'thread'])
+def test_cancel_stops_the_worker(backend):
+    async def lex(lexer):
+        requests = lexer.lex(SOURCE * 100000)
+        await requests.__anext__()
+        await requests.aclose()
+
+        task = asyncio.ensure_future(lexer.decode(SOURCE * 100000))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # the single worker was released by both requests
+        return await asyncio.wait_for(lexer.decode(SOURCE), 5)
+
+    tokens = run(lex, workers=1, backend=backend, batch_size=10)
+
+    assert tokens == decoded(SOURCE)
+
+
+def test_cancel_replaces_a_worker_not_answering():
+    async def lex(lexer):
+        worker = lexer.pool[0]
+        requests = lexer.lex(SOURCE * 1000)
+        await requests.__anext__()
+        # the worker is stopped with the answer to the cancel on its pipe
+        worker.runner.terminate()
+        await requests.aclose()
+        return worker, lexer.pool, await lexer.decode(SOURCE)
+
+    worker, pool, tokens = run(
+        lex, workers=1, backend='process', batch_size=10, window=1)
+
+    assert pool and worker not in pool
+    assert tokens == decoded(SOURCE)
+
+
+def test_lex_limits_pending_requests():
+    async def lex(lexer):
+        first = lexer.lex(SOURCE * 100)
+        await first.__anext__()
+        waiting = asyncio.ensure_future(lexer.decode(SOURCE))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await lexer.decode(SOURCE)
+        await first.aclose()
+        return await waiting
+
+    tokens = run(
+        lex, workers=1, backend='thread', batch_size=10, max_pending=1)
+
+    assert tokens == decoded(SOURCE)
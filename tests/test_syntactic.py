@@ -0,0 +1,172 @@
+import itertools
+import os
+import tracemalloc
+from io import StringIO
+import pytest
+
+from lexical import Lexical
+from syntactic import (
+    EMPTY, END, GRAMMAR, Parser, cache_directory, first_sets, follow_sets,
+    load_table, parse, parse_grammar, parse_table)
+
+
+EXPRESSION_GRAMMAR = """
+expression: term expressions
+expressions: ADD term expressions |
+term: factor terms
+terms: MUL factor terms |
+factor: LEFTPARENTHESIS expression RIGHTPARENTHESIS | ID
+"""
+
+PROGRAM = '''import os.path as path, sys
+from . import (a, b as c,)
+from ..module import *
+
+
+@decorator(1)
+class A(Base, metaclass=Meta):
+    """docstring"""
+
+    def method(self, a, b: int = 0x1F, *args, key=None, **kwargs) -> int:
+        # comment
+        x, y = a[1:2, ::3], {1: 2, 3: 4}
+        z = [i ** 2 for i in range(10) if i % 2 == 0]
+        s = {i for i in x}
+        x += -1 if not a and b else lambda q, *r: q << 2
+        if a is not None or b not in y:
+            return (yield from x)
+        elif a <= b:
+            pass
+        else:
+            del x[0], y
+        while True:
+            break
+        else:
+            continue
+        for i, j in enumerate(f(
+            a, b)):
+            try:
+                raise ValueError('text') from None
+            except (TypeError, ValueError) as error:
+                assert error, r'message'
+            finally:
+                global counter
+        with open(path) as f, lock:
+            value: int = f.read()[...] ; await g(*args)
+        return a \\
+            + b
+
+
+x = 1 ; y = 2.5e3'''
+
+
+@pytest.mark.parametrize('engine', Lexical.ENGINES)
+def test_parse_program(engine):
+    parse(StringIO(PROGRAM), engine=engine, cache_dir=None)
+
+
+@pytest.mark.parametrize('source, message', [
+    ("x = = 1\n", 'Token = (0:4)'),
+    ("if x\n    y\n", 'Token ; (0:4)'),
+    ("def f(:\n", 'Token : (0:6)'),
+    ("f(a, b\n", 'Token $ (1:0)'),
+])
+def test_parse_invalid_program(source, message):
+    with pytest.raises(SyntaxError) as error:
+        parse(StringIO(source), cache_dir=None)
+
+    assert str(error.value) == message
+
+
+def test_first_and_follow_sets():
+    productions = parse_grammar(EXPRESSION_GRAMMAR)
+    first = first_sets(productions)
+    follow = follow_sets(productions, first)
+    ids = {name: token.id for name, token in Lexical.TABLE_TOKENS.items()}
+
+    assert first['expression'] == {ids['LEFTPARENTHESIS'], ids['ID']}
+    assert first['terms'] == {ids['MUL'], EMPTY}
+    assert follow['expression'] == {ids['RIGHTPARENTHESIS'], END}
+    assert follow['factor'] == {
+        ids['MUL'], ids['ADD'], ids['RIGHTPARENTHESIS'], END}
+
+
+def test_grammar_errors():
+    with pytest.raises(ValueError) as error:
+        parse_table(parse_grammar("start: ID | ID ADD\n"))
+    assert "isn't LL(1)" in str(error.value)
+
+    with pytest.raises(ValueError):
+        parse_grammar("start: undefined\n")
+
+
+def test_table_cache(tmpdir):
+    cache_dir = str(tmpdir)
+    productions, table = load_table(GRAMMAR, cache_dir)
+    cached = os.listdir(cache_dir)
+
+    assert len(cached) == 1 and cached[0].endswith('.json')
+    assert load_table(GRAMMAR, cache_dir) == (productions, table)
+    load_table(EXPRESSION_GRAMMAR, cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+    # an invalid file is built again
+    tmpdir.join(cached[0]).write('{"not": "a table"}')
+    assert load_table(GRAMMAR, cache_dir) == (productions, table)
+
+
+def test_cache_directory_of_the_user(monkeypatch, tmpdir):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+
+    assert cache_directory() == os.path.join(str(tmpdir), 'folahe')
+
+
+def test_derive_reads_lazily():
+    block = 'def f(a):\n    return a * 2\n'
+    lines = itertools.chain.from_iterable(
+        itertools.repeat(block.splitlines(True), 1000))
+
+    class GeneratedFile(object):
+        lines_read = 0
+
+        def read(self):
+            return ''.join(lines)
+
+        def readline(self):
+            self.lines_read += 1
+            return next(lines, '')
+
+    file_like = GeneratedFile()
+    parser = Parser(cache_dir=None)
+    productions = parser.derive(
+        Lexical(file_like, engine='regex').iter_tokens())
+
+    assert next(productions).head == 'file'
+    # the parser waits for the end of the first line
+    assert file_like.lines_read <= 2
+    for production in productions:
+        pass
+    assert file_like.lines_read == 2001
+
+
+def test_parse_memory_does_not_grow_with_the_names(tmpdir):
+    def peak_memory(names):
+        lines = ('name_{} = {}\n'.format(index, index)
+                 for index in range(names))
+
+        class GeneratedFile(object):
+            def read(self):
+                return ''.join(lines)
+
+            def readline(self):
+                return next(lines, '')
+
+        tracemalloc.start()
+        parse(GeneratedFile(), cache_dir=str(tmpdir))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    # the table is cached and the scanner compiled by the first run
+    peak_memory(10)
+    assert peak_memory(20000) < peak_memory(2000) * 1.5
@@ -0,0 +1,119 @@
+import pickle
+import tracemalloc
+from io import StringIO
+
+from lexical import Lexical, Token
+from token_buffer import TokenBuffer
+
+
+SOURCE = '''def f(value):
+    if value <= 0x1F:
+        return value * 2.5
+    return 'big'
+'''
+
+
+def test_add_token():
+    tokens = TokenBuffer()
+    tokens.add(30, 'value', 2, 4)
+    tokens.add(93, None, 3, 0)
+    tokens.add(30, 'value', 3, 8)
+
+    assert len(tokens) == 3
+    assert tokens[0] == {
+        'token': 30, 'lexogram': 'value', 'line': 2, 'column': 4}
+    assert tokens[1]['lexogram'] is None
+    assert tokens[-1]['column'] == 8
+    assert tokens[1:] == [tokens[1], tokens[2]]
+    assert tokens.strings == [None, 'value']
+
+
+def test_buffer_storage_matches_list_storage():
+    instance = Lexical(StringIO(SOURCE))
+    instance.decode()
+    buffer_instance = Lexical(StringIO(SOURCE), storage='buffer')
+    buffer_instance.decode()
+
+    assert isinstance(buffer_instance.tokens, TokenBuffer)
+    assert buffer_instance.tokens == instance.tokens
+    assert buffer_instance.token_objects == instance.token_objects
+    assert isinstance(buffer_instance.token_objects[0], Token)
+
+
+def test_count_ids_and_line_range():
+    instance = Lexical(StringIO(SOURCE), storage='buffer')
+    instance.decode()
+    tokens = instance.tokens
+
+    counter = tokens.count_ids()
+    assert counter[Lexical.TABLE_TOKENS['RETURN'].id] == 2
+    assert counter[Lexical.TABLE_TOKENS['INDENT'].id] == 2
+
+    lines = [tokens[index]['line'] for index in tokens.line_range(1, 3)]
+    assert set(lines) == {1, 2}
+    assert tokens[tokens.line_range(1, 3)[0]]['lexogram'] is None
+    assert tokens[tokens.line_range(1, 3)[1]]['lexogram'] == 'if'
+
+
+def test_pickle():
+    instance = Lexical(StringIO(SOURCE), storage='buffer')
+    instance.decode()
+
+    loaded = pickle.loads(pickle.dumps(instance.tokens))
+
+    assert loaded == instance.tokens
+    loaded.add(30, 'value', 10, 0)
+    assert loaded.lexograms[-1] == loaded.strings.index('value')
+
+
+def test_memory_per_token():
+    def traced_tokens(storage):
+        tracemalloc.start()
+        instance = Lexical(StringIO(SOURCE * 200), storage=storage)
+        instance.decode()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return memory
+
+    assert traced_tokens('buffer') * 5 < traced_tokens('list')
+
+
+def test_extend():
+    tokens = TokenBuffer()
+    tokens.add(30, 'a', 0, 0)
+    other = TokenBuffer()
+    other.add(30, 'b', 1, 0)
+    other.add(30, 'a', 1, 2)
+    other.add(95, '$', 2, 0)
+
+    tokens.extend(other, len(other) - 1)
+
+    assert tokens == [
+        {'token': 30, 'lexogram': 'a', 'line': 0, 'column': 0},
+        {'token': 30, 'lexogram': 'b', 'line': 1, 'column': 0},
+        {'token': 30, 'lexogram': 'a', 'line': 1, 'column': 2},
+    ]
+    assert tokens.strings == [None, 'a', 'b']
+
+
+def test_tobytes():
+    instance = Lexical(
+        StringIO(SOURCE + "x = ''\ny = 'ação'\n"), storage='buffer')
+    instance.decode()
+
+    loaded = TokenBuffer.frombytes(instance.tokens.tobytes())
+
+    assert loaded == instance.tokens
+    assert loaded.strings == instance.tokens.strings
+    assert loaded[-1]['lexogram'] == '$'
+
+
+def test_clear_releases_the_strings():
+    tokens = TokenBuffer()
+    tokens.add(30, 'a', 0, 0)
+
+    tokens.clear()
+    tokens.add(30, 'b', 1, 0)
+
+    assert tokens == [{'token': 30, 'lexogram': 'b', 'line': 1, 'column': 0}]
+    assert tokens.strings == [None, 'b']
@@ -0,0 +1,229 @@
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Sequence
+
+
+# number of tokens and of strings
+HEADER = struct.Struct('<II')
+
+
+def sections(data, position=0):
+    """
+        Return the (start, end) positions of the ids, lines, columns, lexogram
+        indexes and string offsets arrays on data (as written by
+        TokenBuffer.tobytes starting on position), and the position where
+        the strings start
+    """
+    length, strings_length = HEADER.unpack_from(data, position)
+    position += HEADER.size
+    arrays = []
+    for itemsize, column_length in (
+            (2, length), (4, length), (4, length), (4, length),
+            (4, strings_length + 1)):
+        size = itemsize * column_length
+        arrays.append((position, position + size))
+        position += size + (-size % 4)
+    return arrays, position
+
+
+class TokenBuffer(Sequence):
+    """
+        Columnar storage of the recognized tokens. The ids, lines and columns
+        are kept on arrays and each lexogram is stored once on a string
+        table, the tokens are indexed by its position on that table.
+
+        Each item is read as a dict like the ones on Lexical.tokens, so the
+        buffer can be used where a list of tokens is expected
+    """
+
+    def __init__(self):
+        self.ids = array('H')
+        self.lines = array('I')
+        # the column of an string spanning lines can be negative
+        self.columns = array('i')
+        self.lexograms = array('I')
+
+        # the index 0 is reserved to the tokens without lexogram
+        self.strings = [None]
+        self.string_indexes = {None: 0}
+
+    def __repr__(self):
+        return "<TokenBuffer {} tokens>".format(len(self))
+
+    def __getstate__(self):
+        # string_indexes is rebuilt from strings, there is no need to pickle
+        # every lexogram twice
+        return self.ids, self.lines, self.columns, self.lexograms, self.strings
+
+    def __setstate__(self, state):
+        (self.ids, self.lines, self.columns,
+         self.lexograms, self.strings) = state
+        self.string_indexes = {
+            string: index for index, string in enumerate(self.strings)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+
+        return {
+            'token': self.ids[index],
+            'lexogram': self.strings[self.lexograms[index]],
+            'line': self.lines[index],
+            'column': self.columns[index],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            token == other_token for token, other_token in zip(self, other))
+
+    def add(self, token_id, lexogram, line, column):
+        string_index = self.string_indexes.get(lexogram)
+        if string_index is None:
+            string_index = len(self.strings)
+            self.strings.append(lexogram)
+            self.string_indexes[lexogram] = string_index
+
+        self.ids.append(token_id)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.lexograms.append(string_index)
+
+    def extend(self, other, stop=None):
+        """
+            Add the tokens of other TokenBuffer, up to (but not including) the
+            index stop
+        """
+        stop = len(other) if stop is None else stop
+        lexograms = other.lexograms[:stop]
+        string_indexes = {}
+        for index in sorted(set(lexograms)):
+            string = other.strings[index]
+            string_index = self.string_indexes.get(string)
+            if string_index is None:
+                string_index = len(self.strings)
+                self.strings.append(string)
+                self.string_indexes[string] = string_index
+            string_indexes[index] = string_index
+
+        self.ids.extend(other.ids[:stop])
+        self.lines.extend(other.lines[:stop])
+        self.columns.extend(other.columns[:stop])
+        self.lexograms.extend(map(string_indexes.__getitem__, lexograms))
+
+    def clear(self):
+        """
+            Remove all the tokens and the strings of the string table
+        """
+        del self.ids[:]
+        del self.lines[:]
+        del self.columns[:]
+        del self.lexograms[:]
+        del self.strings[1:]
+        self.string_indexes.clear()
+        self.string_indexes[None] = 0
+
+    def tobytes(self):
+        """
+            Return the tokens on a compact binary format: the ids, lines,
+            columns and lexogram indexes as little-endian arrays, followed by
+            the offsets of each string and the strings encoded as utf-8
+        """
+        encoded = [
+            b'' if string is None else string.encode('utf-8', 'surrogatepass')
+            for string in self.strings]
+        offsets = array('I', [0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+
+        columns = [self.ids, self.lines, self.columns, self.lexograms, offsets]
+        if sys.byteorder == 'big':
+            columns = [array(column.typecode, column) for column in columns]
+            for column in columns:
+                column.byteswap()
+
+        ids = columns[0].tobytes()
+        # the arrays after the ids must be aligned on 4 bytes
+        ids += b'\x00' * (-len(ids) % 4)
+        return b''.join(
+            [HEADER.pack(len(self), len(self.strings)), ids] +
+            [column.tobytes() for column in columns[1:]] + encoded)
+
+    @classmethod
+    def frombytes(cls, data):
+        """
+            Build a TokenBuffer from the data returned by tobytes
+        """
+        buffer = cls()
+        arrays, strings_start = sections(data)
+        columns = [
+            buffer.ids, buffer.lines, buffer.columns, buffer.lexograms,
+            array('I')]
+        for column, (start, end) in zip(columns, arrays):
+            column.frombytes(data[start:end])
+            if sys.byteorder == 'big':
+                column.byteswap()
+
+        offsets = columns[-1]
+        buffer.strings = [None] + [
+            bytes(data[strings_start + start:strings_start + end]).decode(
+                'utf-8', 'surrogatepass')
+            for start, end in zip(offsets[1:-1], offsets[2:])]
+        buffer.string_indexes = {
+            string: index for index, string in enumerate(buffer.strings)}
+        return buffer
+
+    def count_ids(self):
+        """
+            Return a Counter with the number of tokens of each id
+        """
+        return Counter(self.ids)
+
+    def line_range(self, first_line, last_line):
+        """
+            Return the range of indexes of the tokens from first_line up to
+            (but not including) last_line
+        """
+        return range(
+            bisect_left(self.lines, first_line),
+            bisect_left(self.lines, last_line))
+
+    def token_objects(self, token_class):
+        """
+            Return a read-only view of the tokens as token_class objects
+        """
+        return TokenObjects(self, token_class)
+
+
+class TokenObjects(Sequence):
+    """
+        View of a TokenBuffer equivalent to Lexical.token_objects
+    """
+
+    def __init__(self, buffer, token_class):
+        self.buffer = buffer
+        self.token_class = token_class
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+
+        buffer = self.buffer
+        return self.token_class(
+            id=buffer.ids[index],
+            lexogram=buffer.strings[buffer.lexograms[index]])
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)